@@ -0,0 +1,5 @@
+function(doc) {
+    if (doc.document_type == 'FormModel' && !doc.void && doc.active) {
+        emit(doc.active, doc.name);
+    }
+}
@@ -2,6 +2,7 @@ from mangrove.errors.MangroveException import DataObjectNotFound
 from mangrove.datastore.entity import get_by_short_code
 from mangrove.form_model.field import HierarchyField, TextField, UniqueIdField, ShortCodeField
 from mangrove.form_model.validator_types import ValidatorTypes
+from mangrove.form_model.validators import case_insensitive_lookup
 from collections import OrderedDict
 
 
@@ -10,7 +11,8 @@ class EntityShouldExistValidator(object):
         errors = OrderedDict()
         entity_type_field, entity_id_field = self._get_field_codes(fields)
         try:
-            get_by_short_code(dbm, entity_id_field.value, [entity_type_field.value])
+            get_by_short_code(dbm, case_insensitive_lookup(values, entity_id_field.code),
+                              [case_insensitive_lookup(values, entity_type_field.code)])
         except DataObjectNotFound as exception:
             errors[entity_type_field.code] = exception.message
             errors[entity_id_field.code] = exception.message
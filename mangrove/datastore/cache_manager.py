@@ -1,7 +1,205 @@
+import cPickle
+import hashlib
+import logging
+import zlib
+from threading import Lock
+from time import time as current_time
+
 import pylibmc
-from mangrove.datastore.settings import CACHE_SERVERS
+
+from mangrove.datastore import settings
+
+CACHE_CHUNK_SIZE = 900 * 1024
+CACHE_MAX_CHUNKS = 32
+_VALUE_MARKER = 'mangrove-compressed'
+_MANIFEST_MARKER = 'mangrove-chunked'
+
+logger = logging.getLogger('cache-manager')
+
+_cache_manager = None
+_cache_manager_lock = Lock()
 
 
 def get_cache_manager():
-    return pylibmc.Client(CACHE_SERVERS, binary=True, behaviors={"tcp_nodelay": True, "ketama": True})
+    """
+    Returns the process wide cache manager. It is created once, from settings, on first use.
+    """
+    global _cache_manager
+    if _cache_manager is None:
+        with _cache_manager_lock:
+            if _cache_manager is None:
+                _cache_manager = _create_cache_manager()
+    return _cache_manager
+
+
+def set_cache_manager(cache_manager):
+    """
+    Replaces the process wide cache manager, e.g. with a LocalCacheManager for tests or single node deployments.
+    Passing None makes the next get_cache_manager call build one from settings again.
+    """
+    global _cache_manager
+    with _cache_manager_lock:
+        _cache_manager = cache_manager
+
+
+def get_large_value(cache_manager, key):
+    """
+    Reads a value written by set_large_value. Returns None on a miss, including when any chunk has been evicted.
+    """
+    cached = cache_manager.get(key)
+    if not isinstance(cached, tuple):
+        return cached
+    if cached[0] == _VALUE_MARKER:
+        return _decompress(cached[1])
+    chunk_keys = _chunk_keys(key, cached[1], cached[2])
+    chunks = cache_manager.get_multi(chunk_keys)
+    if len(chunks) != len(chunk_keys):
+        return None
+    return _decompress(''.join(chunks[chunk_key] for chunk_key in chunk_keys))
+
+
+def set_large_value(cache_manager, key, value, time=0):
+    """
+    Compresses the value and, if it is still bigger than one memcached item, stores it as chunks listed in a
+    manifest under the key. Returns False, and logs it, when the value could not be cached.
+    """
+    data = zlib.compress(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+    try:
+        is_cached = _set_compressed(cache_manager, key, data, time)
+    except pylibmc.TooBig:
+        is_cached = False
+    if not is_cached:
+        logger.warning("Could not cache %s, it is %d bytes after compression" % (key, len(data)))
+    return is_cached
+
+
+def _set_compressed(cache_manager, key, data, time):
+    if len(data) <= CACHE_CHUNK_SIZE:
+        return bool(cache_manager.set(key, (_VALUE_MARKER, data), time=time))
+
+    chunk_count = (len(data) + CACHE_CHUNK_SIZE - 1) / CACHE_CHUNK_SIZE
+    if chunk_count > CACHE_MAX_CHUNKS:
+        return False
+    version = hashlib.md5(data).hexdigest()[:12]
+    chunk_keys = _chunk_keys(key, version, chunk_count)
+    chunks = dict((chunk_key, data[index * CACHE_CHUNK_SIZE:(index + 1) * CACHE_CHUNK_SIZE])
+                  for index, chunk_key in enumerate(chunk_keys))
+    if cache_manager.set_multi(chunks, time=time):
+        return False
+    return bool(cache_manager.set(key, (_MANIFEST_MARKER, version, chunk_count), time=time))
+
+
+def _chunk_keys(key, version, chunk_count):
+    return ["%s_chunk_%s_%d" % (key, version, index) for index in range(chunk_count)]
+
+
+def _decompress(data):
+    return cPickle.loads(zlib.decompress(data))
+
+
+def _create_cache_manager():
+    if settings.CACHE_BACKEND == 'local':
+        return LocalCacheManager()
+    return MemcachedCacheManager(settings.CACHE_SERVERS, pool_size=settings.CACHE_POOL_SIZE,
+                                 connect_timeout=settings.CACHE_CONNECT_TIMEOUT_MS,
+                                 receive_timeout=settings.CACHE_RECEIVE_TIMEOUT_MS,
+                                 send_timeout=settings.CACHE_SEND_TIMEOUT_MS)
+
+
+class MemcachedCacheManager(object):
+    """
+    A pool of pylibmc clients cloned from one master client. Every call checks a client out of the pool for
+    its own duration, so connections are reused across calls and never shared between threads.
+    """
+
+    def __init__(self, servers, pool_size=10, connect_timeout=1000, receive_timeout=1000, send_timeout=1000):
+        behaviors = {"tcp_nodelay": True, "ketama": True, "connect_timeout": connect_timeout,
+                     "receive_timeout": receive_timeout * 1000, "send_timeout": send_timeout * 1000}
+        self.pool_size = pool_size
+        self._master = pylibmc.Client(servers, binary=True, behaviors=behaviors)
+        self._pool = pylibmc.ClientPool(self._master, pool_size)
+
+    def get(self, key):
+        with self._pool.reserve(block=True) as client:
+            return client.get(key)
+
+    def get_multi(self, keys):
+        with self._pool.reserve(block=True) as client:
+            return client.get_multi(keys)
+
+    def set(self, key, value, time=0):
+        with self._pool.reserve(block=True) as client:
+            return client.set(key, value, time=time)
+
+    def set_multi(self, mapping, time=0):
+        with self._pool.reserve(block=True) as client:
+            return client.set_multi(mapping, time=time)
+
+    def delete(self, key):
+        with self._pool.reserve(block=True) as client:
+            return client.delete(key)
+
+    def delete_multi(self, keys):
+        with self._pool.reserve(block=True) as client:
+            return client.delete_multi(keys)
+
+    def flush_all(self):
+        with self._pool.reserve(block=True) as client:
+            return client.flush_all()
+
+
+class LocalCacheManager(object):
+    """
+    An in process stand in for memcached. Values are pickled on the way in, so like memcached every get hands
+    back a fresh copy that callers are free to change.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            expires_at, pickled_value = entry
+            if expires_at and expires_at < current_time():
+                del self._values[key]
+                return None
+        return cPickle.loads(pickled_value)
+
+    def get_multi(self, keys):
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def set(self, key, value, time=0):
+        pickled_value = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+        expires_at = current_time() + time if time else 0
+        with self._lock:
+            self._values[key] = (expires_at, pickled_value)
+        return True
+
+    def set_multi(self, mapping, time=0):
+        for key, value in mapping.iteritems():
+            self.set(key, value, time=time)
+        return []
+
+    def delete(self, key):
+        with self._lock:
+            return self._values.pop(key, None) is not None
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.delete(key)
+        return True
+
+    def flush_all(self):
+        with self._lock:
+            self._values.clear()
+        return True
 
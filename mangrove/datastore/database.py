@@ -1,22 +1,31 @@
 
 
-from threading import Lock
+import base64
+from collections import OrderedDict
+from contextlib import contextmanager
+import mimetypes
+from threading import Lock, local
+from time import time
+from uuid import uuid4
 from couchdb import http
 
 from couchdb.design import ViewDefinition
-from couchdb.http import ResourceNotFound
+from couchdb.http import ResourceNotFound, ResourceConflict
 import couchdb.client
 
 import settings
 from documents import DocumentBase
+from instrumentation import view_query_instrumentation
 from datetime import datetime
 from mangrove.utils import dates
+from mangrove.utils.json_codecs import encode_json, decode_json
 from mangrove.utils.types import is_empty, is_sequence
 from mangrove.errors.MangroveException import NoDocumentError, DataObjectNotFound, FailedToSaveDataObject
 
 
 _dbms = {}
 _dbms_lock = Lock()
+_units_of_work = local()
 
 
 def get_db_manager(server=None, database=None, credentials=settings.COUCHDB_CREDENTIALS):
@@ -59,6 +68,149 @@ def _delete_db_and_remove_db_manager(dbm):
         del dbm.server[dbm.database_name]
 
 
+def _encode_view_cursor(key, doc_id):
+    return base64.urlsafe_b64encode(encode_json([key, doc_id]))
+
+
+def _decode_view_cursor(cursor):
+    key, doc_id = decode_json(base64.urlsafe_b64decode(str(cursor)))
+    return key, doc_id
+
+
+@contextmanager
+def unit_of_work(dbm):
+    """
+    Collects every _save_document call made on dbm by this thread inside the block and writes them with one bulk
+    update when the block ends; post_update hooks run after that write. Nested blocks join the outer one.
+
+    CouchDB has no transactions, so documents queued before an exception are still written, just as they would
+    have been without the unit of work. Work that depends on whether the documents were written is registered
+    with UnitOfWork.after_write.
+    """
+    units = _active_units_of_work()
+    if dbm in units:
+        yield units[dbm]
+        return
+    unit = UnitOfWork(dbm)
+    units[dbm] = unit
+    try:
+        yield unit
+    except Exception:
+        del units[dbm]
+        unit.flush(raise_on_conflict=False)
+        raise
+    del units[dbm]
+    unit.flush()
+
+
+def _active_units_of_work():
+    if not hasattr(_units_of_work, 'units'):
+        _units_of_work.units = {}
+    return _units_of_work.units
+
+
+class UnitOfWork(object):
+    """
+    The documents queued by unit_of_work. After flush, results holds the (success, docid, rev_or_exc) tuple of
+    every document and conflicts the (docid, exception) of those that were not saved.
+
+    mark and added_since tell which documents were queued by a stretch of work, e.g. one submission of a batch,
+    so the failures of a flush can be traced back to it. Documents given attachments with attach are written
+    with a multipart PUT of their own instead of the bulk update.
+    """
+
+    def __init__(self, dbm):
+        self.dbm = dbm
+        self.results = []
+        self.conflicts = []
+        self._pending = []
+        self._pending_by_id = {}
+        self._added = []
+        self._after_write = []
+
+    def mark(self):
+        return len(self._added)
+
+    def added_since(self, mark):
+        return set(self._added[mark:])
+
+    def add(self, document, process_post_update=True, prev_doc=None):
+        self._added.append(document.id)
+        pending = self._pending_by_id.get(document.id)
+        if pending is None:
+            pending = self._pending_by_id[document.id] = [document, process_post_update, prev_doc, [], []]
+            self._pending.append(pending)
+        else:
+            pending[0] = document
+            pending[1] = pending[1] or process_post_update
+        return document.id
+
+    def after_write(self, callback):
+        """
+        Calls callback with the ids of the documents that could not be written, once the documents queued so far
+        have been. Documents the callback saves are written by the same flush, with a further bulk update.
+        """
+        self._after_write.append(callback)
+
+    def attach(self, document, attachments, removed_attachments=()):
+        """
+        Queues document to be written together with attachments, a list of (name, file or string) pairs, and
+        without removed_attachments, so the document and its attachments take one request and one revision.
+        """
+        if document.id not in self._pending_by_id:
+            self.add(document, process_post_update=False)
+        pending = self._pending_by_id[document.id]
+        pending[0] = document
+        pending[3].extend(attachments)
+        pending[4].extend(removed_attachments)
+
+    def flush(self, raise_on_conflict=True):
+        results, conflicts = [], []
+        while self._pending or self._after_write:
+            pending, self._pending, self._pending_by_id, self._added = self._pending, [], {}, []
+            callbacks, self._after_write = self._after_write, []
+            if pending:
+                written = self._write(pending)
+                results.extend(written)
+                conflicts.extend((result[1], result[2]) for result in written if not result[0])
+                for (document, process_post_update, prev_doc, _, _), result in zip(pending, written):
+                    if result[0] and process_post_update:
+                        document.post_update(self.dbm, prev_doc)
+            if callbacks:
+                self._run_after_write(callbacks, set(document_id for document_id, error in conflicts))
+        if results:
+            self.results, self.conflicts = results, conflicts
+        if conflicts and raise_on_conflict:
+            raise FailedToSaveDataObject(str(conflicts))
+        return self.results
+
+    def _write(self, pending):
+        bulk = [document for document, _, _, attachments, removed in pending if not attachments and not removed]
+        bulk_results = iter(self.dbm._save_documents(bulk) if bulk else [])
+        return [self._write_with_attachments(document, attachments, removed) if attachments or removed
+                else next(bulk_results) for document, _, _, attachments, removed in pending]
+
+    def _write_with_attachments(self, document, attachments, removed_attachments):
+        try:
+            self.dbm._save_document_with_attachments(document, attachments, removed_attachments,
+                                                     process_post_update=False)
+        except FailedToSaveDataObject as e:
+            return False, document.id, e
+        return True, document.id, document.rev
+
+    def _run_after_write(self, callbacks, conflicting_ids):
+        # the callbacks' saves are queued on this unit again, to be written by the next round of flush
+        units = _active_units_of_work()
+        is_active = units.get(self.dbm) is self
+        units[self.dbm] = self
+        try:
+            for callback in callbacks:
+                callback(conflicting_ids)
+        finally:
+            if not is_active:
+                del units[self.dbm]
+
+
 class DataObject(object):
     """
     Superclass for all objects that are essentially wrappers of DB
@@ -140,34 +292,23 @@ class DataObject(object):
 
 
 class View(object):
-    def __init__(self, database):
-        self.database = database
-
-    def _load_all_rows_in_view(self, **values):
-        full_view_name = self.name + '/' + self.name
-        print '[DEBUG] loading view: %s' % full_view_name
-        start = datetime.now()
-        rows = self.database.view(full_view_name, **values).rows
-        end = datetime.now()
-        delta_t = (end - start)
-        print "[DEBUG] --- took %s.%s seconds (%s rows)" %\
-              (delta_t.seconds, delta_t.microseconds, len(rows))
-        return rows
-
-    def _execute(self, **values):
-        return self._load_all_rows_in_view(**values)
+    def __init__(self, dbm):
+        self.dbm = dbm
 
     def __getattr__(self, name):
-        self.name = name
-        return self._execute
+        def _execute(**values):
+            return self.dbm.load_all_rows_in_view(name, **values)
+
+        return _execute
 
 
 class DatabaseManager(object):
-    def __init__(self, credentials, server=None, database=None  ):
+    def __init__(self, credentials, server=None, database=None, instrumentation=None):
         """
         Connect to the CouchDB server. If no database name is given,
         use the name provided in the settings
         """
+        self.instrumentation = instrumentation or view_query_instrumentation
 
         self.url = (server if server is not None else settings.SERVER)
         self.database_name = database or settings.DATABASE
@@ -178,8 +319,7 @@ class DatabaseManager(object):
         except ResourceNotFound:
             self.database = self.server.create(self.database_name)
 
-        self.view = View(self.database)
-
+        self.view = View(self)
 
     def __unicode__(self):
         return u"Connected on %s - working on %s" % (self.url, self.database_name)
@@ -192,15 +332,40 @@ class DatabaseManager(object):
 
     def load_all_rows_in_view(self, view_name, **values):
         full_view_name = view_name + '/' + view_name
-        print '[DEBUG] loading view: %s' % full_view_name
-        start = datetime.now()
+        start = time()
         rows = self.database.view(full_view_name, **values).rows
-        end = datetime.now()
-        delta_t = (end - start)
-        print "[DEBUG] --- took %s.%s seconds (%s rows)" %\
-              (delta_t.seconds, delta_t.microseconds, len(rows))
+        self.instrumentation.record(view_name, values, (time() - start) * 1000, rows)
         return rows
 
+    def load_view_page(self, view_name, page_size, cursor=None, **values):
+        """
+        Returns one page of rows and the cursor of the next page, None on the last page.
+
+        Pages are found by key (startkey/startkey_docid), never by skip, so every page costs the same. Range
+        and ordering options (startkey, endkey, descending...) must be the same for every page of a query.
+        """
+        assert page_size > 0
+        assert 'skip' not in values and 'keys' not in values and 'limit' not in values
+        if cursor is not None:
+            values['startkey'], values['startkey_docid'] = _decode_view_cursor(cursor)
+        rows = self.load_all_rows_in_view(view_name, limit=page_size + 1, **values)
+        if len(rows) <= page_size:
+            return rows, None
+        next_row = rows[page_size]
+        return rows[:page_size], _encode_view_cursor(next_row.key, next_row.id)
+
+    def iter_view(self, view_name, batch_size=1000, **values):
+        """
+        Yields every row of a (non reduced) view, holding at most batch_size rows in memory at a time.
+        """
+        cursor = None
+        while True:
+            rows, cursor = self.load_view_page(view_name, batch_size, cursor, **values)
+            for row in rows:
+                yield row
+            if cursor is None:
+                return
+
     def create_view(self, view_name, map, reduce):
         view_document = view_name # views get their own design doc for the time being
         view = ViewDefinition(view_document, view_name, map, reduce)
@@ -217,8 +382,14 @@ class DatabaseManager(object):
     def _delete_design_docs(self):
         for doc in self._get_design_docs(): del self.database[doc.id]
 
+    def unit_of_work(self):
+        return unit_of_work(self)
+
     def _save_document(self, document, modified=None, process_post_update=True, prev_doc=None):
         u"""'Returns document ID''"""
+        unit = _active_units_of_work().get(self)
+        if unit is not None and modified is None:
+            return unit.add(document, process_post_update, prev_doc)
         # TODO: Throw exception if an error
         result = self._save_documents([document], modified)[0]
         # first item is success/failure
@@ -251,6 +422,51 @@ class DatabaseManager(object):
                 documents[x]._data['_rev'] = results[x][2]
         return results
 
+    def _save_document_with_attachments(self, document, attachments, removed_attachments=(),
+                                        process_post_update=True, prev_doc=None):
+        u"""
+        Saves the document together with attachments, a list of (name, file or string) pairs, and without
+        removed_attachments, with one multipart/related PUT instead of one request, and one revision, per
+        attachment. Attachments already on the document are kept without being uploaded again.
+
+        The document is written at once; inside a unit of work, UnitOfWork.attach queues it instead.
+        Returns document ID.
+        """
+        document.modified = dates.utcnow()
+        attachments_json = OrderedDict(
+            (name, dict(stub, stub=True)) for name, stub in (document._data.get('_attachments') or {}).iteritems()
+            if name not in removed_attachments)
+        contents = OrderedDict()
+        for name, content in attachments:
+            if hasattr(content, 'read'):
+                content.seek(0)
+                content = content.read()
+            attachments_json.pop(name, None)
+            contents[name] = content
+        for name, content in contents.iteritems():
+            content_type = ';'.join(filter(None, mimetypes.guess_type(name))) or 'application/octet-stream'
+            attachments_json[name] = {'follows': True, 'content_type': content_type, 'length': len(content)}
+        body = dict(document._data, _attachments=attachments_json)
+        boundary = uuid4().hex
+        # CouchDB reads the attachment parts in the order their "follows" stubs have in the document part
+        parts = [encode_json(body)] + contents.values()
+        request_body = ''.join('--%s\r\nContent-Type: %s\r\n\r\n%s\r\n'
+                               % (boundary, 'application/json' if index == 0 else 'application/octet-stream', part)
+                               for index, part in enumerate(parts)) + '--%s--' % boundary
+        try:
+            status, headers, data = self.database.resource.put_json(
+                document.id, body=request_body,
+                headers={'Content-Type': 'multipart/related; boundary="%s"' % boundary})
+        except ResourceConflict as e:
+            raise FailedToSaveDataObject(str(e))
+        document._data['_rev'] = data['rev']
+        document._data['_attachments'] = dict(
+            (name, {'stub': True, 'content_type': stub['content_type'], 'length': stub['length']})
+            for name, stub in attachments_json.iteritems())
+        if process_post_update:
+            document.post_update(self, prev_doc)
+        return document.id
+
     def put_attachment(self, document, attachment, attachment_name=None):
         if attachment_name is not None:
             return self.database.put_attachment(document, attachment, attachment_name)
@@ -274,6 +490,16 @@ class DatabaseManager(object):
     def _delete_document(self, document):
         self.database.delete(document)
 
+    def _document_revision(self, id):
+        """
+        Returns the current revision of a document, None if it does not exist, without fetching its body.
+        """
+        try:
+            status, headers, data = self.database.resource.head(id)
+        except ResourceNotFound:
+            return None
+        return headers.get('etag', '').strip('"') or None
+
     def _load_document(self, id, document_class=DocumentBase):
         """
         Load a document from the DB into an in memory document object.
@@ -411,6 +411,19 @@ class EntityActionDocument(DocumentBase):
         self.action = action
 
 
+class ShortCodeSequenceDocument(DocumentBase):
+    """
+    The next short code number that has not been reserved yet for an entity type.
+    """
+    entity_type = TextField()
+    next_value = IntegerField()
+
+    def __init__(self, id=None, entity_type=None, next_value=1):
+        DocumentBase.__init__(self, id=id, document_type='ShortCodeSequence')
+        self.entity_type = entity_type
+        self.next_value = next_value
+
+
 class GroupDocument(DocumentBase):
     name = TextField()
 
@@ -3,7 +3,7 @@
 import copy
 from datetime import datetime
 
-from database import DatabaseManager, DataObject
+from database import DatabaseManager, DataObject, UnitOfWork
 from documents import EntityDocument, DataRecordDocument, attributes, ContactDocument
 from mangrove.datastore.entity_type import entity_type_already_defined
 from mangrove.errors.MangroveException import DataObjectAlreadyExists, EntityTypeDoesNotExistsException, DataObjectNotFound
@@ -11,6 +11,8 @@ from mangrove.utils.dates import utcnow, convert_date_time_to_epoch
 from mangrove.utils.types import is_empty
 from mangrove.utils.types import is_not_empty, is_sequence, is_string
 
+ENTITY_BULK_CHUNK_SIZE = 500
+
 
 def void_entity(dbm, entity_type, short_code):
     if is_string(entity_type):
@@ -45,6 +47,69 @@ def create_entity(dbm, entity_type, short_code, location=None, aggregation_paths
     return e
 
 
+def create_entities_bulk(dbm, entity_type, rows, submission=None, chunk_size=ENTITY_BULK_CHUNK_SIZE):
+    """
+    Creates and saves one entity per row, for imports. A row is a dict with a short_code and optionally
+    location, aggregation_paths, geometry and data, a sequence of (label, value) tuples that is added as with
+    Entity.add_data.
+
+    The entity type is checked once, short codes are checked with one view query per chunk of rows and every
+    chunk is written with one bulk update. Returns a (success, short_code, entity_or_exception) tuple per row.
+    """
+    assert type(entity_type) is list and not is_empty(entity_type)
+    if not entity_type_already_defined(dbm, entity_type):
+        raise EntityTypeDoesNotExistsException(entity_type)
+    results = []
+    seen_short_codes = set()
+    rows = list(rows)
+    for start in range(0, len(rows), chunk_size):
+        results.extend(_create_entities_chunk(dbm, entity_type, rows[start:start + chunk_size], submission,
+                                              seen_short_codes))
+    return results
+
+
+def _create_entities_chunk(dbm, entity_type, rows, submission, seen_short_codes):
+    short_codes = [row['short_code'] for row in rows]
+    for short_code in short_codes:
+        assert is_string(short_code) and not is_empty(short_code)
+    existing = _existing_entities_by_short_code(dbm, entity_type, short_codes)
+    results = [None] * len(rows)
+    unit = UnitOfWork(dbm)
+    created = []
+    for index, row in enumerate(rows):
+        short_code = row['short_code']
+        if short_code.lower() in existing or short_code.lower() in seen_short_codes:
+            entity_name = existing.get(short_code.lower(), {}).get('name', {'value': ''}).get('value')
+            results[index] = (False, short_code, DataObjectAlreadyExists(entity_type[0].capitalize(),
+                                                                         "Unique ID Number", short_code,
+                                                                         existing_name=entity_name))
+            continue
+        seen_short_codes.add(short_code.lower())
+        entity = Entity(dbm, entity_type=entity_type, location=row.get('location'),
+                        aggregation_paths=row.get('aggregation_paths'), short_code=short_code,
+                        geometry=row.get('geometry'))
+        unit.add(entity._doc)
+        data = row.get('data')
+        if data:
+            for label, value in data:
+                entity.data[label] = {'value': value}
+            unit.add(DataRecordDocument(entity_doc=entity._doc, event_time=utcnow(), data=data,
+                                        submission=submission))
+        created.append((index, entity))
+    unit.flush(raise_on_conflict=False)
+    saved = dict((doc_id, (success, rev_or_exception)) for success, doc_id, rev_or_exception in unit.results)
+    for index, entity in created:
+        success, rev_or_exception = saved[entity.id]
+        results[index] = (success, entity.short_code, entity if success else rev_or_exception)
+    return results
+
+
+def _existing_entities_by_short_code(dbm, entity_type, short_codes):
+    keys = [[entity_type, short_code.lower()] for short_code in set(short_codes)]
+    rows = dbm.view.entity_by_short_code(keys=keys, include_docs=True)
+    return dict((row['key'][1].lower(), row['doc'].get('data', {})) for row in rows)
+
+
 def create_contact(dbm, short_code, location=None, aggregation_paths=None, geometry=None, is_datasender=True):
     """
     Initialize and save an entity to the database. Return the entity
@@ -141,6 +206,17 @@ def get_all_entities(dbm, entity_type=None, limit=None, filters=None, reverse_fi
         return _get_all_entities(dbm, limit)
 
 
+def get_entities_page(dbm, entity_type, page_size, cursor=None, filters=None, reverse_filters=None):
+    """
+    Returns a page of entities of the given type and the cursor to pass in for the next page (None after the last
+    page). Filters are applied to each fetched page, so a filtered page can hold fewer than page_size entities.
+    """
+    rows, next_cursor = dbm.load_view_page('by_short_codes', page_size, cursor, startkey=[entity_type],
+                                           endkey=[entity_type, {}], include_docs=True, reduce=False)
+    return [from_row_to_entity(dbm, row) for row in rows if
+            filters is None or _is_filtered(row, filters, reverse_filters or {})], next_cursor
+
+
 def get_short_codes_by_entity_type(dbm, entity_type, filters=None):
     startkey = [entity_type]
     endkey = [entity_type, {}]
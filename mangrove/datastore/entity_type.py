@@ -4,6 +4,8 @@
 for example Clinic, Hospital, Waterpoints, School etc are entity types
 """
 
+from threading import Lock
+
 from mangrove.datastore.aggregationtree import AggregationTree
 from mangrove.datastore.database import DatabaseManager
 from mangrove.errors.MangroveException import EntityTypeAlreadyDefined
@@ -11,6 +13,45 @@ from mangrove.utils.types import is_not_empty, is_sequence
 
 ENTITY_TYPE_TREE_ID = u'entity_type_tree'
 
+_entity_type_registries = {}
+_entity_type_registries_lock = Lock()
+
+
+class EntityTypeRegistry(object):
+    """
+    The entity types of one revision of a database's entity type tree, with the lookups precomputed so the
+    tree and its graph are not rebuilt for every question.
+    """
+
+    def __init__(self, revision, paths):
+        self.revision = revision
+        self.paths = [list(path) for path in paths]
+        self._lower_case_paths = set(tuple(node.lower() for node in path) for path in self.paths)
+        self.unique_id_types = sorted([path[0] for path in self.paths if path[0] != 'reporter'])
+
+    def is_defined(self, entity_type):
+        return tuple(item.strip().lower() for item in entity_type) in self._lower_case_paths
+
+
+def get_entity_type_registry(dbm):
+    """
+    Returns the registry of the database's entity types. It is rebuilt only when the revision of the entity
+    type tree document has changed, which costs a HEAD request instead of loading and walking the tree.
+    """
+    revision = dbm._document_revision(ENTITY_TYPE_TREE_ID)
+    registry = _entity_type_registries.get(dbm)
+    if registry is not None and revision is not None and registry.revision == revision:
+        return registry
+    return _refresh_entity_type_registry(dbm, AggregationTree.get(dbm, ENTITY_TYPE_TREE_ID, get_or_create=True))
+
+
+def _refresh_entity_type_registry(dbm, entity_tree):
+    registry = EntityTypeRegistry(entity_tree._doc.rev, entity_tree.get_paths())
+    with _entity_type_registries_lock:
+        _entity_type_registries[dbm] = registry
+    return registry
+
+
 def define_type(dbm, entity_type):
     """
     Add this entity type to the tree of all entity types and save it
@@ -25,6 +66,7 @@ def define_type(dbm, entity_type):
     entity_tree = AggregationTree.get(dbm, ENTITY_TYPE_TREE_ID, get_or_create=True)
     entity_tree.add_path([AggregationTree.root_id] + entity_type)
     entity_tree.save()
+    _refresh_entity_type_registry(dbm, entity_tree)
 
 def get_all_entity_types(dbm):
     """
@@ -33,11 +75,10 @@ def get_all_entity_types(dbm):
     tree and the node is represented by a list containing the node
     names in the path to this node.
     """
-    return AggregationTree.get(dbm, ENTITY_TYPE_TREE_ID, get_or_create=True).get_paths()
+    return [list(path) for path in get_entity_type_registry(dbm).paths]
 
 def get_unique_id_types(manager):
-    entity_types = get_all_entity_types(manager)
-    return sorted([entity_type[0] for entity_type in entity_types if entity_type[0] != 'reporter'])
+    return list(get_entity_type_registry(manager).unique_id_types)
 
 def delete_type(dbm, entity):
     assert isinstance(dbm, DatabaseManager)
@@ -45,17 +86,11 @@ def delete_type(dbm, entity):
     for entity_item in entity:
         entity_tree.remove_node(entity_item)
         entity_tree.save()
+    _refresh_entity_type_registry(dbm, entity_tree)
 
 def entity_type_already_defined(dbm, entity_type):
     """
     Return True if entity_type is already defined else false
     """
-    type_path = [item.strip() for item in entity_type]
-    all_entities = get_all_entity_types(dbm)
-    if all_entities:
-        all_entities_lower_case = [[x.lower() for x in each] for each in all_entities]
-        entity_type_lower_case = [each.lower() for each in type_path]
-        if entity_type_lower_case in all_entities_lower_case:
-            return True
-    return False
+    return get_entity_type_registry(dbm).is_defined(entity_type)
 
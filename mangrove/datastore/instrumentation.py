@@ -0,0 +1,73 @@
+import logging
+from bisect import bisect_left
+from threading import Lock
+
+from mangrove.utils.json_codecs import encode_json
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SLOW_QUERY_THRESHOLD_MS = 1000
+
+logger = logging.getLogger('view-queries')
+
+
+class ViewQueryInstrumentation(object):
+    """
+    Collects per view statistics for every view query a DatabaseManager runs: call count, rows, latency
+    histogram and, when measure_response_size is set, the size of the rows as JSON. Queries slower than
+    slow_query_threshold_ms are logged with their parameters.
+
+    snapshot() returns a copy of the statistics that monitoring can scrape.
+    """
+
+    def __init__(self, slow_query_threshold_ms=SLOW_QUERY_THRESHOLD_MS, measure_response_size=False,
+                 buckets_ms=LATENCY_BUCKETS_MS):
+        self.slow_query_threshold_ms = slow_query_threshold_ms
+        self.measure_response_size = measure_response_size
+        self.buckets_ms = tuple(buckets_ms)
+        self._stats = {}
+        self._lock = Lock()
+
+    def record(self, view_name, params, latency_ms, rows):
+        row_count = len(rows)
+        response_size = len(encode_json(rows)) if self.measure_response_size else 0
+        bucket = bisect_left(self.buckets_ms, latency_ms)
+        with self._lock:
+            stats = self._stats.get(view_name)
+            if stats is None:
+                stats = self._stats[view_name] = _new_view_stats(len(self.buckets_ms) + 1)
+            stats['count'] += 1
+            stats['rows'] += row_count
+            stats['response_bytes'] += response_size
+            stats['total_ms'] += latency_ms
+            stats['max_ms'] = max(stats['max_ms'], latency_ms)
+            stats['histogram'][bucket] += 1
+            if latency_ms >= self.slow_query_threshold_ms:
+                stats['slow'] += 1
+        if latency_ms >= self.slow_query_threshold_ms:
+            logger.warning("Slow view query %s took %.1f ms (%d rows) with %r" % (view_name, latency_ms, row_count,
+                                                                                   params))
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {}
+            for view_name, stats in self._stats.iteritems():
+                view_snapshot = dict(stats)
+                view_snapshot['histogram'] = self._labelled_histogram(stats['histogram'])
+                snapshot[view_name] = view_snapshot
+            return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def _labelled_histogram(self, counts):
+        labels = ['le_%s' % bucket for bucket in self.buckets_ms] + ['inf']
+        return dict(zip(labels, counts))
+
+
+def _new_view_stats(bucket_count):
+    return {'count': 0, 'rows': 0, 'response_bytes': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'slow': 0,
+            'histogram': [0] * bucket_count}
+
+
+view_query_instrumentation = ViewQueryInstrumentation()
@@ -4,4 +4,8 @@ COUCHDB_USERNAME = 'admin'
 COUCHDB_PASSWORD = 'admin'
 COUCHDB_CREDENTIALS = (COUCHDB_USERNAME,COUCHDB_PASSWORD)
 CACHE_SERVERS = ["127.0.0.1"]
-
+CACHE_BACKEND = 'memcached'
+CACHE_POOL_SIZE = 10
+CACHE_CONNECT_TIMEOUT_MS = 1000
+CACHE_RECEIVE_TIMEOUT_MS = 1000
+CACHE_SEND_TIMEOUT_MS = 1000
@@ -0,0 +1,73 @@
+from threading import Lock
+
+from mangrove.datastore.documents import ShortCodeSequenceDocument
+from mangrove.datastore.queries import get_entity_count_for_type
+from mangrove.errors.MangroveException import FailedToSaveDataObject
+
+SHORT_CODE_BLOCK_SIZE = 20
+SHORT_CODE_RESERVATION_ATTEMPTS = 10
+
+
+class ShortCodeAllocator(object):
+    """
+    Hands out generated short codes from blocks reserved on a per entity type sequence document.
+
+    A block is reserved by moving the sequence on with an optimistic (revision checked) save, so two workers
+    never get the same block, and the codes of a block that are already taken are dropped with one view query.
+    Codes are then handed out from memory. Codes left in a block when the process stops are never used.
+    Reservations hold a lock of their database and entity type only, so they do not hold up other entity types.
+    """
+
+    def __init__(self, block_size=SHORT_CODE_BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks = {}
+        self._locks = {}
+        self._lock = Lock()
+
+    def next_short_code(self, dbm, entity_type):
+        key = (dbm, entity_type.lower())
+        with self._key_lock(key):
+            block = self._blocks.get(key)
+            while not block:
+                block = self._blocks[key] = self._reserve_block(dbm, entity_type)
+            return block.pop(0)
+
+    def clear(self):
+        with self._lock:
+            self._blocks = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = Lock()
+            return lock
+
+    def _reserve_block(self, dbm, entity_type):
+        start = _reserve_sequence_values(dbm, entity_type.lower(), self.block_size)
+        prefix = entity_type.lower().replace(" ", "")[:3]
+        short_codes = [prefix + str(number) for number in range(start, start + self.block_size)]
+        rows = dbm.view.entity_by_short_code(keys=[[[entity_type], short_code] for short_code in short_codes])
+        taken = set(row['key'][1] for row in rows)
+        return [short_code for short_code in short_codes if short_code not in taken]
+
+
+def _reserve_sequence_values(dbm, entity_type, count):
+    sequence_id = "short_code_sequence_%s" % entity_type
+    for attempt in range(SHORT_CODE_RESERVATION_ATTEMPTS):
+        sequence = dbm._load_document(sequence_id, ShortCodeSequenceDocument)
+        if sequence is None:
+            sequence = ShortCodeSequenceDocument(sequence_id, entity_type,
+                                                 get_entity_count_for_type(dbm, entity_type) + 1)
+        start = sequence.next_value
+        sequence.next_value = start + count
+        if dbm._save_documents([sequence])[0][0]:
+            return start
+    raise FailedToSaveDataObject("Could not reserve short codes for %s" % entity_type)
+
+
+short_code_allocator = ShortCodeAllocator()
+
+
+def next_short_code(dbm, entity_type):
+    return short_code_allocator.next_short_code(dbm, entity_type)
@@ -0,0 +1,88 @@
+import unittest
+from mock import patch
+from mangrove.datastore import cache_manager
+from mangrove.datastore.cache_manager import LocalCacheManager, MemcachedCacheManager, get_cache_manager, \
+    set_cache_manager, get_large_value, set_large_value
+
+
+class TestCacheManager(unittest.TestCase):
+    def tearDown(self):
+        set_cache_manager(None)
+
+    def test_should_reuse_the_same_cache_manager(self):
+        self.assertIs(get_cache_manager(), get_cache_manager())
+
+    def test_should_build_memcached_cache_manager_with_configured_pool_size(self):
+        with patch.object(cache_manager.settings, 'CACHE_POOL_SIZE', 3):
+            manager = get_cache_manager()
+        self.assertIsInstance(manager, MemcachedCacheManager)
+        self.assertEqual(3, manager._pool.qsize())
+
+    def test_should_build_local_cache_manager_when_configured(self):
+        with patch.object(cache_manager.settings, 'CACHE_BACKEND', 'local'):
+            self.assertIsInstance(get_cache_manager(), LocalCacheManager)
+
+    def test_should_use_cache_manager_that_was_set(self):
+        manager = LocalCacheManager()
+        set_cache_manager(manager)
+        self.assertIs(manager, get_cache_manager())
+
+
+class TestLocalCacheManager(unittest.TestCase):
+    def setUp(self):
+        self.cache = LocalCacheManager()
+
+    def test_should_return_copy_of_cached_value(self):
+        value = {'form_code': 'cli001', 'json_fields': []}
+        self.cache.set('key', value)
+        cached_value = self.cache.get('key')
+        cached_value['json_fields'].append({'code': 'q1'})
+        self.assertEqual(value, self.cache.get('key'))
+
+    def test_should_expire_values(self):
+        with patch('mangrove.datastore.cache_manager.current_time') as current_time:
+            current_time.return_value = 100
+            self.cache.set('key', 'value', time=10)
+            current_time.return_value = 111
+            self.assertIsNone(self.cache.get('key'))
+
+    def test_should_delete_and_flush_values(self):
+        self.cache.set_multi({'first': 1, 'second': 2})
+        self.cache.delete('first')
+        self.assertEqual({'second': 2}, self.cache.get_multi(['first', 'second']))
+        self.cache.flush_all()
+        self.assertIsNone(self.cache.get('second'))
+
+
+class TestLargeValues(unittest.TestCase):
+    def setUp(self):
+        self.cache = LocalCacheManager()
+        self.questionnaire = {'form_code': 'cli001', 'xform': ''.join(str(i) for i in range(5000))}
+
+    def test_should_store_small_value_compressed_under_one_key(self):
+        self.assertTrue(set_large_value(self.cache, 'key', self.questionnaire))
+        self.assertEqual(1, len(self.cache._values))
+        self.assertEqual(self.questionnaire, get_large_value(self.cache, 'key'))
+
+    def test_should_split_value_bigger_than_chunk_size_into_chunks(self):
+        with patch.object(cache_manager, 'CACHE_CHUNK_SIZE', 1024):
+            self.assertTrue(set_large_value(self.cache, 'key', self.questionnaire))
+            self.assertGreater(len(self.cache._values), 2)
+            self.assertEqual(self.questionnaire, get_large_value(self.cache, 'key'))
+
+    def test_should_treat_missing_chunk_as_cache_miss(self):
+        with patch.object(cache_manager, 'CACHE_CHUNK_SIZE', 1024):
+            set_large_value(self.cache, 'key', self.questionnaire)
+            self.cache.delete('key_chunk_%s_0' % self.cache.get('key')[1])
+            self.assertIsNone(get_large_value(self.cache, 'key'))
+
+    def test_should_report_value_too_large_to_cache(self):
+        with patch.object(cache_manager, 'CACHE_CHUNK_SIZE', 16):
+            with patch.object(cache_manager, 'logger') as logger:
+                self.assertFalse(set_large_value(self.cache, 'key', self.questionnaire))
+                self.assertTrue(logger.warning.called)
+        self.assertIsNone(get_large_value(self.cache, 'key'))
+
+    def test_should_return_values_stored_before_compression_as_is(self):
+        self.cache.set('key', self.questionnaire)
+        self.assertEqual(self.questionnaire, get_large_value(self.cache, 'key'))
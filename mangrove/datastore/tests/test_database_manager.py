@@ -1,9 +1,18 @@
+from collections import OrderedDict
+import json
+from StringIO import StringIO
 
 
+from couchdb.client import Row
+from couchdb.http import ResourceConflict
+from mock import Mock
 from mangrove.datastore.documents import DocumentBase
 from mangrove.datastore.entity import EntityDocument
-from mangrove.datastore.database import get_db_manager, _delete_db_and_remove_db_manager
+from mangrove.datastore.database import get_db_manager, _delete_db_and_remove_db_manager, DatabaseManager, View, \
+    unit_of_work
+from mangrove.datastore.instrumentation import ViewQueryInstrumentation
 import unittest
+from mangrove.errors.MangroveException import FailedToSaveDataObject
 from mangrove.utils.test_utils.database_utils import uniq
 
 
@@ -40,3 +49,182 @@ class TestDatabaseManager(unittest.TestCase):
 
     def test_should_return_none_if_no_document_for_id(self):
         self.assertIsNone(self.database_manager._load_document('123abc', EntityDocument))
+
+
+class FakeViewDatabase(object):
+    def __init__(self, rows):
+        self.all_rows = rows
+        self.queries = []
+
+    def view(self, name, **options):
+        self.queries.append(options)
+        rows = self.all_rows
+        if 'startkey' in options:
+            rows = [row for row in rows if (row.key, row.id) >= (options['startkey'], options['startkey_docid'])]
+        return Mock(rows=rows[:options.get('limit', len(rows))])
+
+
+class TestViewPaging(unittest.TestCase):
+    def setUp(self):
+        self.database_manager = DatabaseManager.__new__(DatabaseManager)
+        self.database_manager.instrumentation = ViewQueryInstrumentation()
+        self.database_manager.view = View(self.database_manager)
+        self.database_manager.database = FakeViewDatabase(
+            [Row(id='doc%d' % (i / 2), key=[i / 2, i], value=i) for i in range(7)])
+
+    def test_should_return_page_and_cursor_of_next_page(self):
+        rows, cursor = self.database_manager.load_view_page('by_short_codes', 3)
+        self.assertEqual([0, 1, 2], [row.value for row in rows])
+        rows, cursor = self.database_manager.load_view_page('by_short_codes', 3, cursor)
+        self.assertEqual([3, 4, 5], [row.value for row in rows])
+        rows, cursor = self.database_manager.load_view_page('by_short_codes', 3, cursor)
+        self.assertEqual([6], [row.value for row in rows])
+        self.assertIsNone(cursor)
+
+    def test_should_iterate_all_rows_in_batches_without_skip(self):
+        rows = list(self.database_manager.iter_view('by_short_codes', batch_size=2, reduce=False))
+        self.assertEqual(range(7), [row.value for row in rows])
+        self.assertEqual(4, len(self.database_manager.database.queries))
+        for query in self.database_manager.database.queries:
+            self.assertEqual(3, query['limit'])
+            self.assertNotIn('skip', query)
+
+    def test_should_record_every_view_query(self):
+        list(self.database_manager.iter_view('by_short_codes', batch_size=5))
+        self.database_manager.view.by_short_codes(limit=1)
+        stats = self.database_manager.instrumentation.snapshot()['by_short_codes']
+        self.assertEqual(3, stats['count'])
+        self.assertEqual(9, stats['rows'])
+
+
+class FakeBulkDatabase(object):
+    def __init__(self, conflicting_ids=()):
+        self.conflicting_ids = conflicting_ids
+        self.updates = []
+
+    def update(self, documents):
+        self.updates.append([document.id for document in documents])
+        return [(False, document.id, ResourceConflict()) if document.id in self.conflicting_ids
+                else (True, document.id, '1-rev') for document in documents]
+
+
+class TestUnitOfWork(unittest.TestCase):
+    def setUp(self):
+        self.database_manager = DatabaseManager.__new__(DatabaseManager)
+        self.database_manager.database = FakeBulkDatabase()
+        self.post_updates = []
+        self.documents = [DocumentBase(id='first'), DocumentBase(id='second')]
+        for document in self.documents:
+            document.post_update = self._record_post_update
+
+    def _record_post_update(self, dbm, prev_doc):
+        self.post_updates.append(len(self.database_manager.database.updates))
+
+    def test_should_save_all_documents_with_one_bulk_update(self):
+        with self.database_manager.unit_of_work() as unit:
+            for document in self.documents:
+                self.assertEqual(document.id, self.database_manager._save_document(document))
+            self.database_manager._save_document(self.documents[0])
+            self.assertEqual([], self.database_manager.database.updates)
+        self.assertEqual([['first', 'second']], self.database_manager.database.updates)
+        self.assertEqual('1-rev', self.documents[0].rev)
+        self.assertEqual([], unit.conflicts)
+
+    def test_should_run_post_update_hooks_after_the_bulk_update(self):
+        with unit_of_work(self.database_manager):
+            with unit_of_work(self.database_manager):
+                self.database_manager._save_document(self.documents[0])
+            self.database_manager._save_document(self.documents[1])
+        self.assertEqual([1, 1], self.post_updates)
+
+    def test_should_report_conflicts_per_document(self):
+        self.database_manager.database = FakeBulkDatabase(conflicting_ids=['second'])
+        with self.assertRaises(FailedToSaveDataObject):
+            with unit_of_work(self.database_manager) as unit:
+                for document in self.documents:
+                    self.database_manager._save_document(document)
+        self.assertEqual(['second'], [document_id for document_id, error in unit.conflicts])
+        self.assertEqual([1], self.post_updates)
+
+    def test_should_write_documents_saved_after_write_with_a_further_bulk_update(self):
+        written = DocumentBase(id='third')
+
+        def after_write(conflicting_ids):
+            self.assertEqual(set(['second']), conflicting_ids)
+            self.database_manager._save_document(written)
+
+        self.database_manager.database = FakeBulkDatabase(conflicting_ids=['second'])
+        with self.assertRaises(FailedToSaveDataObject):
+            with unit_of_work(self.database_manager) as unit:
+                for document in self.documents:
+                    self.database_manager._save_document(document)
+                unit.after_write(after_write)
+        self.assertEqual([['first', 'second'], ['third']], self.database_manager.database.updates)
+        self.assertEqual('1-rev', written.rev)
+        self.assertEqual(['second'], [document_id for document_id, error in unit.conflicts])
+
+    def test_should_save_queued_documents_when_block_raises(self):
+        with self.assertRaises(ValueError):
+            with unit_of_work(self.database_manager):
+                self.database_manager._save_document(self.documents[0])
+                raise ValueError()
+        self.assertEqual([['first']], self.database_manager.database.updates)
+        self.database_manager._save_document(self.documents[1])
+        self.assertEqual([['first'], ['second']], self.database_manager.database.updates)
+
+
+class FakeMultipartResource(object):
+    def __init__(self):
+        self.puts = []
+
+    def put_json(self, path, body=None, headers=None):
+        self.puts.append((path, body, headers))
+        return 201, {}, {'ok': True, 'id': path, 'rev': '2-rev'}
+
+
+class TestSaveDocumentWithAttachments(unittest.TestCase):
+    def setUp(self):
+        self.database_manager = DatabaseManager.__new__(DatabaseManager)
+        self.database_manager.database = FakeBulkDatabase()
+        self.database_manager.database.resource = FakeMultipartResource()
+        self.document = DocumentBase(id='response')
+        self.document._data['_rev'] = '1-rev'
+        self.document._data['_attachments'] = {
+            'kept.png': {'stub': True, 'content_type': 'image/png', 'length': 3, 'revpos': 1},
+            'removed.png': {'stub': True, 'content_type': 'image/png', 'length': 3, 'revpos': 1}}
+
+    def _parts(self, body, boundary):
+        return [part.split('\r\n\r\n', 1)[1][:-2] for part in body.split('--' + boundary)[1:-1]]
+
+    def test_should_save_document_and_attachments_with_one_request(self):
+        self.database_manager._save_document_with_attachments(
+            self.document, [('photo.jpg', StringIO('jpeg')), ('notes.txt', 'text')], ['removed.png'],
+            process_post_update=False)
+
+        [(path, body, headers)] = self.database_manager.database.resource.puts
+        self.assertEqual('response', path)
+        boundary = headers['Content-Type'].split('boundary="')[1][:-1]
+        document_part, photo, notes = self._parts(body, boundary)
+        attachments = json.loads(document_part, object_pairs_hook=OrderedDict)['_attachments']
+        self.assertEqual(['kept.png', 'photo.jpg', 'notes.txt'], attachments.keys())
+        self.assertEqual(True, attachments['kept.png']['stub'])
+        self.assertEqual({'follows': True, 'content_type': 'image/jpeg', 'length': 4}, attachments['photo.jpg'])
+        self.assertEqual(['jpeg', 'text'], [photo, notes])
+        self.assertEqual('2-rev', self.document.rev)
+        self.assertEqual(['kept.png', 'notes.txt', 'photo.jpg'], sorted(self.document._data['_attachments']))
+        self.assertEqual([], self.database_manager.database.updates)
+
+    def test_should_write_attached_document_of_unit_of_work_with_one_request(self):
+        post_updates = []
+        self.document.post_update = lambda dbm, prev_doc: post_updates.append(self.document.rev)
+        other = DocumentBase(id='other')
+        with unit_of_work(self.database_manager) as unit:
+            self.database_manager._save_document(other)
+            self.database_manager._save_document(self.document)
+            unit.attach(self.document, [('notes.txt', 'text')], ['removed.png'])
+            self.assertEqual([], self.database_manager.database.resource.puts)
+        self.assertEqual(1, len(self.database_manager.database.resource.puts))
+        self.assertEqual([['other']], self.database_manager.database.updates)
+        self.assertEqual(['2-rev'], post_updates)
+        self.assertEqual(['kept.png', 'notes.txt'], sorted(self.document._data['_attachments']))
+        self.assertEqual([(True, 'other', '1-rev'), (True, 'response', '2-rev')], unit.results)
@@ -3,11 +3,12 @@ from datetime import datetime
 import unittest
 from mock import Mock, patch
 from pytz import UTC
-from mangrove.datastore.entity import Entity, get_by_short_code, create_entity, get_all_entities, DataRecord, void_entity, get_by_short_code_include_voided
+from mangrove.datastore.entity import Entity, get_by_short_code, create_entity, get_all_entities, DataRecord, void_entity, get_by_short_code_include_voided, \
+    create_entities_bulk
 from mangrove.datastore.tests.test_data import TestData
 from mangrove.errors.MangroveException import DataObjectAlreadyExists, EntityTypeDoesNotExistsException, DataObjectNotFound, FailedToSaveDataObject
 from mangrove.utils.test_utils.database_utils import create_dbmanager_for_ut, safe_define_type, ut_reporter_id
-from mangrove.datastore.database import _delete_db_and_remove_db_manager
+from mangrove.datastore.database import _delete_db_and_remove_db_manager, DatabaseManager
 from mangrove.datastore.cache_manager import get_cache_manager
 
 
@@ -396,5 +397,46 @@ def get(dbm, id):
     return dbm.get(id, Entity)
 
 
+class TestCreateEntitiesBulk(unittest.TestCase):
+    def setUp(self):
+        self.dbm = Mock(spec=DatabaseManager)
+        self.dbm.view = Mock()
+        self.dbm.view.entity_by_short_code.return_value = [
+            {'key': [['clinic'], 'cli1'], 'doc': {'data': {'name': {'value': 'Clinic One'}}}}]
+        self.dbm._save_documents.side_effect = lambda documents: [(True, document.id, '1-rev') for document in
+                                                                  documents]
+        self.rows = [{'short_code': 'CLI1'}, {'short_code': 'cli2', 'data': [('name', 'Clinic Two')]},
+                     {'short_code': 'cli3'}, {'short_code': 'Cli2'}]
+
+    def test_should_check_type_once_and_short_codes_and_writes_once_per_chunk(self):
+        with patch('mangrove.datastore.entity.entity_type_already_defined') as entity_type_already_defined:
+            entity_type_already_defined.return_value = True
+            create_entities_bulk(self.dbm, ['clinic'], self.rows, chunk_size=2)
+
+        self.assertEqual(1, entity_type_already_defined.call_count)
+        self.assertEqual(2, self.dbm.view.entity_by_short_code.call_count)
+        self.assertEqual(2, self.dbm._save_documents.call_count)
+        first_chunk_documents = self.dbm._save_documents.call_args_list[0][0][0]
+        self.assertEqual(['Entity', 'DataRecord'], [document.document_type for document in first_chunk_documents])
+
+    def test_should_return_result_for_every_row(self):
+        with patch('mangrove.datastore.entity.entity_type_already_defined') as entity_type_already_defined:
+            entity_type_already_defined.return_value = True
+            results = create_entities_bulk(self.dbm, ['clinic'], self.rows)
+
+        self.assertEqual([False, True, True, False], [success for success, short_code, value in results])
+        self.assertEqual(['CLI1', 'cli2', 'cli3', 'Cli2'], [short_code for success, short_code, value in results])
+        self.assertIsInstance(results[0][2], DataObjectAlreadyExists)
+        self.assertEqual('Clinic One', results[0][2].data[3])
+        self.assertEqual('Clinic Two', results[1][2].value('name'))
+
+    def test_should_not_create_entities_of_undefined_type(self):
+        with patch('mangrove.datastore.entity.entity_type_already_defined') as entity_type_already_defined:
+            entity_type_already_defined.return_value = False
+            with self.assertRaises(EntityTypeDoesNotExistsException):
+                create_entities_bulk(self.dbm, ['clinic'], self.rows)
+        self.assertFalse(self.dbm._save_documents.called)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
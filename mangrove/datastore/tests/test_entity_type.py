@@ -1,8 +1,10 @@
 
 import unittest
-from mangrove.datastore.database import _delete_db_and_remove_db_manager, get_db_manager
+from mock import Mock, patch
+from mangrove.datastore.database import _delete_db_and_remove_db_manager, get_db_manager, DatabaseManager
 from mangrove.datastore.entity import Entity
-from mangrove.datastore.entity_type import get_all_entity_types, define_type, delete_type
+from mangrove.datastore.entity_type import get_all_entity_types, define_type, delete_type, \
+    entity_type_already_defined, get_unique_id_types
 from mangrove.errors.MangroveException import EntityTypeAlreadyDefined
 from mangrove.utils.test_utils.database_utils import uniq
 
@@ -70,3 +72,35 @@ class TestEntityType(unittest.TestCase):
 
         for e in expected:
             self.assertIn(e, entity_types)
+
+
+class TestEntityTypeRegistry(unittest.TestCase):
+    def setUp(self):
+        self.dbm = Mock(spec=DatabaseManager)
+        self.dbm._document_revision.return_value = '1-abc'
+        self.tree = Mock()
+        self.tree._doc.rev = '1-abc'
+        self.tree.get_paths.return_value = [['clinic'], ['reporter'], ['HealthFacility'], ['HealthFacility', 'Hospital']]
+
+    def test_should_load_entity_type_tree_once_per_revision(self):
+        with patch('mangrove.datastore.entity_type.AggregationTree') as aggregation_tree:
+            aggregation_tree.get.return_value = self.tree
+            self.assertTrue(entity_type_already_defined(self.dbm, [' healthfacility', 'HOSPITAL']))
+            self.assertFalse(entity_type_already_defined(self.dbm, ['hospital']))
+            self.assertEqual(['HealthFacility', 'HealthFacility', 'clinic'], get_unique_id_types(self.dbm))
+            self.assertEqual(1, aggregation_tree.get.call_count)
+
+            self.dbm._document_revision.return_value = '2-def'
+            get_all_entity_types(self.dbm)
+            self.assertEqual(2, aggregation_tree.get.call_count)
+
+    def test_should_refresh_registry_when_type_is_defined(self):
+        with patch('mangrove.datastore.entity_type.AggregationTree') as aggregation_tree:
+            aggregation_tree.get.return_value = self.tree
+            define_type(self.dbm, ['waterpoint'])
+            self.tree.get_paths.return_value = [['waterpoint']]
+            self.tree._doc.rev = '2-def'
+            define_type(self.dbm, ['school'])
+            self.dbm._document_revision.return_value = '2-def'
+            self.assertEqual([['waterpoint']], get_all_entity_types(self.dbm))
+            self.assertEqual(3, aggregation_tree.get.call_count)
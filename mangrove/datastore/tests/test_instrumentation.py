@@ -0,0 +1,47 @@
+import unittest
+from mock import patch
+from mangrove.datastore.instrumentation import ViewQueryInstrumentation
+
+
+class TestViewQueryInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.instrumentation = ViewQueryInstrumentation(slow_query_threshold_ms=500, buckets_ms=(10, 100))
+
+    def test_should_aggregate_queries_per_view(self):
+        self.instrumentation.record('questionnaire', {'key': 'cli001'}, 4.0, [{'value': 1}])
+        self.instrumentation.record('questionnaire', {'key': 'cli002'}, 40.0, [{'value': 1}, {'value': 2}])
+        self.instrumentation.record('by_short_codes', {}, 400.0, [])
+
+        snapshot = self.instrumentation.snapshot()
+
+        questionnaire = snapshot['questionnaire']
+        self.assertEqual(2, questionnaire['count'])
+        self.assertEqual(3, questionnaire['rows'])
+        self.assertEqual(44.0, questionnaire['total_ms'])
+        self.assertEqual(40.0, questionnaire['max_ms'])
+        self.assertEqual({'le_10': 1, 'le_100': 1, 'inf': 0}, questionnaire['histogram'])
+        self.assertEqual({'le_10': 0, 'le_100': 0, 'inf': 1}, snapshot['by_short_codes']['histogram'])
+
+    def test_should_measure_response_size_only_when_asked(self):
+        self.instrumentation.record('questionnaire', {}, 1.0, [{'value': 1}])
+        self.assertEqual(0, self.instrumentation.snapshot()['questionnaire']['response_bytes'])
+
+        instrumentation = ViewQueryInstrumentation(measure_response_size=True)
+        instrumentation.record('questionnaire', {}, 1.0, [{'value': 1}])
+        self.assertEqual(len('[{"value": 1}]'), instrumentation.snapshot()['questionnaire']['response_bytes'])
+
+    def test_should_log_slow_queries(self):
+        with patch('mangrove.datastore.instrumentation.logger') as logger:
+            self.instrumentation.record('questionnaire', {'key': 'cli001'}, 10.0, [])
+            self.assertFalse(logger.warning.called)
+            self.instrumentation.record('questionnaire', {'key': 'cli001'}, 600.0, [])
+            self.assertTrue(logger.warning.called)
+        self.assertEqual(1, self.instrumentation.snapshot()['questionnaire']['slow'])
+
+    def test_should_not_share_snapshot_with_live_statistics(self):
+        self.instrumentation.record('questionnaire', {}, 1.0, [])
+        snapshot = self.instrumentation.snapshot()
+        self.instrumentation.record('questionnaire', {}, 1.0, [])
+        self.assertEqual(1, snapshot['questionnaire']['count'])
+        self.instrumentation.reset()
+        self.assertEqual({}, self.instrumentation.snapshot())
@@ -0,0 +1,61 @@
+from threading import Event, Thread
+import unittest
+from mock import Mock, patch
+from mangrove.datastore.database import DatabaseManager
+from mangrove.datastore.documents import ShortCodeSequenceDocument
+from mangrove.datastore.short_codes import ShortCodeAllocator
+from mangrove.errors.MangroveException import FailedToSaveDataObject
+
+
+class TestShortCodeAllocator(unittest.TestCase):
+    def setUp(self):
+        self.dbm = Mock(spec=DatabaseManager)
+        self.dbm.view = Mock()
+        self.dbm.view.entity_by_short_code.return_value = []
+        self.sequence = ShortCodeSequenceDocument('short_code_sequence_clinic', 'clinic', 11)
+        self.dbm._load_document.return_value = self.sequence
+        self.dbm._save_documents.return_value = [(True, self.sequence.id, '2-rev')]
+        self.allocator = ShortCodeAllocator(block_size=3)
+
+    def test_should_hand_out_codes_of_a_block_without_queries(self):
+        codes = [self.allocator.next_short_code(self.dbm, 'Clinic') for i in range(4)]
+        self.assertEqual(['cli11', 'cli12', 'cli13', 'cli14'], codes)
+        self.assertEqual(2, self.dbm._save_documents.call_count)
+        self.assertEqual(2, self.dbm.view.entity_by_short_code.call_count)
+
+    def test_should_seed_new_sequence_from_entity_count(self):
+        self.dbm._load_document.return_value = None
+        with patch('mangrove.datastore.short_codes.get_entity_count_for_type') as get_entity_count_for_type:
+            get_entity_count_for_type.return_value = 4
+            self.assertEqual('cli5', self.allocator.next_short_code(self.dbm, 'clinic'))
+        saved_sequence = self.dbm._save_documents.call_args[0][0][0]
+        self.assertEqual(8, saved_sequence.next_value)
+
+    def test_should_retry_reservation_on_conflict(self):
+        self.dbm._save_documents.side_effect = [[(False, self.sequence.id, Exception('conflict'))],
+                                                [(True, self.sequence.id, '3-rev')]]
+        self.assertEqual('cli14', self.allocator.next_short_code(self.dbm, 'clinic'))
+
+    def test_should_give_up_when_sequence_keeps_conflicting(self):
+        self.dbm._save_documents.return_value = [(False, self.sequence.id, Exception('conflict'))]
+        with self.assertRaises(FailedToSaveDataObject):
+            self.allocator.next_short_code(self.dbm, 'clinic')
+
+    def test_should_not_hold_up_other_entity_types_while_reserving(self):
+        reserving, release = Event(), Event()
+
+        def load_document(sequence_id, document_class):
+            if sequence_id == 'short_code_sequence_clinic':
+                reserving.set()
+                release.wait(5)
+            return ShortCodeSequenceDocument(sequence_id, sequence_id.split('_')[-1], 1)
+
+        self.dbm._load_document.side_effect = load_document
+        codes = []
+        clinic = Thread(target=lambda: codes.append(self.allocator.next_short_code(self.dbm, 'clinic')))
+        clinic.start()
+        reserving.wait(5)
+        codes.append(self.allocator.next_short_code(self.dbm, 'school'))
+        release.set()
+        clinic.join(5)
+        self.assertEqual(['sch1', 'cli1'], codes)
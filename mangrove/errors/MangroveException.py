@@ -323,4 +323,15 @@ class DatasenderIsNotLinkedException(MangroveException):
 
 class CodeSheetMissingException(MangroveException):
     def __init__(self, message="The template you are using is not correct, please use DataWinners template and try again"):
-        MangroveException.__init__(self,message)
\ No newline at end of file
+        MangroveException.__init__(self,message)
+
+class SubmissionQueueFullException(MangroveException):
+    def __init__(self, max_queue_size):
+        MangroveException.__init__(self, u"Submission queue is full (%d submissions waiting), try again later." %
+                                         max_queue_size, (max_queue_size,))
+
+
+class SubmissionNotProcessedException(MangroveException):
+    def __init__(self, ordering_key):
+        MangroveException.__init__(self, u"Submission from %s has not been processed yet." % ordering_key,
+                                   (ordering_key,))
@@ -128,7 +128,7 @@ class EnrichedSurveyResponseBuilder(object):
         return selected
 
     def _option_value(self, field, value):
-        for option in field.options:
+        for option in field.option_view:
             if option.get('val') == value:
                 return option.get('text')
         return None
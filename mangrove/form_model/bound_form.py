@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+
+def index_by_lower_case_key(values):
+    index = {}
+    for key, value in values.iteritems():
+        index.setdefault(key.lower(), value)
+    return index
+
+
+class BoundForm(object):
+    """
+    The answers of one submission bound to a form model, with the errors found validating them.
+
+    Neither the form model nor its fields are changed, so one cached form model can be bound to submissions
+    on many threads at once.
+    """
+
+    def __init__(self, form_model, submission):
+        self.form_model = form_model
+        self.submission = submission
+        answers = index_by_lower_case_key(submission)
+        self.values = OrderedDict((field.code, field.bind_value(answers.get(field.code.lower())))
+                                  for field in form_model.fields)
+        self.cleaned_data = None
+        self.errors = OrderedDict()
+        self.exceptions = []
+
+    def value(self, code):
+        return self.values.get(code)
+
+    def bound_values(self):
+        return dict(self.values)
+
+    def stringify(self):
+        return OrderedDict((field.code, field.stringify_value(self.values[field.code]))
+                           for field in self.form_model.fields)
+
+    def validate(self):
+        """
+        Validates the submission against the form model's validators and questions. Returns the cleaned answers
+        and the errors, which are also kept on the bound form with the exceptions raised.
+        """
+        form_model = self.form_model
+        errors = OrderedDict()
+        exceptions = []
+        if not form_model.xform:
+            for validator in form_model.validators:
+                errors.update(validator.validate(self.submission, form_model.fields, form_model._dbm))
+                if hasattr(validator, 'exception'):
+                    exceptions.extend(getattr(validator, 'exception'))
+        cleaned_values, answer_errors, answer_exceptions = form_model.submission_validator.validate(self.submission)
+        exceptions.extend(answer_exceptions)
+        for code, message in answer_errors.iteritems():
+            if not errors.get(code):
+                errors[code] = message
+        self.cleaned_data, self.errors, self.exceptions = cleaned_values, errors, exceptions
+        return cleaned_values, errors
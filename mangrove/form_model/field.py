@@ -1,8 +1,12 @@
 from collections import OrderedDict
+import copy
+import json
 import re
 from HTMLParser import HTMLParser
 import abc
 from datetime import datetime
+from threading import Lock
+from weakref import WeakValueDictionary
 
 from babel.dates import format_date
 from coverage.html import escape
@@ -311,87 +315,121 @@ class field_attributes(object):
     SELECT_ONE_EXTERNAL_FIELD = "select_one_external"
 
 
+def _slot_names(cls):
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get('__slots__', ())
+        for name in (slots,) if isinstance(slots, basestring) else slots:
+            if name not in ('__weakref__', '__dict__') and name not in names:
+                names.append(name)
+    return names
+
+
 class Field(object):
+    __slots__ = ('_name', '_type', '_code', '_label', '_instruction', '_required', '_parent_field_code', '_hint',
+                 '_constraint_message', '_appearance', '_default', '_xform_constraint', '_relevant',
+                 '_constraints_json', 'constraints', 'errors', 'value', '__weakref__')
+
+    def __getstate__(self):
+        # Fields keep their attributes in slots, which pickle only copies by itself from protocol 2 on
+        state = dict(getattr(self, '__dict__', {}))
+        for name in _slot_names(type(self)):
+            if hasattr(self, name):
+                state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+
     def __init__(self, type="", name="", code="", label='', instruction='',
                  constraints=None, required=True, parent_field_code=None, hint=None, constraint_message=None,
                  appearance=None, default=None, xform_constraint=None, relevant=None):
         if not constraints: constraints = []
-        self._dict = {}
-        self._dict = {'name': name, 'type': type, 'code': code, 'instruction': instruction,
-                      'label': label, 'required': required, 'parent_field_code': parent_field_code,
-                      'hint': hint, 'constraint_message': constraint_message, 'appearance': appearance,
-                      'default': default, 'xform_constraint': xform_constraint,
-                      'relevant': relevant}
+        self._name = name
+        self._type = type
+        self._code = code
+        self._label = label
+        self._instruction = instruction
+        self._required = required
+        self._parent_field_code = parent_field_code
+        self._hint = hint
+        self._constraint_message = constraint_message
+        self._appearance = appearance
+        self._default = default
+        self._xform_constraint = xform_constraint
+        self._relevant = relevant
+        self._constraints_json = None
         self.constraints = constraints
         self.errors = []
         self.value = None
         if not is_empty(constraints):
-            self._dict['constraints'] = []
+            self._constraints_json = []
             for constraint in constraints:
                 constraint_json = constraint._to_json()
                 if not is_empty(constraint_json):
-                    self._dict['constraints'].append(constraint_json)
+                    self._constraints_json.append(constraint_json)
 
     @property
     def name(self):
-        return self._dict.get("name")
+        return self._name
 
     def set_name(self, new_name):
-        self._dict["name"] = new_name
+        self._name = new_name
 
     def set_label(self, new_label):
-        self._dict["label"] = new_label
+        self._label = new_label
 
     def set_instruction(self, new_instruction):
-        self._dict["instruction"] = new_instruction
+        self._instruction = new_instruction
 
     def set_constraints(self, new_constraints):
-        self._dict["constraints"] = new_constraints
+        self._constraints_json = new_constraints
         self.constraints = new_constraints
 
     @property
     def label(self):
-        return self._dict.get('label')
+        return self._label
 
     @property
     def type(self):
-        return self._dict.get('type')
+        return self._type
 
     @property
     def code(self):
-        return self._dict.get('code')
+        return self._code
 
     @property
     def instruction(self):
-        return self._dict.get('instruction')
+        return self._instruction
 
     @property
     def hint(self):
-        return self._dict.get('hint')
+        return self._hint
 
     @property
     def appearance(self):
-        return self._dict.get('appearance')
+        return self._appearance
 
     @property
     def default(self):
-        return self._dict.get('default')
+        return self._default
 
     @property
     def constraint_message(self):
-        return self._dict.get('constraint_message')
+        return self._constraint_message
 
     @property
     def xform_constraint(self):
-        return self._dict.get('xform_constraint')
+        return self._xform_constraint
 
     @property
     def relevant(self):
-        return self._dict.get('relevant')
+        return self._relevant
 
     @property
     def parent_field_code(self):
-        return self._dict.get('parent_field_code')
+        return self._parent_field_code
 
     @property
     def is_entity_field(self):
@@ -409,9 +447,12 @@ class Field(object):
         return False
 
     def _to_json(self):
-        dict = self._dict.copy()
-        dict['instruction'] = self._dict['instruction']
-
+        dict = {'name': self._name, 'type': self._type, 'code': self._code, 'instruction': self._instruction,
+                'label': self._label, 'required': self._required, 'parent_field_code': self._parent_field_code,
+                'hint': self._hint, 'constraint_message': self._constraint_message, 'appearance': self._appearance,
+                'default': self._default, 'xform_constraint': self._xform_constraint, 'relevant': self._relevant}
+        if self._constraints_json is not None:
+            dict['constraints'] = self._constraints_json
         return dict
 
     def _to_json_view(self):
@@ -424,28 +465,40 @@ class Field(object):
         return json
 
     def set_value(self, value):
-        self.value = value
+        self.value = self.bind_value(value)
+
+    def bind_value(self, value):
+        """
+        Returns the answer as set_value would hold it, without changing the field.
+        """
+        return value
 
     def get_constraint_text(self):
         return ""
 
     def is_required(self):
-        return self._dict['required']
+        return self._required
 
     def set_required(self, required):
-        self._dict["required"] = required
+        self._required = required
 
     def validate(self, value):
         if self.is_required() and is_empty(value):
             raise RequiredFieldNotPresentException(self.code)
 
     def convert_to_unicode(self):
-        if self.value is None:
+        return self.value_to_unicode(self.value)
+
+    def value_to_unicode(self, value):
+        if value is None:
             return unicode("")
-        return unicode(self.value)
+        return unicode(value)
 
     def stringify(self):
-        return self.convert_to_unicode()
+        return self.stringify_value(self.value)
+
+    def stringify_value(self, value):
+        return self.value_to_unicode(value)
 
     def xform_constraints(self):
         return " and ".join(filter(None, [constraint.xform_constraint() for constraint in self.constraints]))
@@ -456,6 +509,8 @@ class Field(object):
 
 
 class IntegerField(Field):
+    __slots__ = ()
+
     def __init__(self, name, code, label, instruction=None,
                  constraints=None, required=True, parent_field_code=None, hint=None, constraint_message=None,
                  appearance=None, default=None, xform_constraint=None, relevant=None):
@@ -475,11 +530,11 @@ class IntegerField(Field):
             except Exception:
                 return float(value)
         except VdtValueTooBigError:
-            raise AnswerTooBigException(self._dict[field_attributes.FIELD_CODE], value)
+            raise AnswerTooBigException(self.code, value)
         except VdtValueTooSmallError:
-            raise AnswerTooSmallException(self._dict[field_attributes.FIELD_CODE], value)
+            raise AnswerTooSmallException(self.code, value)
         except VdtTypeError:
-            raise AnswerWrongType(self._dict[field_attributes.FIELD_CODE], value)
+            raise AnswerWrongType(self.code, value)
 
     def get_constraint_text(self):
         max, min = self._get_max_min()
@@ -512,6 +567,7 @@ class IntegerField(Field):
 
 
 class DateField(Field):
+    __slots__ = ('_date_format',)
     DATE_FORMAT = "date_format"
     DATE_DICTIONARY = {'mm.yyyy': '%m.%Y', 'dd.mm.yyyy': '%d.%m.%Y', 'mm.dd.yyyy': '%m.%d.%Y', 'yyyy': '%Y',
                        "dd.MM.yyyy HH:mm:ss": "%d.%m.%Y"}
@@ -527,7 +583,7 @@ class DateField(Field):
                        label=label, instruction=instruction, required=required, parent_field_code=parent_field_code,
                        hint=hint, constraint_message=constraint_message, appearance=appearance, default=default,
                        xform_constraint=xform_constraint, relevant=relevant)
-        self._dict[self.DATE_FORMAT] = date_format
+        self._date_format = date_format
 
     def validate(self, value):
         Field.validate(self, value)
@@ -535,7 +591,12 @@ class DateField(Field):
 
     @property
     def date_format(self):
-        return self._dict.get(self.DATE_FORMAT)
+        return self._date_format
+
+    def _to_json(self):
+        dict = super(DateField, self)._to_json()
+        dict[self.DATE_FORMAT] = self._date_format
+        return dict
 
     @property
     def is_monthly_format(self):
@@ -544,11 +605,11 @@ class DateField(Field):
     def get_constraint_text(self):
         return self.date_format
 
-    def convert_to_unicode(self):
-        if self.value is None:
+    def value_to_unicode(self, value):
+        if value is None:
             return unicode("")
         date_format = self.FORMAT_DATE_DICTIONARY.get(self.date_format)
-        return format_date(self.value, date_format) if isinstance(self.value, datetime) else unicode(self.value)
+        return format_date(value, date_format) if isinstance(value, datetime) else unicode(value)
 
     def formatted_field_values_for_excel(self, value):
         try:
@@ -562,8 +623,7 @@ class DateField(Field):
         try:
             return datetime.strptime(date_string.strip(), DateField.DATE_DICTIONARY.get(self.date_format))
         except ValueError:
-            raise IncorrectDate(self._dict.get(field_attributes.FIELD_CODE), date_string,
-                                self._dict.get(self.DATE_FORMAT))
+            raise IncorrectDate(self.code, date_string, self.date_format)
 
 
 # All the Field Types should be be wrapped with Excel Field types defined in other project including the lead part fields.
@@ -584,6 +644,7 @@ class ExcelDate(object):
 
 
 class TextField(Field):
+    __slots__ = ('_default_value', '_is_calculated', 'is_other')
     DEFAULT_VALUE = "defaultValue"
     CONSTRAINTS = "constraints"
 
@@ -597,21 +658,29 @@ class TextField(Field):
                        parent_field_code=parent_field_code,
                        hint=hint, constraint_message=constraint_message, appearance=appearance, default=default,
                        xform_constraint=xform_constraint, relevant=relevant)
-        self.value = self._dict[self.DEFAULT_VALUE] = defaultValue if defaultValue is not None else ""
+        self.value = self._default_value = defaultValue if defaultValue is not None else ""
+        self._is_calculated = None
         if is_calculated:
             self.is_calculated = True
         self.is_other = True if is_other is not None and is_other else False
 
     @property
     def is_calculated(self):
-        return self._dict.get("is_calculated", False)
+        return self._is_calculated if self._is_calculated is not None else False
 
     @is_calculated.setter
     def is_calculated(self, is_calculated):
-        self._dict["is_calculated"] = is_calculated
+        self._is_calculated = is_calculated
 
-    def set_value(self, value):
-        self.value = "" if self.is_calculated and value in ['NaN', 'Invalid Date'] else value
+    def _to_json(self):
+        dict = super(TextField, self)._to_json()
+        dict[self.DEFAULT_VALUE] = self._default_value
+        if self._is_calculated is not None:
+            dict["is_calculated"] = self._is_calculated
+        return dict
+
+    def bind_value(self, value):
+        return "" if self.is_calculated and value in ['NaN', 'Invalid Date'] else value
 
     def validate(self, value):
         Field.validate(self, value)
@@ -621,9 +690,9 @@ class TextField(Field):
                 value = constraint.validate(value)
             return value
         except VdtValueTooLongError as valueTooLongError:
-            raise AnswerTooLongException(self._dict[field_attributes.FIELD_CODE], value, valueTooLongError.args[1])
+            raise AnswerTooLongException(self.code, value, valueTooLongError.args[1])
         except VdtValueTooShortError as valueTooShortError:
-            raise AnswerTooShortException(self._dict[field_attributes.FIELD_CODE], value, valueTooShortError.args[1])
+            raise AnswerTooShortException(self.code, value, valueTooShortError.args[1])
 
     def get_constraint_text(self):
         if not is_empty(self.constraints):
@@ -646,6 +715,7 @@ class TextField(Field):
 
 
 class BooleanField(Field):
+    __slots__ = ('_default_value',)
     DEFAULT_VALUE = "defaultValue"
     CONSTRAINTS = "constraints"
 
@@ -659,7 +729,7 @@ class BooleanField(Field):
                        label=label, instruction=instruction, constraints=constraints, required=required,
                        parent_field_code=parent_field_code, hint=hint, constraint_message=constraint_message,
                        appearance=appearance, default=default, xform_constraint=xform_constraint, relevant=relevant)
-        self.value = self._dict[self.DEFAULT_VALUE] = defaultValue if defaultValue is not None else ""
+        self.value = self._default_value = defaultValue if defaultValue is not None else ""
 
     def validate(self, value):
         super(BooleanField, self).validate(value)
@@ -668,8 +738,15 @@ class BooleanField(Field):
         except ValueError:
             return False
 
+    def _to_json(self):
+        dict = super(BooleanField, self)._to_json()
+        dict[self.DEFAULT_VALUE] = self._default_value
+        return dict
+
 
 class UniqueIdField(Field):
+    __slots__ = ('unique_id_type', 'xform_field_reference')
+
     def __init__(self, unique_id_type, name, code, label, constraints=None, defaultValue=None, instruction=None,
                  required=True, parent_field_code=None, xform_field_reference=None, hint=None, constraint_message=None,
                  appearance=None, default=None, xform_constraint=None, relevant=None):
@@ -697,15 +774,20 @@ class UniqueIdField(Field):
         dict['xform_field_reference'] = self.xform_field_reference
         return dict
 
-    def stringify(self):
-        return unicode("%s(%s)" % (unicode(self.unique_id_type.capitalize()), self.convert_to_unicode()))
+    def stringify_value(self, value):
+        return unicode("%s(%s)" % (unicode(self.unique_id_type.capitalize()), self.value_to_unicode(value)))
 
     def set_value(self, value):
         if value:
-            self.value = value.lower()
+            self.value = self.bind_value(value)
+
+    def bind_value(self, value):
+        return value.lower() if value else None
 
 
 class UniqueIdUIField(UniqueIdField):
+    __slots__ = ('dbm',)
+
     def __init__(self, field, dbm):
         super(UniqueIdUIField, self).__init__(unique_id_type=field.unique_id_type, name=field.name, code=field.code,
                                               label=field.label, instruction=field.instruction,
@@ -736,6 +818,8 @@ class UniqueIdUIField(UniqueIdField):
 
 
 class SelectOneExternalField(Field):
+    __slots__ = ()
+
     def __init__(self, name, code, label, instruction=None, required=True, parent_field_code=None, hint=None,
                  appearance=None, default=None, relevant=None):
         type = field_attributes.SELECT_ONE_EXTERNAL_FIELD
@@ -753,11 +837,12 @@ class SelectOneExternalField(Field):
         return question_value
 
     def _to_json_view(self):
-        dict = self._dict.copy()
-        return dict
+        return self._to_json()
 
 
 class TelephoneNumberField(TextField):
+    __slots__ = ()
+
     def __init__(self, name, code, label, constraints=None, defaultValue=None, instruction=None,
                  required=True, parent_field_code=None, hint=None, constraint_message=None, appearance=None,
                  default=None, xform_constraint=None, relevant=None):
@@ -768,7 +853,7 @@ class TelephoneNumberField(TextField):
                            required=required, parent_field_code=parent_field_code, hint=hint,
                            constraint_message=constraint_message,
                            appearance=appearance, default=default, xform_constraint=xform_constraint, relevant=relevant)
-        self._dict['type'] = field_attributes.TELEPHONE_NUMBER_FIELD
+        self._type = field_attributes.TELEPHONE_NUMBER_FIELD
 
     def _clean(self, value):
         return TelephoneNumber().clean(value)
@@ -779,6 +864,8 @@ class TelephoneNumberField(TextField):
 
 
 class ShortCodeField(TextField):
+    __slots__ = ()
+
     def __init__(self, name, code, label, constraints=None, defaultValue=None, instruction=None,
                  required=False, parent_field_code=None, hint=None, constraint_message=None, appearance=None,
                  default=None, xform_constraint=None, relevant=None):
@@ -790,7 +877,7 @@ class ShortCodeField(TextField):
                            required=required, parent_field_code=parent_field_code, hint=hint,
                            constraint_message=constraint_message,
                            appearance=appearance, default=default, xform_constraint=xform_constraint, relevant=relevant)
-        self._dict['type'] = field_attributes.SHORT_CODE_FIELD
+        self._type = field_attributes.SHORT_CODE_FIELD
 
     def _clean(self, value):
         return value.lower() if value else None
@@ -805,6 +892,8 @@ class ShortCodeField(TextField):
 
 
 class HierarchyField(Field):
+    __slots__ = ()
+
     def __init__(self, name, code, label, instruction=None,
                  required=True, parent_field_code=None, hint=None, constraint_message=None, appearance=None,
                  default=None, xform_constraint=None, relevant=None):
@@ -819,15 +908,74 @@ class HierarchyField(Field):
             return value
         return [value]
 
-    def convert_to_unicode(self):
-        if self.value is None:
+    def value_to_unicode(self, value):
+        if value is None:
             return unicode("")
-        return sequence_to_str(self.value) if isinstance(self.value, list) else unicode(self.value)
+        return sequence_to_str(value) if isinstance(value, list) else unicode(value)
+
+
+class FrozenOption(dict):
+    """
+    An option of a select question as Choices hands it out for reading: a dict that refuses to be changed.
+    """
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("select options are shared, use copy_options to get options that can be changed")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class Choices(object):
+    """
+    The options of a select question, stored once as a tuple of FrozenOptions together with their val to text
+    maps. Select fields with identical options share one instance (see intern_choices), so options can be read
+    without copying them; use copy_options to change them.
+    """
+    __slots__ = ('options', 'text_by_val', 'text_by_lower_case_val', '__weakref__')
+
+    def __init__(self, options):
+        self.options = tuple(FrozenOption(copy.deepcopy(dict(option))) for option in options)
+        self.text_by_val = {}
+        self.text_by_lower_case_val = {}
+        for option in self.options:
+            val, text = option.get('val'), option.get('text')
+            self.text_by_val[val] = text
+            self.text_by_lower_case_val.setdefault(val.lower() if isinstance(val, basestring) else val, text)
+
+    def copy_options(self):
+        return [copy.deepcopy(dict(option)) for option in self.options]
+
+    def __reduce__(self):
+        return intern_choices, (self.copy_options(),)
+
+
+_interned_choices = WeakValueDictionary()
+_interned_choices_lock = Lock()
+
+
+def intern_choices(options):
+    key = json.dumps(options, sort_keys=True, default=unicode)
+    with _interned_choices_lock:
+        choices = _interned_choices.get(key)
+        if choices is None:
+            choices = _interned_choices[key] = Choices(options)
+        return choices
 
 
 class SelectField(Field):
     '''option values for this should contain single letters like a,b,c,d etc and after 26 options should start with a number followed by single character
     like 1a,1b,1c,1d etc '''
+    __slots__ = ('single_select_flag', 'constraint', '_choices', '_has_other', '_is_cascade')
     OPTIONS = "choices"
 
     def __init__(self, name, code, label, options, instruction=None,
@@ -841,10 +989,8 @@ class SelectField(Field):
                        label=label, instruction=instruction, required=required, parent_field_code=parent_field_code,
                        hint=hint, constraint_message=constraint_message, appearance=appearance, default=default,
                        xform_constraint=xform_constraint, relevant=relevant)
-        self._dict[self.OPTIONS] = []
-        valid_choices = self._dict[self.OPTIONS]
-        if has_other:
-            self._dict['has_other'] = has_other
+        valid_choices = []
+        self._has_other = has_other if has_other else None
         if options is not None:
             for option in options:
                 if isinstance(option, tuple):
@@ -854,9 +1000,10 @@ class SelectField(Field):
                 else:
                     single_language_specific_option = {'text': option, 'val': option}
                 valid_choices.append(single_language_specific_option)
-        self._dict["is_cascade"] = is_cascade
+        self._is_cascade = is_cascade
+        self._choices = intern_choices(valid_choices)
         self.constraint = ChoiceConstraint(
-            list_of_valid_choices=valid_choices,
+            list_of_valid_choices=self._choices.options, dict=self._choices.text_by_val,
             single_select_constraint=single_select_flag, code=code, has_other=has_other)
 
     SINGLE_SELECT_FLAG = 'single_select_flag'
@@ -867,28 +1014,39 @@ class SelectField(Field):
 
     @property
     def options(self):
-        return self._dict.get(self.OPTIONS)
+        return self._choices.copy_options()
+
+    @property
+    def option_view(self):
+        """The options for reading, without copying them; a tuple of dicts that cannot be changed."""
+        return self._choices.options
 
     @property
     def is_cascade(self):
-        return self._dict.get("is_cascade")
+        return self._is_cascade
 
-    def _to_json_view(self):
-        dict = self._dict.copy()
+    def _to_json(self):
+        dict = super(SelectField, self)._to_json()
+        dict[self.OPTIONS] = self._choices.copy_options()
+        if self._has_other:
+            dict['has_other'] = self._has_other
+        dict["is_cascade"] = self._is_cascade
         return dict
 
+    def _to_json_view(self):
+        return self._to_json()
+
     @property
     def has_other(self):
-        return self._dict.get('has_other')
+        return self._has_other
 
     def get_constraint_text(self):
-        return [option["text"] for option in self.options]
+        return [option["text"] for option in self._choices.options]
 
-    def convert_to_unicode(self):
-        if self.value is None:
+    def value_to_unicode(self, value):
+        if value is None:
             return unicode("")
-        return unicode(",".join([unicode(i) for i in self.value])) if isinstance(self.value, list) else unicode(
-            self.value)
+        return unicode(",".join([unicode(i) for i in value])) if isinstance(value, list) else unicode(value)
 
     # def _get_value_by_option(self, option):
     # for opt in self.options:
@@ -903,12 +1061,7 @@ class SelectField(Field):
         return self.type == "select1"
 
     def get_value_by_option(self, option, default=None):
-        for opt in self.options:
-            opt_text = opt['text']
-            opt_value = opt['val']
-            if opt_value.lower() == option.lower():
-                return opt_text
-        return default
+        return self._choices.text_by_lower_case_val.get(option.lower(), default)
 
     def get_option_value_list(self, question_value):
 
@@ -935,7 +1088,7 @@ class SelectField(Field):
             responses = [r.strip() for r in responses]
         elif ' ' in question_value:
             responses = question_value.split(' ')
-        elif question_value in [item.get('val') for item in self._dict[self.OPTIONS]]:
+        elif question_value in self._choices.text_by_val:
             # yes in ['yes','no']
             responses = [question_value]
         elif self.has_other and question_value == 'other':
@@ -957,17 +1110,14 @@ class SelectField(Field):
         return result
 
     def get_options_map(self):
-        options_map = {}
-        for option in self.options:
-            options_map.update({option['val']: option['text']})
-        return options_map
+        return dict(self._choices.text_by_val)
 
     def escape_option_text(self):
-        for option in self._dict.get(self.OPTIONS):
-            option['text'] = escape(option['text'])
+        self._choices = intern_choices([dict(option, text=escape(option['text'])) for option in self._choices.options])
 
 
 class GeoCodeField(Field):
+    __slots__ = ()
     type = field_attributes.LOCATION_FIELD
 
     def __init__(self, name, code, label, instruction=None, required=True, parent_field_code=None, hint=None,
@@ -992,12 +1142,10 @@ class GeoCodeField(Field):
     def get_constraint_text(self):
         return "xx.xxxx yy.yyyy"
 
-    def convert_to_unicode(self):
-        if self.value is None:
+    def value_to_unicode(self, value):
+        if value is None:
             return unicode("")
-        return ", ".join(str(b) for b in list(self.value)) if isinstance(self.value, list) or isinstance(self.value,
-                                                                                                         tuple) else unicode(
-            self.value)
+        return ", ".join(str(b) for b in list(value)) if isinstance(value, (list, tuple)) else unicode(value)
 
     def formatted_field_values_for_excel(self, value):
         value_list = value.split(',')
@@ -1014,6 +1162,8 @@ class GeoCodeField(Field):
 
 
 class MediaField(Field):
+    __slots__ = ()
+
     def __init__(self, type, name, code, label, instruction=None, required=True,
                  parent_field_code=None, hint=None, constraint_message=None, appearance=None, default=None,
                  xform_constraint=None, relevant=None):
@@ -1027,6 +1177,8 @@ class MediaField(Field):
 
 
 class PhotoField(MediaField):
+    __slots__ = ()
+
     def __init__(self, name, code, label, instruction=None, required=True, parent_field_code=None, hint=None,
                  constraint_message=None, appearance=None, default=None, xform_constraint=None, relevant=None):
         MediaField.__init__(self, type=field_attributes.PHOTO, name=name, code=code, label=label,
@@ -1037,6 +1189,8 @@ class PhotoField(MediaField):
 
 
 class VideoField(MediaField):
+    __slots__ = ()
+
     def __init__(self, name, code, label, instruction=None, required=True, parent_field_code=None, hint=None,
                  constraint_message=None, appearance=None, default=None, xform_constraint=None, relevant=None):
         MediaField.__init__(self, type=field_attributes.VIDEO, name=name, code=code, label=label,
@@ -1047,6 +1201,8 @@ class VideoField(MediaField):
 
 
 class AudioField(MediaField):
+    __slots__ = ()
+
     def __init__(self, name, code, label, instruction=None, required=True, parent_field_code=None, hint=None,
                  constraint_message=None, appearance=None, default=None, xform_constraint=None, relevant=None):
         MediaField.__init__(self, type=field_attributes.AUDIO, name=name, code=code, label=label,
@@ -1057,6 +1213,7 @@ class AudioField(MediaField):
 
 
 class FieldSet(Field):
+    __slots__ = ('fields', '_fieldset_type')
     FIELDSET_TYPE = 'fieldset_type'
 
     def __init__(self, name, code, label, instruction=None, required=True, field_set=[], fieldset_type='group',
@@ -1066,15 +1223,15 @@ class FieldSet(Field):
                        label=label, instruction=instruction, required=required, parent_field_code=parent_field_code,
                        hint=hint, constraint_message=constraint_message, appearance=appearance, default=default,
                        xform_constraint=xform_constraint, relevant=relevant)
-        self.fields = self._dict['fields'] = field_set
-        self._dict[self.FIELDSET_TYPE] = fieldset_type
+        self.fields = field_set
+        self._fieldset_type = fieldset_type
 
     @property
     def is_field_set(self):
         return True
 
     def is_group(self):
-        return self._dict.get(self.FIELDSET_TYPE) == 'group'
+        return self._fieldset_type == 'group'
 
     def _find_field_for_code(self, code):
         for field in self.fields:
@@ -1082,7 +1239,7 @@ class FieldSet(Field):
                 return field
         return None
 
-    def set_value(self, value):
+    def bind_value(self, value):
         list = []
         if value:
             for current_value in value:
@@ -1090,14 +1247,13 @@ class FieldSet(Field):
                 for field_code, answer in current_value.iteritems():
                     field = self._find_field_for_code(field_code)
                     if field:
-                        field.set_value(answer)
-                        dict.update({field_code: field.value})
+                        dict.update({field_code: field.bind_value(answer)})
                 list.append(dict)
-        super(FieldSet, self).set_value(list)
+        return list
 
     @property
     def fieldset_type(self):
-        return self._dict.get(self.FIELDSET_TYPE)
+        return self._fieldset_type
 
     def validate(self, value):
         # todo call all validators of the child fields
@@ -1107,19 +1263,21 @@ class FieldSet(Field):
         return [value]
 
     # todo find the application of this
-    def convert_to_unicode(self):
-        if self.value is None:
+    def value_to_unicode(self, value):
+        if value is None:
             return unicode("")
-        return sequence_to_str(self.value) if isinstance(self.value, list) else unicode(self.value)
+        return sequence_to_str(value) if isinstance(value, list) else unicode(value)
 
     def _to_json(self):
-        dict = self._dict.copy()
-        dict['instruction'] = self._dict['instruction']
+        dict = super(FieldSet, self)._to_json()
         dict['fields'] = [f._to_json() for f in self.fields]
+        dict[self.FIELDSET_TYPE] = self._fieldset_type
         return dict
 
 
 class TimeField(Field):
+    __slots__ = ()
+
     def __init__(self, name, code, label, constraints=None, instruction=None, required=True,
                  parent_field_code=None, hint=None, constraint_message=None, appearance=None, default=None,
                  xform_constraint=None, relevant=None):
@@ -1139,6 +1297,8 @@ class TimeField(Field):
 
 
 class DateTimeField(Field):
+    __slots__ = ()
+
     def __init__(self, name, code, label, constraints=None, instruction=None, required=True,
                  parent_field_code=None, hint=None, constraint_message=None, appearance=None, default=None,
                  xform_constraint=None, relevant=None):
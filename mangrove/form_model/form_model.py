@@ -5,14 +5,17 @@ import xml.etree.ElementTree as ET
 from collections import OrderedDict
 from xml.sax.saxutils import escape
 
-from mangrove.datastore.cache_manager import get_cache_manager
+from mangrove.datastore.cache_manager import get_cache_manager, get_large_value, set_large_value
 from mangrove.datastore.database import DatabaseManager, DataObject
 from mangrove.datastore.documents import FormModelDocument, EntityFormModelDocument
 from mangrove.errors.MangroveException import FormModelDoesNotExistsException, \
     DataObjectAlreadyExists, QuestionAlreadyExistsException, NoDocumentError, QuestionCodeAlreadyExistsException
 from mangrove.form_model import field
+from mangrove.form_model.bound_form import BoundForm
 from mangrove.form_model.field import UniqueIdField, ShortCodeField, FieldSet, MediaField, UniqueIdUIField, \
     SelectOneExternalField, DateField, SelectField
+from mangrove.form_model.form_model_cache import form_model_cache
+from mangrove.form_model.snapshots import FormSnapshots
 from mangrove.form_model.validator_factory import validator_factory
 from mangrove.form_model.xform import Xform, get_node, add_node, remove_attrib
 from mangrove.form_model.validators import MandatoryValidator
@@ -53,10 +56,10 @@ ENTITY_DELETION_FORM_CODE = "delete"
 def get_form_model_document(code, dbm):
     cache_manger = get_cache_manager()
     key_as_str = get_form_model_cache_key(code, dbm)
-    row_value = cache_manger.get(key_as_str)
+    row_value = get_large_value(cache_manger, key_as_str)
     if row_value is None:
         row_value = _load_questionnaire(code, dbm)
-        cache_manger.set(key_as_str, row_value, time=FORM_MODEL_EXPIRY_TIME_IN_SEC)
+        set_large_value(cache_manger, key_as_str, row_value, time=FORM_MODEL_EXPIRY_TIME_IN_SEC)
     return row_value
 
 
@@ -64,8 +67,21 @@ def get_form_model_by_code(dbm, code):
     row_value = get_form_model_document(code, dbm)
 
     if row_value.get('is_registration_model') or row_value.get('form_code') == ENTITY_DELETION_FORM_CODE:
-        return EntityFormModel.new_from_doc(dbm, EntityFormModelDocument.wrap(row_value))
-    return FormModel.new_from_doc(dbm, FormModelDocument.wrap(row_value))
+        return get_cached_form_model(dbm, code, row_value, EntityFormModel)
+    return get_cached_form_model(dbm, code, row_value, FormModel)
+
+
+def get_cached_form_model(dbm, code, row_value, form_model_class):
+    revision = row_value.get('_rev')
+    if revision is None:
+        return form_model_class.new_from_doc(dbm, form_model_class.__document_class__.wrap(row_value))
+
+    cache_key = get_form_model_cache_key(code, dbm)
+    form_model = form_model_cache.get(cache_key, revision, form_model_class)
+    if form_model is None:
+        form_model = form_model_class.new_from_doc(dbm, form_model_class.__document_class__.wrap(row_value))
+        form_model_cache.put(cache_key, revision, form_model_class, form_model)
+    return form_model.copy_for_request(dbm)
 
 
 def _load_questionnaire(form_code, dbm):
@@ -126,6 +142,22 @@ def get_field_by_attribute_value(form_model, key_attribute, attribute_label):
     return None
 
 
+def _index_fields_by_code(fields, index=None, nested=True):
+    index = {} if index is None else index
+    for field in fields:
+        index.setdefault(field.code.lower(), field)
+        if nested and isinstance(field, FieldSet):
+            _index_fields_by_code(field.fields, index)
+    return index
+
+
+def _index_fields_by_name(fields):
+    index = {}
+    for field in fields:
+        index.setdefault(field.name, field)
+    return index
+
+
 def get_form_model_by_entity_type(dbm, entity_type):
     assert isinstance(dbm, DatabaseManager)
     assert is_sequence(entity_type)
@@ -153,6 +185,57 @@ QUESTION_NAME_INVALID_ANSWERS = [u'Error: could not determine deviceID',
                                  u'no subscriberid property in enketo']
 
 
+def _remove_invalid_meta_answer(answer):
+    if isinstance(answer, list):
+        return [dict((code, _remove_invalid_meta_answer(repeat_answer)) for code, repeat_answer in repeat.iteritems())
+                for repeat in answer]
+    return '' if answer in QUESTION_NAME_INVALID_ANSWERS else answer
+
+
+class SubmissionValidator(object):
+    """
+    The answer checks of one form model revision, built once: question code (lower case) to the question's code
+    and validate function. validate makes one pass over the answers and leaves the form model and its fields
+    untouched, returning the cleaned answers, the first error per question and the exceptions raised.
+    """
+
+    def __init__(self, fields, drop_empty_answers=True):
+        self.drop_empty_answers = drop_empty_answers
+        self._checks = dict((code, (field.code, field.validate))
+                            for code, field in _index_fields_by_code(fields).iteritems())
+
+    def validate(self, values):
+        cleaned_values, errors, exceptions = OrderedDict(), OrderedDict(), []
+        for key, answer in values.iteritems():
+            if self.drop_empty_answers:
+                if is_empty(answer):
+                    continue
+                answer = _remove_invalid_meta_answer(answer)
+            check = self._checks.get(key.lower())
+            if check is None:
+                continue
+            code, validate = check
+            try:
+                cleaned_values[code] = validate(answer)
+            except Exception as e:
+                exceptions.append(e)
+                if not errors.get(code):
+                    errors[code] = e.message
+        return cleaned_values, errors, exceptions
+
+
+class SubmissionValidation(tuple):
+    """
+    What validate_submission returns: the (cleaned values, errors) pair its callers unpack, with the exceptions
+    raised by the failing answers and validators.
+    """
+
+    def __new__(cls, cleaned_values, errors, exceptions):
+        validation = tuple.__new__(cls, (cleaned_values, errors))
+        validation.exceptions = exceptions
+        return validation
+
+
 class FormModel(DataObject):
     __document_class__ = FormModelDocument
     old_form_code = None
@@ -160,17 +243,25 @@ class FormModel(DataObject):
     @classmethod
     def new_from_doc(cls, dbm, doc):
         form_model = super(FormModel, cls).new_from_doc(dbm, doc)
-        if form_model.xform:
-            form_model.xform_model = Xform(form_model.xform)
         form_model._old_doc = copy.deepcopy(form_model._doc)
         return form_model
 
-    @classmethod
-    def get(cls, dbm, id, get_or_create=False):
-        do = super(FormModel, cls).get(dbm, id, get_or_create)
-        if do.xform:
-            do.xform_model = Xform(do.xform)
-        return do
+    def copy_for_request(self, dbm):
+        """
+        Returns a cheap copy of a cached form model. Field definitions and the pre save document are shared,
+        everything a caller can change (document attributes, field list, validators, errors) is its own.
+        """
+        form_model = copy.copy(self)
+        form_model._dbm = dbm
+        form_model._doc = self.__document_class__.wrap(dict(self._doc._data))
+        form_model._xform_model = None
+        form_model._form_fields = list(self._form_fields)
+        form_model._compiled_for = form_model._form_fields
+        form_model._snapshots = self._snapshots.copy(dbm)
+        form_model.validators = list(self.validators)
+        form_model.errors = []
+        form_model._bound_form = None
+        return form_model
 
     def _set_doc(self, form_code, is_registration_model, label, language, name):
         doc = FormModelDocument()
@@ -192,15 +283,16 @@ class FormModel(DataObject):
         # assert type is None or is_not_empty(type)
 
         DataObject.__init__(self, dbm)
-        self.xform_model = None
+        self._xform_model = None
         self._old_doc = None
 
-        self._snapshots = {}
+        self._snapshots = FormSnapshots(dbm)
         self._form_fields = []
+        self._invalidate_field_indexes()
         self.errors = []
         self.validators = validators
         self._enforce_unique_labels = enforce_unique_labels
-        self._validation_exception = []
+        self._bound_form = None
         # Are we being constructed from scratch or existing doc?
         if name is None:
             return
@@ -208,6 +300,7 @@ class FormModel(DataObject):
         # Not made from existing doc, so build ourselves up
         self._validate_fields(fields)
         self._form_fields = fields
+        self._invalidate_field_indexes()
 
         self._set_doc(form_code, is_registration_model, label, language, name)
 
@@ -381,6 +474,16 @@ class FormModel(DataObject):
     def xform(self):
         return self._doc.xform
 
+    @property
+    def xform_model(self):
+        if self._xform_model is None and self.xform:
+            self._xform_model = Xform(self.xform)
+        return self._xform_model
+
+    @xform_model.setter
+    def xform_model(self, value):
+        self._xform_model = value
+
     def update_xform_with_questionnaire_name(self, questionnaire_name):
         # Escape <, > and & and convert accented characters to equivalent non-accented characters
         self.xform = re.sub(r"<html:title>.+</html:", "<html:title>%s</html:" % unicodedata.normalize('NFD', escape(
@@ -389,6 +492,7 @@ class FormModel(DataObject):
     @xform.setter
     def xform(self, value):
         self._doc.xform = value
+        self._xform_model = None
 
     @property
     def entity_type(self):
@@ -469,6 +573,7 @@ class FormModel(DataObject):
             form_code_to_clear = self.old_form_code
         cache_key = get_form_model_cache_key(form_code_to_clear, self._dbm)
         cache_manger.delete(cache_key)
+        form_model_cache.invalidate(cache_key)
 
     def void(self, void=True):
         self._delete_form_model_from_cache()
@@ -488,10 +593,7 @@ class FormModel(DataObject):
     def update_doc_and_save(self, process_post_update=True):
         self._doc.json_fields = [f._to_json() for f in self._form_fields]
         self._doc.validators = [validator.to_json() for validator in self.validators]
-        json_snapshots = {}
-        for key, value in self._snapshots.items():
-            json_snapshots[key] = [each._to_json() for each in value]
-        self._doc.snapshots = json_snapshots
+        self._doc.snapshots = self._snapshots.to_json()
         self._delete_form_model_from_cache()
         if self._doc is None:
             raise NoDocumentError('No document to save')
@@ -506,28 +608,42 @@ class FormModel(DataObject):
     def get_attachments(self, attachment_name=None):
         return self.get_attachment(self._doc.id, filename=attachment_name)
 
+    def _invalidate_field_indexes(self):
+        # Everything derived from the fields of this revision. The dict is shared with the copies
+        # copy_for_request hands out, so it is replaced, never cleared, when the fields change.
+        self._compiled = {}
+        self._compiled_for = self._form_fields
+        self._compiled_length = len(self._form_fields)
+
+    def _compiled_value(self, name, build):
+        # fields hands out the live list, so it may have been replaced or appended to behind our back
+        if self._compiled_for is not self._form_fields or self._compiled_length != len(self._form_fields):
+            self._invalidate_field_indexes()
+        value = self._compiled.get(name)
+        if value is None:
+            value = self._compiled[name] = build()
+        return value
+
+    def _field_index_by_code(self):
+        return self._compiled_value('fields_by_code', lambda: _index_fields_by_code(self._form_fields))
+
     def get_field_by_name(self, name):
-        for field in self._form_fields:
-            if field.name == name:
-                return field
-        return None
+        return self._compiled_value('fields_by_name', lambda: _index_fields_by_name(self._form_fields)).get(name)
 
     def get_field_by_code(self, code):
-        return self._get_by_code(self._form_fields, code)
+        if code is None:
+            return None
+        return self._field_index_by_code().get(code.lower())
 
     def get_field_by_code_in_fieldset(self, code, parent_code):
+        if code is None:
+            return None
         parent_field = self.get_field_by_code(parent_code)
-        return self._get_by_code(parent_field.fields, code)
-
-    def _get_by_code(self, fields, code):
-        for field in fields:
-            if code is not None and field.code.lower() == code.lower():
-                return field
-            if isinstance(field, FieldSet):
-                field_by_code = self._get_by_code(field.fields, code)
-                if field_by_code:
-                    return field_by_code
-        return None
+        fieldset_indexes = self._compiled_value('fieldset_fields_by_code', dict)
+        fieldset_index = fieldset_indexes.get(parent_field.code.lower())
+        if fieldset_index is None:
+            fieldset_index = fieldset_indexes[parent_field.code.lower()] = _index_fields_by_code(parent_field.fields)
+        return fieldset_index.get(code.lower())
 
     def get_field_by_code_and_rev(self, code, revision=None):
         if self.revision == revision or not self._snapshots:
@@ -536,10 +652,12 @@ class FormModel(DataObject):
         if revision is None:
             revision = min(self._snapshots, key=lambda x: int(x.split('-')[0]))
 
-        snapshot = self._snapshots.get(revision, [])
-        for field in snapshot:
-            if field.code.lower() == code.lower(): return field
-        return None
+        snapshot_indexes = self._compiled_value('snapshot_fields_by_code', dict)
+        snapshot_index = snapshot_indexes.get(revision)
+        if snapshot_index is None:
+            snapshot_index = snapshot_indexes[revision] = _index_fields_by_code(self._snapshots.get(revision, []),
+                                                                                nested=False)
+        return snapshot_index.get(code.lower())
 
     def get_field_code_label_dict(self):
         field_code_label_dict = {}
@@ -551,18 +669,22 @@ class FormModel(DataObject):
     def add_field(self, field):
         self._validate_fields(self._form_fields + [field])
         self._form_fields.append(field)
+        self._invalidate_field_indexes()
         return self._form_fields
 
     def delete_field(self, code):
         self._form_fields = [f for f in self._form_fields if f.code != code]
+        self._invalidate_field_indexes()
         self._validate_fields(self._form_fields)
 
     def delete_all_fields(self):
         self._form_fields = []
+        self._invalidate_field_indexes()
 
     def create_snapshot(self):
         if self._form_fields:
             self._snapshots[self._doc.rev] = self._form_fields
+            self._invalidate_field_indexes()
 
     @property
     def snapshots(self):
@@ -590,16 +712,16 @@ class FormModel(DataObject):
         return False
 
     def bind(self, submission):
+        """
+        Returns the submission bound to this form model as a BoundForm. The last bound form is also kept for
+        bound_values(); code that shares a form model between threads should use the returned one.
+        """
         self.submission = submission
-        for field in self.fields:
-            answer = self._lookup_answer_for_field_code(self.submission, field.code)
-            field.set_value(answer)
+        self._bound_form = BoundForm(self, submission)
+        return self._bound_form
 
     def bound_values(self):
-        values = {}
-        for field in self.fields:
-            values.update({field.code: field.value})
-        return values
+        return (self._bound_form or BoundForm(self, {})).bound_values()
 
     def _validate_fields(self, fields):
         self._validate_uniqueness_of_field_codes(fields)
@@ -624,15 +746,6 @@ class FormModel(DataObject):
             raise QuestionCodeAlreadyExistsException("All code fields must be unique, please check %s field",
                 (code_list[len(code_list)-1], ))
 
-    def _validate_answer_for_field(self, answer, field):
-        try:
-            value = field.validate(answer)
-            return True, value
-        except Exception as e:
-            field.errors.append(e.message)
-            self._validation_exception.append(e)
-            return False, e.message
-
     def _set_document(self, document):
         DataObject._set_document(self, document)
 
@@ -646,11 +759,8 @@ class FormModel(DataObject):
                 self.validators.append(validator)
 
         if hasattr(document, 'snapshots'):
-            for key, value in document.snapshots.items():
-                self._snapshots[key] = []
-                for each in value:
-                    f = field.create_question_from(each, self._dbm)
-                    self._snapshots[key].append(f)
+            self._snapshots = FormSnapshots(self._dbm, document.snapshots)
+        self._invalidate_field_indexes()
 
     def is_form_code_unique(self):
         try:
@@ -666,9 +776,6 @@ class FormModel(DataObject):
                 return answers[key]
         return None
 
-    def _remove_empty_values(self, answers):
-        return OrderedDict([(k, v) for k, v in answers.items() if not is_empty(v)])
-
     def remove_invalid_meta_answers(self, answers):
         final_values = {}
         for code, answer in answers.iteritems():
@@ -685,54 +792,30 @@ class FormModel(DataObject):
                 final_values[code] = answer
         return final_values
 
-    def _remove_unknown_fields(self, answers):
-        key_value_items = OrderedDict([(k, v) for k, v in answers.items() if self.get_field_by_code(k) is not None])
-
-        return key_value_items
+    @property
+    def submission_validator(self):
+        return self._compiled_value('submission_validator', lambda: SubmissionValidator(
+            self._form_fields, drop_empty_answers=not self.is_entity_registration_form()))
 
     # TODO : does not handle value errors. eg. Text for Number. Done outside the service right now.
     def validate_submission(self, values):
         assert values is not None
-        cleaned_values = OrderedDict()
-        errors = OrderedDict()
-        if not self.xform:
-            for validator in self.validators:
-                validator_error = validator.validate(values, self.fields, self._dbm)
-                if hasattr(validator, 'exception'):
-                    self._validation_exception.extend(getattr(validator, 'exception'))
-                errors.update(validator_error)
-
-        if not self.is_entity_registration_form():
-            values = self._remove_empty_values(values)
-            values = self.remove_invalid_meta_answers(values)
-
-        values = self._remove_unknown_fields(values)
-        for key in values:
-            field = self.get_field_by_code(key)
-            is_valid, result = self._validate_answer_for_field(values[key], field)
-            if is_valid:
-                cleaned_values[field.code] = result
-            else:
-                errors[field.code] = result if not errors.get(field.code) else errors[field.code]
-        return cleaned_values, errors
+        bound_form = BoundForm(self, values)
+        cleaned_values, errors = bound_form.validate()
+        return SubmissionValidation(cleaned_values, errors, bound_form.exceptions)
 
     def _case_insensitive_lookup(self, values, code):
+        # submissions nearly always use the code as defined or in lower case, which the dict finds at once
+        for key in (code, code.lower()):
+            if key in values:
+                return values[key]
         for fieldcode in values:
             if fieldcode.lower() == code.lower():
                 return values[fieldcode]
         return None
 
-    def _lookup_answer_for_field_code(self, values, code):
-        value = self._case_insensitive_lookup(values, code)
-        return value
-
     def stringify(self, values):
-        self.bind(values)
-        dict = OrderedDict()
-        for field in self.fields:
-            dict[field.code] = field.stringify()
-
-        return dict
+        return BoundForm(self, values).stringify()
 
     def add_validator(self, validator_class):
         if validator_class not in [validator.__class__ for validator in self.validators]:
@@ -748,10 +831,6 @@ class FormModel(DataObject):
     def data_senders(self):
         return self._doc._data.get('data_senders')
 
-    @property
-    def validation_exception(self):
-        return self._validation_exception
-
     @property
     def is_open_survey(self):
         return self._doc.get('is_open_survey', False)
@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from threading import Lock
+
+FORM_MODEL_CACHE_SIZE = 256
+
+
+class FormModelCache(object):
+    """
+    Process level LRU of fully built form models.
+
+    Entries are keyed by (form model cache key, document revision, form model class), so a stale entry can never
+    be returned once the questionnaire document has moved on; memcached stays the shared cache behind this one.
+    """
+
+    def __init__(self, max_size=FORM_MODEL_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cache_key, revision, form_model_class):
+        key = (cache_key, revision, form_model_class)
+        with self._lock:
+            form_model = self._entries.pop(key, None)
+            if form_model is None:
+                self.misses += 1
+                return None
+            self._entries[key] = form_model
+            self.hits += 1
+            return form_model
+
+    def put(self, cache_key, revision, form_model_class, form_model):
+        key = (cache_key, revision, form_model_class)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = form_model
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, cache_key):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == cache_key]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+form_model_cache = FormModelCache()
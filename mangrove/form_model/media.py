@@ -1,6 +1,9 @@
-from couchdb.mapping import TextField, FloatField, BooleanField
+from couchdb.mapping import TextField, FloatField, BooleanField, IntegerField
 from mangrove.datastore.database import DataObject
 from mangrove.datastore.documents import DocumentBase
+from mangrove.errors.MangroveException import FailedToSaveDataObject
+
+MEDIA_RESERVATION_ATTEMPTS = 10
 
 
 class MediaDocument(DocumentBase):
@@ -17,6 +20,19 @@ class MediaDocument(DocumentBase):
         self.is_preview = is_preview
 
 
+class MediaSequenceDocument(DocumentBase):
+    """
+    The next media file number that has not been reserved yet for a questionnaire.
+    """
+    questionnaire_id = TextField()
+    next_value = IntegerField()
+
+    def __init__(self, id=None, questionnaire_id=None, next_value=1):
+        DocumentBase.__init__(self, id=id, document_type='MediaSequence')
+        self.questionnaire_id = questionnaire_id
+        self.next_value = next_value
+
+
 class Media(DataObject):
     __document_class__ = MediaDocument
 
@@ -24,3 +40,22 @@ class Media(DataObject):
         DataObject.__init__(self, dbm)
         doc = MediaDocument(attachment_name=attachment_name, attachment_size=attachment_size, questionnaire_id=questionnaire_id, is_preview=is_preview)
         DataObject._set_document(self, doc)
+
+
+def reserve_media_numbers(dbm, questionnaire_id, count):
+    """
+    Reserves count media file numbers of the questionnaire by moving its sequence on with one optimistic
+    (revision checked) save, so concurrent submissions never get the same number, and returns the first. A new
+    sequence carries on from the media the media_attachment view counts.
+    """
+    sequence_id = "media_sequence_%s" % questionnaire_id
+    for attempt in range(MEDIA_RESERVATION_ATTEMPTS):
+        sequence = dbm._load_document(sequence_id, MediaSequenceDocument)
+        if sequence is None:
+            rows = dbm.view.media_attachment(group=True, reduce=True, key=questionnaire_id)
+            sequence = MediaSequenceDocument(sequence_id, questionnaire_id, rows[0][u"value"] + 1 if rows else 1)
+        start = sequence.next_value
+        sequence.next_value = start + count
+        if dbm._save_documents([sequence])[0][0]:
+            return start
+    raise FailedToSaveDataObject("Could not reserve media numbers for %s" % questionnaire_id)
@@ -7,17 +7,21 @@ from mangrove.datastore.entity import from_row_to_entity, Contact
 from mangrove.errors.MangroveException import DataObjectAlreadyExists, FormModelDoesNotExistsException, \
     ProjectPollCodeDoesNotExistsException
 from mangrove.form_model.deadline import Deadline, Month, Week
-from mangrove.form_model.form_model import REPORTER, get_form_model_by_code, FormModel, get_form_model_document
+from mangrove.form_model.form_model import REPORTER, get_form_model_by_code, FormModel, get_form_model_document, \
+    get_cached_form_model
 from mangrove.transport.repository.reporters import get_reporters_who_submitted_data_for_frequency_period
+from mangrove.transport.request_context import memoize, PROJECT
 from mangrove.datastore.user_questionnaire_preference import UserQuestionnairePreference, \
     UserQuestionnairePreferenceDocument
 from mangrove.form_model.form_model import get_form_model_fields_by_entity_type
 
+ACTIVE = 'active'
+
 
 def get_project_by_code(dbm, code):
     row_value = get_form_model_document(code, dbm)
 
-    return Project.new_from_doc(dbm, ProjectDocument.wrap(row_value))
+    return get_cached_form_model(dbm, code, row_value, Project)
 
 
 default_reminder_and_deadline = {"deadline_type": "Following", "should_send_reminder_to_all_ds": False,
@@ -80,7 +84,7 @@ class Project(FormModel):
     @property
     def active(self):
         active = self._doc.active
-        return False if active is None else active == 'active'
+        return False if active is None else active == ACTIVE
 
     @end_date.setter
     def end_date(self, end_date):
@@ -334,28 +338,27 @@ def get_field_default_value(key, entity):
     return None
 
 
+def _active_project_rows(dbm, include_docs=False):
+    return dbm.view.active_projects(key=ACTIVE, limit=1, include_docs=include_docs)
+
+
 def get_active_form_model(dbm, form_code):
-    projects = dbm.load_all_rows_in_view("all_projects")
-    for project_row in projects:
-        project_doc = ProjectDocument.wrap(project_row.get('value'))
-        project = Project.new_from_doc(dbm, project_doc)
-        if project.active:
-            return project
-    raise FormModelDoesNotExistsException(form_code)
+    rows = _active_project_rows(dbm, include_docs=True)
+    if not rows:
+        raise FormModelDoesNotExistsException(form_code)
+    return Project.new_from_doc(dbm, ProjectDocument.wrap(rows[0]['doc']))
 
 
-def check_if_form_code_is_poll(self, form_model):
+def check_if_form_code_is_poll(self, form_model, context=None):
     if form_model:
-        project = get_project_by_code(self.dbm, form_model.form_code)
+        project = memoize(context, (PROJECT, form_model.form_code),
+                          lambda: get_project_by_code(self.dbm, form_model.form_code))
         if project and project.is_poll is True:
             raise ProjectPollCodeDoesNotExistsException(project.form_code)
 
 
 def get_active_form_model_name_and_id(dbm):
-    projects = dbm.load_all_rows_in_view("all_projects")
-    for project_row in projects:
-        project_doc = ProjectDocument.wrap(project_row.get('value'))
-        project = Project.new_from_doc(dbm, project_doc)
-        if project.active:
-            return True, project.id, project.name
-    return False, "", ""
+    rows = _active_project_rows(dbm)
+    if not rows:
+        return False, "", ""
+    return True, rows[0]['id'], rows[0]['value']
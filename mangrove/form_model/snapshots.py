@@ -0,0 +1,82 @@
+import json
+from collections import MutableMapping
+from threading import Lock
+from weakref import WeakValueDictionary
+
+from mangrove.form_model import field
+
+_interned_fields = WeakValueDictionary()
+_interned_fields_lock = Lock()
+
+
+def intern_field(field_json, dbm):
+    """
+    Returns the field defined by field_json, shared with every other snapshot that has an identical definition.
+    Snapshot fields are only ever read, so one instance can serve all revisions and form models holding it.
+    """
+    key = json.dumps(field_json, sort_keys=True, default=unicode)
+    with _interned_fields_lock:
+        interned = _interned_fields.get(key)
+        if interned is None:
+            interned = _interned_fields[key] = field.create_question_from(field_json, dbm)
+        return interned
+
+
+class FormSnapshots(MutableMapping):
+    """
+    The fields of earlier revisions of a form model, keyed by revision.
+
+    Revisions loaded from the document stay as their json until they are asked for, so a form model with a long
+    history only builds the revisions that are actually looked up. Revisions added with a list of fields, as
+    create_snapshot does, are kept as they are.
+    """
+
+    def __init__(self, dbm, snapshots_json=None):
+        self._dbm = dbm
+        self._json = dict(snapshots_json or {})
+        self._fields = {}
+
+    def __getitem__(self, revision):
+        fields = self._fields.get(revision)
+        if fields is None:
+            fields = self._fields[revision] = [intern_field(each, self._dbm) for each in self._json[revision]]
+        return fields
+
+    def __setitem__(self, revision, fields):
+        self._json.pop(revision, None)
+        self._fields[revision] = fields
+
+    def __delitem__(self, revision):
+        if revision not in self:
+            raise KeyError(revision)
+        self._json.pop(revision, None)
+        self._fields.pop(revision, None)
+
+    def __contains__(self, revision):
+        return revision in self._json or revision in self._fields
+
+    def __iter__(self):
+        for revision in self._json:
+            yield revision
+        for revision in self._fields:
+            if revision not in self._json:
+                yield revision
+
+    def __len__(self):
+        return len(self._json) + len([revision for revision in self._fields if revision not in self._json])
+
+    def copy(self, dbm=None):
+        snapshots = FormSnapshots(dbm or self._dbm)
+        snapshots._json = dict(self._json)
+        snapshots._fields = dict(self._fields)
+        return snapshots
+
+    def to_json(self):
+        """
+        Revisions that were never built are written back as they were read.
+        """
+        snapshots_json = dict(self._json)
+        for revision, fields in self._fields.iteritems():
+            if revision not in self._json:
+                snapshots_json[revision] = [each._to_json() for each in fields]
+        return snapshots_json
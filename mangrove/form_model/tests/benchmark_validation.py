@@ -0,0 +1,88 @@
+"""
+Times FormModel.validate_submission against the per answer path it replaced, on forms of 10, 100 and 500
+questions. Run with: python -m mangrove.form_model.tests.benchmark_validation
+"""
+from collections import OrderedDict
+from timeit import timeit
+
+from mock import Mock
+
+from mangrove.datastore.database import DatabaseManager
+from mangrove.form_model.field import TextField, IntegerField, SelectField
+from mangrove.form_model.form_model import FormModel
+from mangrove.form_model.validation import NumericRangeConstraint, TextLengthConstraint
+from mangrove.utils.types import is_empty
+
+FIELD_COUNTS = (10, 100, 500)
+ITERATIONS = 200
+
+
+def _form_model(field_count):
+    fields = []
+    for index in range(field_count):
+        code = 'q%d' % index
+        if index % 3 == 0:
+            field = IntegerField(code, code, code, constraints=[NumericRangeConstraint(min=1, max=100)])
+        elif index % 3 == 1:
+            field = TextField(code, code, code, constraints=[TextLengthConstraint(max=20)])
+        else:
+            field = SelectField(code, code, code, [('one', 'a'), ('two', 'b'), ('three', 'c')])
+        fields.append(field)
+    return FormModel(Mock(spec=DatabaseManager), name='benchmark', label='benchmark', form_code='bench',
+                     fields=fields)
+
+
+def _answers(field_count):
+    answers = {1: '42', 2: 'some text'}
+    return dict(('Q%d' % index, answers.get(index % 3, 'b')) for index in range(field_count))
+
+
+def _legacy_get_by_code(fields, code):
+    for field in fields:
+        if code is not None and field.code.lower() == code.lower():
+            return field
+    return None
+
+
+def _legacy_validate_answer_for_field(answer, field):
+    try:
+        return True, field.validate(answer)
+    except Exception as e:
+        field.errors.append(e.message)
+        return False, e.message
+
+
+def _legacy_validate_submission(form_model, values):
+    cleaned_values = OrderedDict()
+    errors = OrderedDict()
+    for field in form_model.fields:
+        field.errors = []
+    values = OrderedDict([(k, v) for k, v in values.items() if not is_empty(v)])
+    values = form_model.remove_invalid_meta_answers(values)
+    values = OrderedDict([(k, v) for k, v in values.items() if _legacy_get_by_code(form_model.fields, k) is not None])
+    for key in values:
+        field = _legacy_get_by_code(form_model.fields, key)
+        is_valid, result = _legacy_validate_answer_for_field(values[key], field)
+        if is_valid:
+            cleaned_values[field.code] = result
+        else:
+            errors[field.code] = result if not errors.get(field.code) else errors[field.code]
+    return cleaned_values, errors
+
+
+def run():
+    for field_count in FIELD_COUNTS:
+        form_model = _form_model(field_count)
+        form_model.validators = []
+        values = _answers(field_count)
+        cleaned_values, errors = form_model.validate_submission(values)
+        legacy_cleaned_values, legacy_errors = _legacy_validate_submission(form_model, values)
+        assert dict(cleaned_values) == dict(legacy_cleaned_values) and dict(errors) == dict(legacy_errors)
+        legacy = timeit(lambda: _legacy_validate_submission(form_model, values), number=ITERATIONS)
+        compiled = timeit(lambda: form_model.validate_submission(values), number=ITERATIONS)
+        print "%4d fields: legacy %7.3f ms, compiled %7.3f ms per submission (%.1fx)" % (
+            field_count, legacy * 1000 / ITERATIONS, compiled * 1000 / ITERATIONS, legacy / compiled)
+
+
+if __name__ == '__main__':
+    run()
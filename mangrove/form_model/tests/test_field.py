@@ -1,4 +1,6 @@
 # vim= ai ts=4 sts=4 et sw=4 encoding=utf-8
+import copy
+import pickle
 import unittest
 from datetime import datetime
 
@@ -215,6 +217,33 @@ class TestField(unittest.TestCase):
         field.set_value(field.validate('ab'))
         self.assertEqual("RED,YELLOW", field.convert_to_unicode())
 
+    def test_select_fields_with_same_options_should_share_them(self):
+        first = SelectField(name="color", code="Q3", label="Color", options=[("RED", 'a'), ("YELLOW", 'b')])
+        second = SelectField(name="shade", code="Q4", label="Shade", options=[("RED", 'a'), ("YELLOW", 'b')])
+
+        self.assertIs(first._choices, second._choices)
+        self.assertIs(first._choices.text_by_val, second.constraint.choice_dict)
+        self.assertEqual(first.options, second.options)
+        self.assertEqual({'a': "RED", 'b': "YELLOW"}, first.get_options_map())
+        self.assertEqual("YELLOW", first.get_value_by_option('B'))
+        self.assertEqual('z', first.get_value_by_option('z', default='z'))
+
+    def test_escaping_option_text_should_not_change_fields_sharing_the_options(self):
+        first = SelectField(name="color", code="Q3", label="Color", options=[("R&D", 'a')])
+        second = SelectField(name="shade", code="Q4", label="Shade", options=[("R&D", 'a')])
+
+        first.escape_option_text()
+
+        self.assertEqual("R&amp;D", first.get_value_by_option('a'))
+        self.assertEqual("R&D", second.get_value_by_option('a'))
+
+    def test_fields_should_not_have_instance_dict(self):
+        fields = [TextField(name="n", code="c", label="l"), FieldSet(name="f", code="f", label="f"),
+                  SelectField(name="s", code="s", label="s", options=[("RED", 'a')]),
+                  UniqueIdField(unique_id_type="clinic", name="u", code="u", label="u")]
+        for each in fields:
+            self.assertFalse(hasattr(each, '__dict__'))
+
     def test_should_remove_spaces_if_present_in_answer_for_multi_select(self):
         field = SelectField(name="color", code="Q3", label="What is your favorite color",
                             options=[("RED", 'a'), ("YELLOW", 'b'), ('green')], single_select_flag=False,
@@ -300,7 +329,7 @@ class TestField(unittest.TestCase):
         }
         created_field = field.create_question_from(field_json, self.dbm)
         self.assertIsInstance(created_field, IntegerField)
-        self.assertEqual(created_field._dict["constraints"][0][1], {"min": 0, "max": 100})
+        self.assertEqual(created_field._to_json()["constraints"][0][1], {"min": 0, "max": 100})
         self.assertIsInstance(created_field.constraints[0], NumericRangeConstraint)
         self.assertEqual(created_field.constraints[0].max, 100)
         self.assertEqual(created_field.constraints[0].min, 0)
@@ -321,7 +350,7 @@ class TestField(unittest.TestCase):
         }
         created_field = field.create_question_from(field_json, self.dbm)
         self.assertIsInstance(created_field, IntegerField)
-        self.assertEqual(created_field._dict["constraints"][0][1], {"min": 0, "max": 100})
+        self.assertEqual(created_field._to_json()["constraints"][0][1], {"min": 0, "max": 100})
         self.assertIsInstance(created_field.constraints[0], NumericRangeConstraint)
         self.assertEqual(LABEL, created_field.label)
         self.assertEqual(created_field.constraints[0].max, 100)
@@ -891,6 +920,38 @@ class TestField(unittest.TestCase):
         self.assertEqual(expected_date_string, actual_date_string)
 
 
+    def test_should_not_let_callers_change_shared_select_options(self):
+        options = [{'text': 'one', 'val': 'a'}, {'text': 'two', 'val': 'b'}]
+        first = SelectField(name="first", code="Q1", label="first", options=options)
+        second = SelectField(name="second", code="Q2", label="second", options=[dict(option) for option in options])
+        options[0]['text'] = 'changed'
+        first._to_json()['choices'][0]['text'] = 'HACKED'
+        first.options[1]['text'] = 'HACKED'
+        first.get_options_map()['a'] = 'HACKED'
+        self.assertEqual([{'text': 'one', 'val': 'a'}, {'text': 'two', 'val': 'b'}], second.options)
+        self.assertEqual({'a': 'one', 'b': 'two'}, second.get_options_map())
+
+    def test_should_read_shared_select_options_without_copying_them(self):
+        first = SelectField(name="first", code="Q1", label="first", options=[("one", "a"), ("two", "b")])
+        second = SelectField(name="second", code="Q2", label="second", options=[("one", "a"), ("two", "b")])
+        self.assertIs(first.option_view, second.option_view)
+        self.assertEqual([{'text': 'one', 'val': 'a'}, {'text': 'two', 'val': 'b'}], list(first.option_view))
+        with self.assertRaises(TypeError):
+            first.option_view[0]['text'] = 'HACKED'
+        options = copy.deepcopy(first.option_view)
+        options[0]['text'] = 'changed'
+        self.assertEqual('one', second.option_view[0]['text'])
+        self.assertEqual({'text': 'one', 'val': 'a'}, pickle.loads(pickle.dumps(first.option_view[0], 2)))
+
+    def test_should_pickle_fields_with_every_protocol(self):
+        select = SelectField(name="color", code="Q1", label="color", options=[("red", "a"), ("blue", "b")])
+        text = TextField(name="name", code="Q2", label="name", constraints=[TextLengthConstraint(max=10)])
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            unpickled_select, unpickled_text = pickle.loads(pickle.dumps([select, text], protocol))
+            self.assertEqual(select.options, unpickled_select.options)
+            self.assertEqual('blue', unpickled_select.get_value_by_option('B'))
+            self.assertEqual(text._to_json(), unpickled_text._to_json())
+
 class TestUniqueIdField(unittest.TestCase):
 
     def test_should_generate_unicode_value_when_value_present(self):
@@ -6,6 +6,7 @@ from mangrove.datastore.database import DatabaseManager, DataObject
 from mangrove.form_model.field import TextField, IntegerField, SelectField, DateField, GeoCodeField, UniqueIdField, \
     FieldSet
 from mangrove.form_model.form_model import FormModel, get_form_model_by_code, EntityFormModel, get_form_model_by_entity_type
+from mangrove.form_model.form_model_cache import form_model_cache
 from mangrove.form_model.validation import NumericRangeConstraint, TextLengthConstraint
 from mangrove.form_model.validators import MandatoryValidator, UniqueIdExistsValidator
 import mangrove.errors.MangroveException as ex
@@ -48,31 +49,34 @@ class TestFormModel(unittest.TestCase):
 
     def test_should_return_error_for_invalid_integer_value(self):
         answers = {"id": "1", "Q2": "200"}
-        cleaned_answers, errors = self.form_model.validate_submission(answers)
+        validation = self.form_model.validate_submission(answers)
+        cleaned_answers, errors = validation
         self.assertEqual(len(errors), 1)
         self.assertEqual({'Q2': "Answer 200 for question Q2 is greater than allowed."}, errors)
         self.assertEqual(OrderedDict([('ID', '1')]), cleaned_answers)
-        self.assertTrue(isinstance(self.form_model.validation_exception[0], ex.AnswerTooBigException))
-        self.assertEqual(len(self.form_model.validation_exception), 1)
+        self.assertTrue(isinstance(validation.exceptions[0], ex.AnswerTooBigException))
+        self.assertEqual(len(validation.exceptions), 1)
 
     def test_should_return_error_if_exceeding_value_of_the_word_field_limit(self):
         answers = {"id": "1", "Q1": "TextThatLongerThanAllowed"}
-        cleaned_answers, errors = self.form_model.validate_submission(answers)
+        validation = self.form_model.validate_submission(answers)
+        cleaned_answers, errors = validation
         self.assertEqual(len(errors), 1)
         self.assertEqual({'Q1': 'Answer TextThatLongerThanAllowed for question Q1 is longer than allowed.'}, errors)
         self.assertEqual(OrderedDict([('ID', '1')]), cleaned_answers)
-        self.assertEqual(len(self.form_model.validation_exception), 1)
-        self.assertTrue(isinstance(self.form_model.validation_exception[0], ex.AnswerTooLongException))
+        self.assertEqual(len(validation.exceptions), 1)
+        self.assertTrue(isinstance(validation.exceptions[0], ex.AnswerTooLongException))
 
 
     def test_should_return_error_if_answering_with_invalid_geo_format(self):
         answers = {"id": "1", "loc": "127.178057 -78.007789"}
-        cleaned_answers, errors = self.form_model.validate_submission(answers)
+        validation = self.form_model.validate_submission(answers)
+        cleaned_answers, errors = validation
         self.assertEqual(len(errors), 1)
         self.assertEqual({'loc': 'Invalid GPS value.'}, errors)
         self.assertEqual(OrderedDict([('ID', '1')]), cleaned_answers)
-        self.assertEqual(len(self.form_model.validation_exception), 1)
-        self.assertTrue(isinstance(self.form_model.validation_exception[0], ex.LatitudeNotInRange))
+        self.assertEqual(len(validation.exceptions), 1)
+        self.assertTrue(isinstance(validation.exceptions[0], ex.LatitudeNotInRange))
 
 
     def test_should_ignore_field_validation_if_the_answer_is_not_present(self):
@@ -89,14 +93,15 @@ class TestFormModel(unittest.TestCase):
 
     def test_should_return_errors_for_invalid_text_and_integer(self):
         answers = {"id": "1", "Q1": "Asif", "Q2": "200", "q3": "a"}
-        cleaned_answers, errors = self.form_model.validate_submission(answers)
+        validation = self.form_model.validate_submission(answers)
+        cleaned_answers, errors = validation
         self.assertEqual(len(errors), 2)
         self.assertEqual({'Q1': 'Answer Asif for question Q1 is shorter than allowed.',
                           'Q2': "Answer 200 for question Q2 is greater than allowed."}, errors)
         self.assertEqual(OrderedDict([('Q3', ['RED']), ('ID', '1')]), cleaned_answers)
-        self.assertTrue(isinstance(self.form_model.validation_exception[1], ex.AnswerTooBigException))
-        self.assertTrue(isinstance(self.form_model.validation_exception[0], ex.AnswerTooShortException))
-        self.assertEqual(len(self.form_model.validation_exception), 2)
+        self.assertTrue(isinstance(validation.exceptions[1], ex.AnswerTooBigException))
+        self.assertTrue(isinstance(validation.exceptions[0], ex.AnswerTooShortException))
+        self.assertEqual(len(validation.exceptions), 2)
 
     def test_should_strip_whitespaces(self):
         answers = {"id": "1", "q1": "   My Name", "q2": "  40 ", "q3": "a     ", "q4": "    "}
@@ -121,11 +126,12 @@ class TestFormModel(unittest.TestCase):
 
     def test_should_return_invalid_form_submission(self):
         answers = {"ID": "1", "Q2": "non number value"}
-        cleaned_data, errors = self.form_model.validate_submission(answers)
+        validation = self.form_model.validate_submission(answers)
+        cleaned_data, errors = validation
         self.assertEqual({'ID': '1'}, cleaned_data)
         self.assertEqual(1, len(errors))
-        self.assertEqual(1, len(self.form_model.validation_exception))
-        self.assertTrue(isinstance(self.form_model.validation_exception[0], ex.AnswerWrongType))
+        self.assertEqual(1, len(validation.exceptions))
+        self.assertTrue(isinstance(validation.exceptions[0], ex.AnswerWrongType))
 
     def test_should_give_back_unique_id_field(self):
         question1 = UniqueIdField('entity_type', name="question1_Name", code="Q1", label="What is your name",
@@ -144,28 +150,33 @@ class TestFormModel(unittest.TestCase):
 
     def test_should_bind_form_to_submission(self):
         answers = {"ID": "1", "q1": "Asif", "q2": "200", "q3": "1", "q4": ""}
-        self.form_model.bind(answers)
+        bound_form = self.form_model.bind(answers)
         self.assertEqual(answers, self.form_model.submission)
         for field in self.form_model.fields:
-            self.assertEqual(self._case_insensitive_lookup(answers, field.code), field.value,
+            self.assertEqual(self._case_insensitive_lookup(answers, field.code), bound_form.value(field.code),
                              "No match for field %s" % (field.code,))
+            self.assertNotEqual("Asif", field.value)
+        self.assertEqual(bound_form.bound_values(), self.form_model.bound_values())
 
     def test_should_set_error_on_field_validation_failure(self):
         answers = {"id": "1", "q1": "ab", "q2": "200"}
-        cleaned_answers, errors = self.form_model.validate_submission(answers)
+        bound_form = self.form_model.bind(answers)
+        cleaned_answers, errors = bound_form.validate()
         self.assertEqual(len(errors), 2)
-        self.assertEqual(["Answer 200 for question Q2 is greater than allowed."], self.form_model.get_field_by_code(
-            "q2").errors)
-        self.assertEqual(['Answer ab for question Q1 is shorter than allowed.'], self.form_model.get_field_by_code(
-            "q1").errors)
+        self.assertEqual("Answer 200 for question Q2 is greater than allowed.", bound_form.errors["Q2"])
+        self.assertEqual('Answer ab for question Q1 is shorter than allowed.', bound_form.errors["Q1"])
+        self.assertEqual(2, len(bound_form.exceptions))
+        self.assertEqual([], self.form_model.get_field_by_code("q2").errors)
+        self.assertEqual((cleaned_answers, errors), self.form_model.validate_submission(answers))
 
     def test_should_not_set_error_if_validation_success(self):
         answers = {"id": "1", "q1": "abcdef", "q2": "100"}
-        cleaned_answers, errors = self.form_model.validate_submission(answers)
+        validation = self.form_model.validate_submission(answers)
+        cleaned_answers, errors = validation
         self.assertEqual(len(errors), 0)
         for field in self.form_model.fields:
             self.assertEqual([], field.errors)
-        self.assertEqual(self.form_model.validation_exception, [])
+        self.assertEqual(validation.exceptions, [])
 
     def test_should_return_choice_fields(self):
         self.assertEquals(self.form_model.choice_fields[0].code, "Q3")
@@ -241,6 +252,115 @@ class TestFormModel(unittest.TestCase):
         form_model._form_fields = [fieldset_field]
         self.assertEqual(field1, form_model.get_field_by_code_in_fieldset('text','field_set_code'))
 
+    def test_should_get_field_from_nested_field_set_case_insensitively(self):
+        field1 = TextField('text', 'text', 'text label')
+        inner_field_set = FieldSet('inner', 'inner_code', 'inner label', field_set=[field1])
+        fieldset_field = FieldSet('field_set', 'field_set_code', 'field set label', field_set=[inner_field_set])
+
+        form_model = FormModel(Mock(spec=DatabaseManager))
+        form_model._form_fields = [fieldset_field]
+        self.assertEqual(field1, form_model.get_field_by_code_in_fieldset('TEXT', 'field_set_code'))
+        self.assertIsNone(form_model.get_field_by_code_in_fieldset('missing', 'field_set_code'))
+
+        other_field = TextField('text', 'text', 'other label')
+        form_model._form_fields = [FieldSet('field_set', 'field_set_code', 'field set label', field_set=[other_field])]
+        self.assertEqual(other_field, form_model.get_field_by_code_in_fieldset('text', 'field_set_code'))
+
+    def test_should_build_form_model_once_per_revision(self):
+        row_value = {'_id': 'form_id', '_rev': '1-abc', 'form_code': 'code', 'name': 'aids', 'json_fields': []}
+        form_model_cache.clear()
+        with patch('mangrove.form_model.form_model.get_cache_manager') as get_cache_manager:
+            with patch('mangrove.form_model.form_model.get_form_model_cache_key') as get_form_model_cache_key:
+                get_cache_manager.return_value = {'cache_key': row_value}
+                get_form_model_cache_key.return_value = 'cache_key'
+                with patch.object(FormModel, 'new_from_doc', wraps=FormModel.new_from_doc) as new_from_doc:
+                    first = get_form_model_by_code(self.dbm, 'code')
+                    second = get_form_model_by_code(self.dbm, 'code')
+                    self.assertEqual(1, new_from_doc.call_count)
+        self.assertIsNot(first, second)
+        self.assertIsNot(first._doc, second._doc)
+        self.assertEqual({'size': 1, 'max_size': 256, 'hits': 1, 'misses': 1}, form_model_cache.stats())
+
+    def test_should_not_share_document_changes_between_cached_copies(self):
+        row_value = {'_id': 'form_id', '_rev': '1-abc', 'form_code': 'code', 'name': 'aids', 'json_fields': []}
+        form_model_cache.clear()
+        with patch('mangrove.form_model.form_model.get_cache_manager') as get_cache_manager:
+            with patch('mangrove.form_model.form_model.get_form_model_cache_key') as get_form_model_cache_key:
+                get_cache_manager.return_value = {'cache_key': row_value}
+                get_form_model_cache_key.return_value = 'cache_key'
+                first = get_form_model_by_code(self.dbm, 'code')
+                first.name = 'changed'
+                first.add_field(TextField('text', 'text', 'text label'))
+                second = get_form_model_by_code(self.dbm, 'code')
+        self.assertEqual('aids', second.name)
+        self.assertEqual([], second.fields)
+
+    def test_should_invalidate_cached_form_models_when_removed_from_cache(self):
+        form_model_cache.clear()
+        form_model_cache.put('cache_key', '1-abc', FormModel, self.form_model)
+        with patch('mangrove.form_model.form_model.get_cache_manager'):
+            with patch('mangrove.form_model.form_model.get_form_model_cache_key') as get_form_model_cache_key:
+                get_form_model_cache_key.return_value = 'cache_key'
+                self.form_model._delete_form_model_from_cache()
+        self.assertIsNone(form_model_cache.get('cache_key', '1-abc', FormModel))
+
+    def test_should_find_nested_fields_by_code_ignoring_case(self):
+        field1 = TextField('text', 'text', 'text label', parent_field_code='field_set_code')
+        fieldset_field = FieldSet('field_set', 'field_set_code', 'field set label', field_set=[field1])
+        form_model = FormModel(self.dbm, name='aids', label='aids', form_code='aids', fields=[fieldset_field])
+        self.assertEqual(field1, form_model.get_field_by_code('TEXT'))
+        self.assertEqual(fieldset_field, form_model.get_field_by_code('Field_Set_Code'))
+        self.assertIsNone(form_model.get_field_by_code(None))
+
+    def test_should_rebuild_field_indexes_when_fields_change(self):
+        self.assertIsNone(self.form_model.get_field_by_code('q5'))
+        self.assertIsNone(self.form_model.get_field_by_name('new_question'))
+        new_field = TextField(name='new_question', code='Q5', label='A new question')
+        self.form_model.add_field(new_field)
+        self.assertEqual(new_field, self.form_model.get_field_by_code('q5'))
+        self.assertEqual(new_field, self.form_model.get_field_by_name('new_question'))
+        self.form_model.delete_field('Q5')
+        self.assertIsNone(self.form_model.get_field_by_code('q5'))
+        self.assertIsNone(self.form_model.get_field_by_name('new_question'))
+
+    def test_should_rebuild_field_indexes_when_field_list_is_changed_directly(self):
+        validator = self.form_model.submission_validator
+        appended = TextField(name='appended', code='Q5', label='Appended question')
+        self.form_model.fields.append(appended)
+        self.assertEqual(appended, self.form_model.get_field_by_code('q5'))
+        self.assertIsNot(validator, self.form_model.submission_validator)
+        replaced = TextField(name='replaced', code='Q6', label='Replaced question')
+        self.form_model._form_fields = [replaced]
+        self.assertIsNone(self.form_model.get_field_by_code('q5'))
+        self.assertEqual(replaced, self.form_model.get_field_by_name('replaced'))
+
+    def test_should_bind_answers_ignoring_case_of_codes(self):
+        bound_form = self.form_model.bind({'id': 'CLI001', 'q1': 'Ann'})
+        self.assertEqual('cli001', bound_form.value('ID'))
+        self.assertEqual('Ann', bound_form.value('Q1'))
+        self.assertIsNone(bound_form.value('Q2'))
+
+    def test_should_validate_answers_without_changing_fields(self):
+        validator = self.form_model.submission_validator
+        cleaned_values, errors, exceptions = validator.validate({'q2': '200', 'q1': 'Annabel', 'unknown': 'x', 'q3': ''})
+        self.assertEqual({'Q1': 'Annabel'}, cleaned_values)
+        self.assertEqual(['Q2'], errors.keys())
+        self.assertEqual(1, len(exceptions))
+        self.assertEqual([], self.form_model.get_field_by_code('Q2').errors)
+
+    def test_should_return_the_exceptions_of_each_validation_separately(self):
+        first = self.form_model.validate_submission({'id': '1', 'q2': '200'})
+        second = self.form_model.validate_submission({'id': '1', 'q2': '300'})
+        self.assertEqual(1, len(first.exceptions))
+        self.assertEqual(1, len(second.exceptions))
+        self.assertIsNot(first.exceptions[0], second.exceptions[0])
+
+    def test_should_compile_submission_validator_once_per_revision(self):
+        validator = self.form_model.submission_validator
+        self.assertIs(validator, self.form_model.copy_for_request(self.dbm).submission_validator)
+        self.form_model.add_field(TextField(name='new_question', code='Q5', label='A new question'))
+        self.assertIsNot(validator, self.form_model.submission_validator)
+
 class DatabaseManagerStub(DatabaseManager):
     def __init__(self):
         self.view = Mock()
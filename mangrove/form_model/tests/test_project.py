@@ -0,0 +1,39 @@
+import unittest
+from mock import Mock
+from mangrove.datastore.database import DatabaseManager
+from mangrove.errors.MangroveException import FormModelDoesNotExistsException
+from mangrove.form_model.project import get_active_form_model, get_active_form_model_name_and_id, Project
+
+
+class TestActiveProject(unittest.TestCase):
+    def setUp(self):
+        self.dbm = Mock(spec=DatabaseManager)
+        self.dbm.view = Mock()
+        self.project_doc = {'_id': 'poll1', 'document_type': 'FormModel', 'name': 'Poll', 'form_code': 'poll1',
+                            'active': 'active', 'is_poll': True, 'json_fields': [], 'validators': []}
+
+    def test_should_read_active_project_from_active_projects_view(self):
+        self.dbm.view.active_projects.return_value = [{'id': 'poll1', 'value': 'Poll', 'doc': self.project_doc}]
+
+        project = get_active_form_model(self.dbm, 'unknown')
+
+        self.assertIsInstance(project, Project)
+        self.assertEqual('poll1', project.form_code)
+        self.assertTrue(project.active)
+        self.dbm.view.active_projects.assert_called_once_with(key='active', limit=1, include_docs=True)
+
+    def test_should_raise_when_no_project_is_active(self):
+        self.dbm.view.active_projects.return_value = []
+
+        self.assertRaises(FormModelDoesNotExistsException, get_active_form_model, self.dbm, 'unknown')
+
+    def test_should_return_active_project_name_and_id_without_loading_document(self):
+        self.dbm.view.active_projects.return_value = [{'id': 'poll1', 'value': 'Poll'}]
+
+        self.assertEqual((True, 'poll1', 'Poll'), get_active_form_model_name_and_id(self.dbm))
+        self.dbm.view.active_projects.assert_called_once_with(key='active', limit=1, include_docs=False)
+
+    def test_should_report_no_active_project(self):
+        self.dbm.view.active_projects.return_value = []
+
+        self.assertEqual((False, "", ""), get_active_form_model_name_and_id(self.dbm))
@@ -0,0 +1,50 @@
+import unittest
+from mock import Mock, patch
+from mangrove.datastore.database import DatabaseManager
+from mangrove.form_model.field import TextField
+from mangrove.form_model.snapshots import FormSnapshots
+
+
+class TestFormSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.dbm = Mock(spec=DatabaseManager)
+        self.name_json = TextField(name="name", code="q1", label="Name")._to_json()
+        self.age_json = TextField(name="age", code="q2", label="Age")._to_json()
+        self.snapshots_json = {'1-a': [self.name_json], '2-b': [dict(self.name_json), self.age_json]}
+
+    def test_should_build_fields_only_for_revision_asked_for(self):
+        with patch('mangrove.form_model.snapshots.field.create_question_from') as create_question_from:
+            snapshots = FormSnapshots(self.dbm, self.snapshots_json)
+            self.assertEqual(2, len(snapshots))
+            self.assertEqual(['1-a', '2-b'], sorted(snapshots))
+            self.assertFalse(create_question_from.called)
+
+            snapshots['1-a']
+            self.assertEqual(1, create_question_from.call_count)
+
+    def test_should_share_identical_fields_across_revisions(self):
+        snapshots = FormSnapshots(self.dbm, self.snapshots_json)
+
+        self.assertIs(snapshots['1-a'][0], snapshots['2-b'][0])
+        self.assertEqual("age", snapshots['2-b'][1].name)
+
+    def test_should_write_unbuilt_revisions_back_as_read(self):
+        snapshots = FormSnapshots(self.dbm, self.snapshots_json)
+        snapshots['1-a']
+        fields = [TextField(name="place", code="q3", label="Place")]
+        snapshots['3-c'] = fields
+
+        snapshots_json = snapshots.to_json()
+
+        self.assertIs(self.snapshots_json['2-b'], snapshots_json['2-b'])
+        self.assertEqual([self.name_json], snapshots_json['1-a'])
+        self.assertEqual([fields[0]._to_json()], snapshots_json['3-c'])
+
+    def test_should_copy_without_sharing_revisions_added_later(self):
+        snapshots = FormSnapshots(self.dbm, self.snapshots_json)
+        copied = snapshots.copy()
+        copied['3-c'] = []
+
+        self.assertEqual(3, len(copied))
+        self.assertEqual(2, len(snapshots))
+        self.assertEqual([], snapshots.get('3-c', []))
@@ -72,7 +72,7 @@ class ChoiceConstraint(object):
     def __init__(self, single_select_constraint, list_of_valid_choices, code, dict=None, has_other=False):
         self.single_select_constraint = single_select_constraint
         self.list_of_valid_choices = list_of_valid_choices
-        self.choice_dict = self.get_item(self.list_of_valid_choices)
+        self.choice_dict = dict if dict is not None else self.get_item(self.list_of_valid_choices)
         self.choice_vals = self.choice_dict.keys()
         self.code = code
         self.has_other = has_other
@@ -103,7 +103,7 @@ class ChoiceConstraint(object):
             responses = [r.strip() for r in responses]
         elif ' ' in answer_string:
             responses = answer_string.split(' ')
-        elif answer_string in self.choice_vals:
+        elif answer_string in self.choice_dict:
             responses = [answer_string]
         elif self.has_other:
             responses = [answer_string]
@@ -119,7 +119,7 @@ class ChoiceConstraint(object):
             raise AnswerHasTooManyValuesException(code=self.code, answer=answer)
 
         for response in responses:
-            if response in self.choice_vals:
+            if response in self.choice_dict:
                 choice_selected = self.choice_dict[response]
                 if choice_selected not in choices_text:
                     choices_text.append(choice_selected)
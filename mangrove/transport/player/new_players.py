@@ -1,19 +1,23 @@
+from functools import partial
 import inspect
 import os
 from tempfile import NamedTemporaryFile
 
-from PIL import Image
-
+from mangrove.datastore.database import unit_of_work
 from mangrove.datastore.entity import contact_by_short_code
 from mangrove.form_model.form_model import NAME_FIELD, EntityFormModel, get_form_model_by_code
-from mangrove.transport import TransportInfo
+from mangrove.transport import TransportInfo, Response
 from mangrove.transport.player.parser import WebParser, SMSParserFactory, XFormParser
-from mangrove.transport.repository.survey_responses import get_survey_response_document
 from mangrove.transport.services.MediaSubmissionService import MediaSubmissionService
+from mangrove.transport.services.chunked_save import save_chunk
+from mangrove.transport.services.media_preview_worker import write_thumbnail
 from mangrove.transport.services.identification_number_service import IdentificationNumberService
 from mangrove.transport.services.survey_response_service import SurveyResponseService
 from mangrove.transport.repository import reporters
-from mangrove.errors.MangroveException import NumberNotRegisteredException, MangroveException
+from mangrove.transport.request_context import RequestContext, memoize, PARSE, REPORTER
+from mangrove.errors.MangroveException import NumberNotRegisteredException
+
+SMS_BATCH_CHUNK_SIZE = 100
 
 
 class WebPlayerV2(object):
@@ -69,8 +73,10 @@ class SMSPlayerV2(object):
         return reporter_entity_names
 
     def add_survey_response(self, request, logger=None, additional_feed_dictionary=None,
-                            translation_processor=None):
-        form_code, values, extra_elements = self._parse(request.message)
+                            translation_processor=None, context=None):
+        if context is None:
+            context = RequestContext(self.dbm)
+        form_code, values, extra_elements = self._parse(request.message, context)
         post_sms_processor_response = self._post_parse_processor(form_code, values, extra_elements)
 
         if post_sms_processor_response is not None and not post_sms_processor_response.success:
@@ -80,39 +86,74 @@ class SMSPlayerV2(object):
                 logger.info(log_entry)
             return post_sms_processor_response
 
+        source = request.transport.source
         try:
-            reporter_entity = reporters.find_reporter_entity(self.dbm, request.transport.source)
+            reporter_entity = memoize(context, (REPORTER, source),
+                                      lambda: reporters.find_reporter_entity(self.dbm, source))
             reporter_entity_names = self._get_reporter_name(reporter_entity)
             reporter_short_code = reporter_entity.short_code
         except NumberNotRegisteredException:
             reporter_short_code = None
             reporter_entity_names = None
 
-        service = SurveyResponseService(self.dbm, logger, self.feeds_dbm, response=post_sms_processor_response)
+        service = SurveyResponseService(self.dbm, logger, self.feeds_dbm, response=post_sms_processor_response,
+                                        context=context)
         return service.save_survey(form_code, values, reporter_entity_names, request.transport,
                                    reporter_short_code, additional_feed_dictionary=additional_feed_dictionary,
                                    translation_processor=translation_processor)
 
-    def _parse(self, message):
-        return SMSParserFactory().getSMSParser(message, self.dbm).parse(message)
+    def add_survey_responses(self, requests, logger=None, additional_feed_dictionary=None,
+                             translation_processor=None, chunk_size=SMS_BATCH_CHUNK_SIZE):
+        """
+        Saves a burst of SMS submissions. Form models, projects and active polls are looked up once per batch and
+        the reporters of all senders with one query; the survey responses, data records and feed documents are
+        written with one bulk update per chunk_size requests. Returns one Response per request, in order, once
+        its chunk has been written; a request that failed, or whose documents were not written, gets a Response
+        carrying its exception.
+        """
+        batch = RequestContext(self.dbm)
+        self._preload_reporters(batch, [request.transport.source for request in requests])
+        save = lambda request: self.add_survey_response(request, logger, additional_feed_dictionary,
+                                                        translation_processor, context=batch.child())
+        failed = lambda request, e: Response(errors=e.message, exception=e)
+        responses = []
+        for start in range(0, len(requests), chunk_size):
+            responses.extend(save_chunk(self.dbm, self.feeds_dbm, requests[start:start + chunk_size], save, failed))
+        return responses
+
+    def _preload_reporters(self, context, sources):
+        reporters_by_number = reporters.find_reporters_by_from_numbers(self.dbm,
+                                                                      [source.strip("+") for source in sources])
+        context.preload(dict(((REPORTER, source),
+                              partial(reporters.single_reporter_entity, source,
+                                      reporters_by_number.get(source.strip("+"), [])))
+                             for source in sources))
+
+    def _parse(self, message, context=None):
+        return memoize(context, (PARSE, message),
+                       lambda: SMSParserFactory().getSMSParser(message, self.dbm, context).parse(message))
 
 
 class XFormPlayerV2(object):
-    def __init__(self, dbm, feeds_dbm=None):
+    def __init__(self, dbm, feeds_dbm=None, preview_worker=None):
         self.dbm = dbm
         self.feeds_dbm = feeds_dbm
+        self.preview_worker = preview_worker
 
-    def _parse(self, message):
-        return XFormParser(self.dbm).parse(message)
+    def _parse(self, message, form_model=None, context=None):
+        return XFormParser(self.dbm, context).parse(message, form_model)
 
-    def add_survey_response(self, request, reporter_id, logger=None):
+    def add_survey_response(self, request, reporter_id, logger=None, form_model=None):
         assert request is not None
-        form_code, values = self._parse(request.message)
-        media_submission_service = MediaSubmissionService(self.dbm, request.media, form_code)
+        context = RequestContext(self.dbm)
+        form_code, values = self._parse(request.message, form_model, context)
+        media_submission_service = MediaSubmissionService(self.dbm, request.media, form_code, context=context)
         media_files = media_submission_service.create_media_documents(values)
-        service = SurveyResponseService(self.dbm, logger, self.feeds_dbm)
-        response = service.save_survey(form_code, values, [], request.transport, reporter_id)
-        thumbnails = self._add_new_attachments(media_files, response.survey_response_id)
+        attachments, thumbnails = self._attachments(media_files)
+        service = SurveyResponseService(self.dbm, logger, self.feeds_dbm, context=context)
+        response = service.save_survey(form_code, values, [], request.transport, reporter_id,
+                                       attachments=attachments)
+        self._add_previews(media_files, response.survey_response_id, media_submission_service.form_model.id)
         media_submission_service.create_preview_documents(thumbnails)
         return response
 
@@ -121,67 +162,64 @@ class XFormPlayerV2(object):
         form_code, values = self._parse(request.message)
         media_submission_service = MediaSubmissionService(self.dbm, request.media, form_code, is_update=True)
         media_files = media_submission_service.create_media_documents(values)
+        attachments, thumbnails = self._attachments(media_files)
         service = SurveyResponseService(self.dbm, logger, self.feeds_dbm)
-        response = service.edit_survey(form_code, values, [], survey_response, additional_feed_dictionary)
-        self._delete_removed_attachments(request, survey_response.id, media_submission_service)
-        thumbnails = self._add_new_attachments(media_files, survey_response.id)
+        with unit_of_work(self.dbm) as unit:
+            response = service.edit_survey(form_code, values, [], survey_response, additional_feed_dictionary)
+            removed_attachments = self._removed_attachments(request, survey_response, media_submission_service)
+            if attachments or removed_attachments:
+                unit.attach(survey_response._doc, attachments, removed_attachments)
+        response.version = survey_response.version
+        self._add_previews(media_files, survey_response.id, media_submission_service.form_model.id)
         media_submission_service.create_preview_documents(thumbnails)
         return response
 
-    def _add_new_attachments(self, media_files, survey_response_id):
-        thumbnails = {}
-        if media_files:
-            document = get_survey_response_document(self.dbm, survey_response_id)
-            for name, attached_file in media_files.iteritems():
-                thumb_file = self._get_thumbnail(attached_file)
-                if thumb_file:
-                    thumb_file.seek(0)
-                    thumbnail_name = 'preview_' + name
-                    self.dbm.put_attachment(document, thumb_file, attachment_name=thumbnail_name)
-                    thumbnails[thumbnail_name] = os.stat(thumb_file.name).st_size
-                # Ignore submission xml file from ODK
-                if name != 'xml_submission_file':
-                    attached_file.seek(0)
-                    self.dbm.put_attachment(document, attached_file, attachment_name=name)
-        return thumbnails
+    def _attachments(self, media_files):
+        """
+        Returns the attachments to write with the survey response for the media files, and the size of every
+        preview made. With a preview worker, previews are left to it and made after the submission has been
+        answered.
+        """
+        attachments, thumbnails = [], {}
+        for name, attached_file in (media_files or {}).iteritems():
+            thumb_file = self._get_thumbnail(attached_file) if self.preview_worker is None else None
+            if thumb_file:
+                thumbnail_name = 'preview_' + name
+                attachments.append((thumbnail_name, thumb_file))
+                thumbnails[thumbnail_name] = os.stat(thumb_file.name).st_size
+            # Ignore submission xml file from ODK
+            if name != 'xml_submission_file':
+                attachments.append((name, attached_file))
+        return attachments, thumbnails
+
+    def _add_previews(self, media_files, survey_response_id, form_model_id):
+        if self.preview_worker is None:
+            return
+        for name, attached_file in (media_files or {}).iteritems():
+            if name != 'xml_submission_file':
+                self.preview_worker.add_preview(self.dbm, survey_response_id, form_model_id, name, attached_file)
 
     def _get_thumbnail(self, attached_file):
-        small = 128, 128
-        attached_file.seek(0)
-        try:
-            small_im = Image.open(attached_file)
-        except IOError:
-            return None
-        small_im.thumbnail(small, Image.ANTIALIAS)
-        small_im.resize(small, Image.ANTIALIAS)
         temp_file = NamedTemporaryFile(suffix='.' + attached_file.name.split('.')[-1])
-        small_im.save(temp_file, quality=50)
+        if not write_thumbnail(attached_file, temp_file):
+            return None
         return temp_file
 
-    def _delete_removed_attachments(self, request, survey_response_id, media_submission_service):
-        if request.retain_files and len(request.retain_files) > 0:
-            self._keep_attachments(survey_response_id, request.retain_files, media_submission_service)
-        else:
-            self._delete_all_attachments(survey_response_id, media_submission_service)
-
-    def _keep_attachments(self, survey_response_id, retain_files, media_submission_service):
-        survey_response_document = get_survey_response_document(self.dbm, survey_response_id)
-        existing_media_attachments = survey_response_document._data.get('_attachments', {})
+    def _removed_attachments(self, request, survey_response, media_submission_service):
+        """
+        Returns the attachments of the survey response the update does not retain, all of them when it retains
+        none, after recording the media they free.
+        """
+        existing_media_attachments = survey_response._doc._data.get('_attachments') or {}
+        retain_files = request.retain_files or []
 
+        removed_attachments = []
         for existing_attachment_name in existing_media_attachments.keys():
             if existing_attachment_name not in retain_files:
                 media_submission_service.create_media_details_document(
                     existing_media_attachments[existing_attachment_name]['length'] * -1.0, existing_attachment_name)
-                self.dbm.delete_attachment(survey_response_document, existing_attachment_name)
-
-    def _delete_all_attachments(self, survey_response_id, media_submission_service):
-        survey_response_document = get_survey_response_document(self.dbm, survey_response_id)
-        existing_media_attachments = survey_response_document._data.get('_attachments', {})
-
-        for existing_attachment_name in existing_media_attachments.keys():
-            media_submission_service.create_media_details_document(
-                existing_media_attachments[existing_attachment_name]['length'] * -1.0, existing_attachment_name)
-            self.dbm.delete_attachment(survey_response_document, existing_attachment_name)
+                removed_attachments.append(existing_attachment_name)
+        return removed_attachments
 
     def add_subject(self, form_model, values, location_tree):
         reporter_id = values.get('eid')
@@ -2,11 +2,14 @@
 from collections import OrderedDict
 import csv
 from datetime import datetime
+from functools import partial
+from io import BytesIO
 import re
+from threading import Lock
+from xml.etree import cElementTree as ElementTree
 
 from babel.dates import format_date
 import xlrd
-import xmltodict
 
 from mangrove.errors.MangroveException import MultipleSubmissionsForSameCodeException, SMSParserInvalidFormatException, \
     CSVParserInvalidHeaderFormatException, XlsParserInvalidHeaderFormatException, FormModelDoesNotExistsException
@@ -15,6 +18,7 @@ from mangrove.form_model.field import GeoCodeField, DateField, IntegerField, Fie
 from mangrove.form_model.form_model import get_form_model_by_code
 # from mangrove.transport.player.player import SMSPlayer
 from mangrove.form_model.project import get_active_form_model, check_if_form_code_is_poll
+from mangrove.transport.request_context import memoize, FORM_MODEL, ACTIVE_FORM_MODEL
 from mangrove.utils.types import is_empty, is_string
 from mangrove.contrib.registration import REGISTRATION_FORM_CODE
 from openpyxl import load_workbook
@@ -26,16 +30,17 @@ from mangrove.errors.MangroveException import CodeSheetMissingException
 class SMSParserFactory(object):
     MESSAGE_PREFIX = ur'^(\w+)\s+\.(\w+)\s+(\w+)'
 
-    def getSMSParser(self, message, dbm=None):
+    def getSMSParser(self, message, dbm=None, context=None):
         clean_message = SMSParser(dbm).clean(message)
         if re.match(self.MESSAGE_PREFIX, clean_message, flags=re.UNICODE):
-            return KeyBasedSMSParser(dbm)
-        return OrderSMSParser(dbm)
+            return KeyBasedSMSParser(dbm, context)
+        return OrderSMSParser(dbm, context)
 
 
 class SMSParser(object):
-    def __init__(self, dbm):
+    def __init__(self, dbm, context=None):
         self.dbm = dbm
+        self.context = context
 
     def _to_unicode(self, message):
         if type(message) is not unicode:
@@ -58,11 +63,11 @@ class SMSParser(object):
     def get_form_code_and_tokens(self, token):
         form_code = token[0].lower()
         try:
-            form_model = get_form_model_by_code(self.dbm, form_code)
-            check_if_form_code_is_poll(self, form_model)
+            form_model = self._form_model(form_code)
+            check_if_form_code_is_poll(self, form_model, self.context)
             token.remove(token[0])
         except FormModelDoesNotExistsException:
-            form_model = get_active_form_model(self.dbm, form_code)
+            form_model = self._active_form_model(form_code)
             token = [" ".join(token)]
         return form_code, token
 
@@ -74,12 +79,19 @@ class SMSParser(object):
 
     def select_form_model(self, form_code):
         try:
-            form_model = get_form_model_by_code(self.dbm, form_code)
-            check_if_form_code_is_poll(self, form_model)
+            form_model = self._form_model(form_code)
+            check_if_form_code_is_poll(self, form_model, self.context)
         except FormModelDoesNotExistsException:
-            form_model = get_active_form_model(self.dbm, form_code)
+            form_model = self._active_form_model(form_code)
         return form_model
 
+    def _form_model(self, form_code):
+        return memoize(self.context, (FORM_MODEL, form_code), lambda: get_form_model_by_code(self.dbm, form_code))
+
+    def _active_form_model(self, form_code):
+        return memoize(self.context, (ACTIVE_FORM_MODEL, form_code),
+                       lambda: get_active_form_model(self.dbm, form_code))
+
     def get_question_codes(self, form_code):
         form_model = self.select_form_model(form_code)
         question_codes = []
@@ -149,8 +161,8 @@ class KeyBasedSMSParser(SMSParser):
 class OrderSMSParser(SMSParser):
     MESSAGE_PREFIX_FOR_ORDERED_SMS = ur'[^ ]+\s+[^ ]+'
 
-    def __init__(self, dbm):
-        self.dbm = dbm
+    def __init__(self, dbm, context=None):
+        SMSParser.__init__(self, dbm, context)
 
     def _parse_ordered_tokens(self, tokens, question_codes, form_code):
         submission = OrderedDict()
@@ -238,13 +250,25 @@ class CsvParser(object):
     def parse(self, csv_data):
         assert is_string(csv_data)
         csv_data = self._clean(csv_data)
-        dict_reader = csv.DictReader(self._to_list(csv_data), restkey=self.EXTRA_VALUES)
+        return list(self._parse_lines(self._to_list(csv_data)))
+
+    def parse_file(self, csv_file):
+        """
+        Returns an iterator over the (form_code, values) rows of an open CSV file, which reads the file line by
+        line instead of holding the whole upload and all of its rows in memory. Blank lines are skipped; the
+        header is checked straight away.
+        """
+        return self._parse_lines(line for line in csv_file if line.strip())
+
+    def _parse_lines(self, lines):
+        dict_reader = csv.DictReader(lines, restkey=self.EXTRA_VALUES)
         dict_reader.fieldnames = self._parse_header(dict_reader)
-        parsedData = []
+        return self._parse_rows(dict_reader)
+
+    def _parse_rows(self, dict_reader):
         form_code_fieldname = dict_reader.fieldnames[0]
         for row in dict_reader:
-            parsedData.append(self._parse_row(form_code_fieldname, row))
-        return parsedData
+            yield self._parse_row(form_code_fieldname, row)
 
     def _has_empty_values(self, values_list):
         for value in values_list:
@@ -274,13 +298,16 @@ class CsvParser(object):
 
 class XlsParser(object):
     def parse(self, xls_contents):
+        return list(self.iter_parse(xls_contents))
+
+    def iter_parse(self, xls_contents):
+        """
+        Yields the (form_code, values) rows of the workbook as they are read, without building them all first.
+        """
         assert xls_contents is not None
-        workbook = xlrd.open_workbook(file_contents=xls_contents)
-        all_sheets = workbook.sheets()
-        worksheet = self._get_worksheet(all_sheets)
+        worksheet = self._open_worksheet(self._open_workbook(xls_contents))
         header_found = False
         header = None
-        parsed_data = []
         for row_num in range(worksheet.nrows):
             row = worksheet.row_values(row_num)
 
@@ -292,11 +319,24 @@ class XlsParser(object):
 
             row = self._clean(row)
             row_dict = dict(zip(header, row))
-            form_code, values = (row_dict.pop(header[0]).lower(), row_dict)
-            parsed_data.append((form_code, values))
+            yield row_dict.pop(header[0]).lower(), row_dict
         if not header_found:
             raise XlsParserInvalidHeaderFormatException()
-        return parsed_data
+
+    def _open_workbook(self, xls_contents):
+        return xlrd.open_workbook(file_contents=xls_contents, on_demand=True)
+
+    def _open_worksheet(self, workbook):
+        sheet_names = workbook.sheet_names()
+        return workbook.sheet_by_index(1 if sheet_names[0] == 'codes' else 0)
+
+    def _open_code_sheet(self, workbook):
+        for index, name in enumerate(workbook.sheet_names()):
+            if name == 'codes':
+                code_sheet = workbook.sheet_by_index(index)
+                if code_sheet.nrows:
+                    return code_sheet
+        raise CodeSheetMissingException()
 
     def _get_worksheet(self, all_sheets):
         work_sheet = all_sheets[0]
@@ -331,17 +371,20 @@ class XlsParser(object):
 class XlsxParser(XlsParser):
 
     def parse(self, file_contents):
+        return list(self.iter_parse(file_contents))
+
+    def iter_parse(self, file_contents):
+        """
+        Yields the cleaned values of every row as openpyxl reads it.
+        """
         assert file_contents is not None
         xlsx_file = StringIO.StringIO(file_contents)
 
         workbook = load_workbook(xlsx_file, use_iterators = True)
         worksheet = self._get_worksheet(workbook.worksheets)
-        parsedData = []
         for row in worksheet.iter_rows():
             row_values = [self._get_value(x.value) for x in row]
-            row_values = self._clean(row_values)
-            parsedData.append(row_values)
-        return parsedData
+            yield self._clean(row_values)
     
     def _get_value(self, value):
         if value is not None:
@@ -359,31 +402,36 @@ class XlsxParser(XlsParser):
 
 class XlsOrderedParser(XlsParser):
     def parse(self, xls_contents):
+        return list(self.iter_parse(xls_contents))
+
+    def iter_parse(self, xls_contents):
+        """
+        Yields the (form_code, values) rows of a questionnaire template, whose codes sheet holds the form code
+        and the question code of every column. Columns without a code are dropped.
+        """
         assert xls_contents is not None
-        workbook = xlrd.open_workbook(file_contents=xls_contents)
-        all_sheets = workbook.sheets()
-        if len(all_sheets) == 1:
+        workbook = self._open_workbook(xls_contents)
+        if workbook.nsheets == 1:
             raise CodeSheetMissingException()
-        elif len(all_sheets)>1:
-            codes_sheet = self._get_code_sheet(all_sheets)
-            worksheet = self._get_worksheet(all_sheets)
+        elif workbook.nsheets > 1:
+            codes_sheet = self._open_code_sheet(workbook)
+            worksheet = self._open_worksheet(workbook)
             row = codes_sheet.row_values(0)
             header, header_found = self._is_header_row(row)
+            if not header_found:
+                raise XlsParserInvalidHeaderFormatException()
             form_code = header[0]
             header = header[1:]
-            empty_indexes = self.get_empty_indexes(header)
-            header = self.remove_empty_indexes(header, empty_indexes)
-            parsed_data = []
+            columns = self.get_non_empty_indexes(header)
+            header = [header[index] for index in columns]
 
             for row_num in range(1, worksheet.nrows):
                 row = worksheet.row_values(row_num)
-                row = self._clean(row)
-                row = self.remove_empty_indexes(row, empty_indexes)
-                values = OrderedDict(zip(header, row))
-                parsed_data.append((form_code, values))
-            if not header_found:
-                raise XlsParserInvalidHeaderFormatException()
-            return parsed_data
+                row = self._clean([row[index] for index in columns if index < len(row)])
+                yield form_code, OrderedDict(zip(header, row))
+
+    def get_non_empty_indexes(self, header):
+        return [index for index, code in enumerate(header) if code != '']
 
     def get_empty_indexes(self, header):
         indexes = []
@@ -406,107 +454,229 @@ class XlsOrderedParser(XlsParser):
 
             
 
-class XFormParser(object):
-    def __init__(self, dbm):
-        self.dbm = dbm
+XFORM_FIELD_INDEX_CACHE_SIZE = 256
 
-    def is_field_set_answer(self, value):
-        return type(value) is list
+_xform_field_indexes = OrderedDict()
+_xform_field_indexes_lock = Lock()
 
-    def _fetch_string_value(self, message):
-        str_dict = OrderedDict()
-        for code, value in message.iteritems():
-            if not self.is_field_set_answer(value):
-                str_dict.update({code: self._to_str(value)})
-            else:
-                str_dict.update({code: value})
 
-        return str_dict
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
 
-    def parse(self, message):
-        submission_dict = xmltodict.parse(message, 'utf-8').values()[0]
-        # xform elements don't have namespace information since it's being default, so form_code don't include namespace
-        form_code = submission_dict.pop('form_code')
-        form_model = get_form_model_by_code(self.dbm, form_code)
-        self.__format_response_fields(form_model, submission_dict)
-        return form_code, self._fetch_string_value(submission_dict)
 
-    def _to_str(self, value):
-        if isinstance(value, (int, float, long)):
-            return str(value)
+def _to_str(value):
+    if isinstance(value, (int, float, long)):
+        return str(value)
+
+    if type(value) is list:
+        return " ".join(value)
+
+    return value if value is not None else None
+
+
+def _string_values(values):
+    str_dict = OrderedDict()
+    for code, value in values.iteritems():
+        str_dict[code] = value if type(value) is list else _to_str(value)
+    return str_dict
+
+
+def _geo_code_value(value):
+    geo_code_list = value.split(' ')
+    return '{0},{1}'.format(geo_code_list[0], geo_code_list[1])
+
+
+def _date_value(date_format, value):
+    return format_date(datetime.strptime(value, "%Y-%m-%d"), date_format)
+
 
-        if type(value) is list:
-            return " ".join(value)
+def _integer_value(value):
+    return "%s" % value.__str__()
 
-        return value if value is not None else None
 
-    def _format_field_set(self, field, values):
-        if type(values) is not list:
-            values = [values]
+def _time_value(value):
+    return value.split(":00.000")[0]
 
-        for field in field.fields:
-            [self._format_field(field, value) for value in values]
 
+def _date_time_value(value):
+    # 2015-01-13T21:45:00.000+06:30
+    # Remove timezone and milli seconds.
+    date_time_without_milliseconds = value[:19]
+    return datetime.strptime(date_time_without_milliseconds, '%Y-%m-%dT%H:%M:%S').strftime('%d.%m.%Y %H:%M:%S')
+
+
+def _file_name_value(value):
+    web_new_file_selected = type(value) is OrderedDict
+    return [v for k, v in value.iteritems() if k == '#text'][0] if web_new_file_selected else value
+
+
+def _value_converter(field):
+    field_type = type(field)
+    if field_type == GeoCodeField:
+        return _geo_code_value
+    if field_type == DateField:
+        return partial(_date_value, DateField.FORMAT_DATE_DICTIONARY.get(field.date_format))
+    if field_type == IntegerField:
+        return _integer_value
+    if field_type == TimeField:
+        return _time_value
+    if field_type == DateTimeField:
+        return _date_time_value
+    if isinstance(field, MediaField):
+        return _file_name_value
+    return None
+
+
+class XFormFieldIndex(object):
+    """
+    The fields of a form model (or of a field set) by code: the converter that turns the xform answer of each
+    field into the value the form model validates, and the index of every field set.
+    """
+
+    def __init__(self, fields):
+        self.converters = {}
+        self.field_sets = {}
+        for field in fields:
+            if type(field) == FieldSet:
+                self.field_sets[field.code] = XFormFieldIndex(field.fields)
+            else:
+                converter = _value_converter(field)
+                if converter is not None:
+                    self.converters[field.code] = converter
+
+    def convert(self, values):
+        for code, convert in self.converters.iteritems():
+            if values.get(code):
+                values[code] = convert(values[code])
+        for code, index in self.field_sets.iteritems():
+            if values.get(code):
+                entries = values[code] if type(values[code]) is list else [values[code]]
+                values[code] = [_string_values(index.convert(entry)) for entry in entries]
         return values
 
-    def _parse_time_string(self, time_string):
-        return time_string.split(":00.000")[0] if time_string else time_string
 
-    def _format_field(self, field, values):
-        code = field.code
-        if not values.get(code):
+def xform_field_index(form_model):
+    """
+    Returns the field index of the form model, built once per revision of the questionnaire.
+    """
+    if form_model.revision is None:
+        return XFormFieldIndex(form_model.fields)
+    key = (form_model.id, form_model.revision)
+    with _xform_field_indexes_lock:
+        index = _xform_field_indexes.pop(key, None)
+        if index is None:
+            index = XFormFieldIndex(form_model.fields)
+        _xform_field_indexes[key] = index
+        while len(_xform_field_indexes) > XFORM_FIELD_INDEX_CACHE_SIZE:
+            _xform_field_indexes.popitem(last=False)
+        return index
+
+
+class XFormParser(object):
+    def __init__(self, dbm, context=None):
+        self.dbm = dbm
+        self.context = context
+
+    def is_field_set_answer(self, value):
+        return type(value) is list
+
+    def parse(self, message, form_model=None):
+        """
+        Returns the form code and the answers of an xform submission.
+
+        The submission is read with iterparse into the same shape xmltodict gives. When the caller already has
+        the form model, answers are converted as their elements are read and every element is dropped once
+        read; otherwise the form model is looked up by the form code of the submission and the answers are
+        converted afterwards.
+        """
+        index = xform_field_index(form_model) if form_model is not None else None
+        submission_dict = self._read(message, index)
+        # xform elements don't have namespace information since it's being default, so form_code don't include namespace
+        form_code = submission_dict.pop('form_code')
+        if index is None:
+            form_model = memoize(self.context, (FORM_MODEL, form_code),
+                                 lambda: get_form_model_by_code(self.dbm, form_code))
+            xform_field_index(form_model).convert(submission_dict)
+        return form_code, _string_values(submission_dict)
+
+    def _read(self, message, index):
+        if isinstance(message, unicode):
+            message = message.encode('utf-8')
+        stack = []
+        for event, element in ElementTree.iterparse(BytesIO(message), events=('start', 'end')):
+            if event == 'start':
+                if not stack:
+                    child_index = index
+                else:
+                    parent_index = stack[-1][1]
+                    child_index = parent_index.field_sets.get(_local_name(element.tag)) if parent_index else None
+                attributes = [('@' + _local_name(name), value) for name, value in element.attrib.iteritems()]
+                stack.append((OrderedDict(attributes), child_index))
+                continue
+
+            values, child_index = stack.pop()
+            text = (element.text or '').strip()
+            if values:
+                if text:
+                    values['#text'] = text
+                value = values
+            else:
+                value = text or None
+            element.clear()
+            if not stack:
+                return value
+            self._add_value(stack[-1], _local_name(element.tag), value)
+
+    def _add_value(self, parent, code, value):
+        values, index = parent
+        if index is not None and code in index.field_sets:
+            if value is None:
+                values.setdefault(code, None)
+                return
+            entries = values.get(code) or []
+            entries.append(_string_values(value) if type(value) is OrderedDict else value)
+            values[code] = entries
             return
-        if type(field) == GeoCodeField:
-            geo_code_list = values[code].split(' ')
-            values[code] = '{0},{1}'.format(geo_code_list[0], geo_code_list[1])
-        if type(field) == DateField:
-            date = datetime.strptime(values[code], "%Y-%m-%d")
-            values[code] = self.__get_formatted_date(field.date_format, date)
-        if type(field) == IntegerField:
-            values[code] = "%s" % values[code].__str__()
-        if type(field) == TimeField:
-            values[code] = "%s" % self._parse_time_string(values[code])
-        if type(field) == DateTimeField:
-            values[code] = self._parse_date_time(values[code])
-        if type(field) == FieldSet:
-            value_list = self._format_field_set(field, values[code])
-            values[code] =  [self._fetch_string_value(r) for r in value_list]
-        if isinstance(field, MediaField):
-            values[code] = self._get_file_name(values[code])
+        if index is not None and value and code in index.converters:
+            value = index.converters[code](value)
+        if code not in values:
+            values[code] = value
+        elif type(values[code]) is list:
+            values[code].append(value)
+        else:
+            values[code] = [values[code], value]
 
-    def _get_file_name(self, value):
-        web_new_file_selected = type(value) is OrderedDict
-        return [v for k,v in value.iteritems() if k == '#text'][0] if web_new_file_selected\
-                else value
+    def _to_str(self, value):
+        return _to_str(value)
 
-    def __format_response_fields(self, form_model, values):
-        [self._format_field(field, values) for field in form_model.fields]
-        return values
+    def _fetch_string_value(self, message):
+        return _string_values(message)
 
-    def __get_formatted_date(self, date_format, date):
-        return format_date(date, DateField.FORMAT_DATE_DICTIONARY.get(date_format))
+    def _parse_time_string(self, time_string):
+        return _time_value(time_string) if time_string else time_string
 
-    def _get_attachment(self, field):
-        return field['#text']
+    def _get_file_name(self, value):
+        return _file_name_value(value)
 
     def _parse_date_time(self, value):
-        # 2015-01-13T21:45:00.000+06:30
-        # Remove timezone and milli seconds.
-        date_time_without_milliseconds = value[:19]
-        return datetime.strptime(date_time_without_milliseconds, '%Y-%m-%dT%H:%M:%S').strftime('%d.%m.%Y %H:%M:%S')
+        return _date_time_value(value)
 
 class XlsDatasenderParser(XlsParser):
     def parse(self, xls_contents):
+        return list(self.iter_parse(xls_contents))
+
+    def iter_parse(self, xls_contents):
         assert xls_contents is not None
-        workbook = xlrd.open_workbook(file_contents=xls_contents)
-        worksheet = self._get_worksheet(workbook.sheets())
-        codes_sheet = self._get_code_sheet(workbook.sheets())
-        parsed_data = []
+        workbook = self._open_workbook(xls_contents)
+        worksheet = self._open_worksheet(workbook)
+        codes_sheet = self._open_code_sheet(workbook)
         row = codes_sheet.row_values(0)
         header, header_found = self._is_header_row(row)
 
         if row[0] != 'reg':
             raise Exception("Invalid datasender excel imported")
+        if not header_found:
+            raise XlsParserInvalidHeaderFormatException()
 
         form_code = REGISTRATION_FORM_CODE
         header = header[1:]
@@ -515,14 +685,14 @@ class XlsDatasenderParser(XlsParser):
             row = self._clean(row)
             values = dict(zip(header, row))
             values.update({"t": "reporter"})
-            parsed_data.append((form_code, values))
-        if not header_found:
-            raise XlsParserInvalidHeaderFormatException()
-        return parsed_data
+            yield form_code, values
 
 class XlsxDataSenderParser(XlsxParser):
 
     def parse(self, file_contents):
+        return list(self.iter_parse(file_contents))
+
+    def iter_parse(self, file_contents):
         assert file_contents is not None
         xlsx_file = StringIO.StringIO(file_contents)
 
@@ -537,15 +707,12 @@ class XlsxDataSenderParser(XlsxParser):
             for cs in codes_sheet.iter_rows():
                 rows = [self._get_value(x.value) for x in cs]
             header, header_found = self._is_header_row(rows)
-            parsed_data = []
+            if not header_found:
+                raise XlsParserInvalidHeaderFormatException()
             form_code = REGISTRATION_FORM_CODE
             header = header[1:]
             for row in worksheet.iter_rows(row_offset=1):
                 row_values = [self._get_value(x.value) for x in row]
                 values = dict(zip(header, row_values))
                 values.update({"t": "reporter"})
-                parsed_data.append((form_code, values))
-            if not header_found:
-                raise XlsParserInvalidHeaderFormatException()
-            return parsed_data
-
+                yield form_code, values
@@ -13,6 +13,8 @@ from mangrove.transport.player.new_players import SMSPlayerV2
 from mangrove.transport.player.parser import WebParser, SMSParserFactory
 from mangrove.transport.work_flow import RegistrationWorkFlow
 from mangrove.transport.player.handler import handler_factory
+from mangrove.transport.request_context import RequestContext, memoize, PARSE, FORM_MODEL, ACTIVE_FORM_MODEL, \
+    REPORTER
 
 
 class Player(object):
@@ -42,8 +44,8 @@ class SMSPlayer(Player):
         self.post_sms_parser_processor = post_sms_parser_processors
         self.feeds_dbm = feeds_dbm
 
-    def _process(self, values, form_code, reporter_entity):
-        form_model = get_form_model_by_code(self.dbm, form_code)
+    def _process(self, values, form_code, reporter_entity, context=None):
+        form_model = memoize(context, (FORM_MODEL, form_code), lambda: get_form_model_by_code(self.dbm, form_code))
         if form_model.is_entity_registration_form():
             values = RegistrationWorkFlow(self.dbm, form_model, self.location_tree).process(values)
         return form_model, values
@@ -57,38 +59,41 @@ class SMSPlayer(Player):
             if response is not None:
                 return response
 
-    def _parse(self, message):
-        if self.parser is None:
-            self.parser = SMSParserFactory().getSMSParser(message, self.dbm)
-        return self.parser.parse(message)
+    def _parse(self, message, context=None):
+        parser = self.parser or SMSParserFactory().getSMSParser(message, self.dbm, context)
+        return memoize(context, (PARSE, message), lambda: parser.parse(message))
 
-    def select_form_model(self, form_code):
+    def select_form_model(self, form_code, context=None):
         try:
-            form_model = get_form_model_by_code(self.dbm, form_code)
-            check_if_form_code_is_poll(self, form_model)
+            form_model = memoize(context, (FORM_MODEL, form_code),
+                                 lambda: get_form_model_by_code(self.dbm, form_code))
+            check_if_form_code_is_poll(self, form_model, context)
         except FormModelDoesNotExistsException:
-            form_model = get_active_form_model(self.dbm, form_code)
+            form_model = memoize(context, (ACTIVE_FORM_MODEL, form_code),
+                                 lambda: get_active_form_model(self.dbm, form_code))
         return form_model
 
-    def get_form_model(self, request):
-        form_code, values, extra_elements = self._parse(request.message)
-        return self.select_form_model(form_code)
+    def get_form_model(self, request, context=None):
+        form_code, values, extra_elements = self._parse(request.message, context)
+        return self.select_form_model(form_code, context)
 
     def accept(self, request, logger=None, additional_feed_dictionary=None,
-               translation_processor=None):
+               translation_processor=None, context=None):
         ''' This is a single point of entry for all SMS based workflows, we do not have  a separation on the view layer for different sms
-        workflows, hence we will be branching to different methods here. Current implementation does the parse twice but that will go away
-        once the entity registration is separated '''
-        form_model = self.get_form_model(request)
+        workflows, hence we will be branching to different methods here. The parse result and the lookups are kept in
+        the request context, so branching does not parse or load anything twice '''
+        if context is None:
+            context = RequestContext(self.dbm)
+        form_model = self.get_form_model(request, context)
         if form_model.is_entity_registration_form() or form_model.form_code == ENTITY_DELETION_FORM_CODE:
-            return self.entity_api(request, logger)
+            return self.entity_api(request, logger, context)
         sms_player_v2 = SMSPlayerV2(self.dbm, post_sms_parser_processors=self.post_sms_parser_processor,
             feeds_dbm=self.feeds_dbm)
         return sms_player_v2.add_survey_response(request, logger, additional_feed_dictionary,
-                                                 translation_processor=translation_processor)
+                                                 translation_processor=translation_processor, context=context)
 
-    def entity_api(self, request, logger):
-        form_code, values, extra_elements = self._parse(request.message)
+    def entity_api(self, request, logger, context=None):
+        form_code, values, extra_elements = self._parse(request.message, context)
         post_sms_processor_response = self._process_post_parse_callback(form_code, values, extra_elements)
 
         log_entry = "message:message " + repr(request.message) + "|source: " + request.transport.source + "|"
@@ -100,8 +105,9 @@ class SMSPlayer(Player):
             post_sms_processor_response.is_registration = True
             return post_sms_processor_response
 
-        reporter_entity = reporters.find_reporter_entity(self.dbm, request.transport.source)
-        form_model, values = self._process(values, form_code, reporter_entity)
+        source = request.transport.source
+        reporter_entity = memoize(context, (REPORTER, source), lambda: reporters.find_reporter_entity(self.dbm, source))
+        form_model, values = self._process(values, form_code, reporter_entity, context)
         reporter_entity_names = [{NAME_FIELD: reporter_entity.value(NAME_FIELD)}]
         response = self.submit(form_model, values, reporter_entity_names)
         if logger is not None:
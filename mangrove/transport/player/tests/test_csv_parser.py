@@ -1,4 +1,5 @@
 
+from StringIO import StringIO
 from unittest import TestCase
 from mangrove.errors.MangroveException import CSVParserInvalidHeaderFormatException
 from mangrove.transport.player.parser import CsvParser
@@ -149,4 +150,28 @@ class TestCsvParser(TestCase):
         """
         csv_parser = CsvParser()
         with self.assertRaises(CSVParserInvalidHeaderFormatException):
-            csv_parser.parse(csv_data)
\ No newline at end of file
+            csv_parser.parse(csv_data)
+
+    def test_should_parse_csv_file_lazily(self):
+        csv_file = StringIO("""FORM_CODE,ID,BEDS,DIRECTOR,MEDS
+
+CLF1, CL001, 11, Dr. A1,201
+CLF1,CL002,12,Dr. A2,202,extra field
+   
+CLF1,CL003,13,"Dr. A3",203
+CLF1,CL004,14,Dr. A4,204
+CLF1,CL005,15,Dr. A5,205
+""")
+        csv_parser = CsvParser()
+        rows = csv_parser.parse_file(csv_file)
+
+        self.assertEqual(("clf1", {"id": u"CL001", "beds": u"11", "director": u"Dr. A1", "meds": u"201"}),
+                         next(rows))
+        self.assertTrue(csv_file.tell() < len(csv_file.getvalue()))
+        self._assert_results([("clf1", {"id": u"CL001", "beds": u"11", "director": u"Dr. A1", "meds": u"201"})]
+                             + list(rows))
+
+    def test_should_raise_exception_for_invalid_header_of_csv_file(self):
+        csv_parser = CsvParser()
+        with self.assertRaises(CSVParserInvalidHeaderFormatException):
+            csv_parser.parse_file(StringIO("FORM_CODE,ID,    ,DIRECTOR\nCLF1,CL001,11,Dr. A1\n"))
@@ -7,7 +7,7 @@ from mangrove.form_model.form_model import LOCATION_TYPE_FIELD_NAME
 from mangrove.datastore.database import DatabaseManager
 from mangrove.datastore.entity import Entity, Contact
 from mangrove.errors.MangroveException import  NumberNotRegisteredException, SMSParserInvalidFormatException, MultipleSubmissionsForSameCodeException, \
-    ProjectPollCodeDoesNotExistsException
+    ProjectPollCodeDoesNotExistsException, FailedToSaveDataObject
 from mangrove.form_model.form_model import FormModel
 from mangrove.form_model.project import Project
 from mangrove.transport.player.parser import  OrderSMSParser
@@ -16,6 +16,11 @@ from mangrove.transport.contract.transport_info import TransportInfo
 from mangrove.transport.contract.response import Response
 from mangrove.transport.player.tests.test_web_player import mock_form_submission
 from mangrove.transport.player.new_players import SMSPlayerV2
+from mangrove.transport.repository.reporters import single_reporter_entity
+from mangrove.transport.request_context import RequestContext
+from mangrove.datastore.database import _active_units_of_work
+from mangrove.datastore.documents import DocumentBase
+from couchdb.http import ResourceConflict
 
 
 class TestSMSPlayer(TestCase):
@@ -57,8 +62,8 @@ class TestSMSPlayer(TestCase):
             'mangrove.transport.services.survey_response_service.get_form_model_by_code')
         self.get_form_model_mock_parser_patcher = patch('mangrove.transport.player.parser.get_form_model_by_code')
         # self.get_form_model_mock_player_v2_patcher = patch('mangrove.transport.player.new_players.get_form_model_by_code')
-        get_form_model_player_mock = self.get_form_model_mock_player_patcher.start()
-        get_form_model_parser_mock = self.get_form_model_mock_parser_patcher.start()
+        get_form_model_player_mock = self.get_form_model_player_mock = self.get_form_model_mock_player_patcher.start()
+        get_form_model_parser_mock = self.get_form_model_parser_mock = self.get_form_model_mock_parser_patcher.start()
         # get_form_model_player_v2_mock = self.get_form_model_mock_player_v2_patcher.start()
         self.form_model_mock = MagicMock(spec=FormModel)
         self.form_model_mock.is_entity_registration_form.return_value = True
@@ -145,6 +150,72 @@ class TestSMSPlayer(TestCase):
 
 
 
+    def test_should_look_up_form_model_project_and_reporter_once_per_request(self):
+        self.reporter_module.find_reporter_entity.side_effect = NumberNotRegisteredException("1234")
+        context = RequestContext(self.dbm)
+        with patch('mangrove.form_model.project.get_project_by_code') as get_project_by_code:
+            get_project_by_code.return_value = None
+            self.sms_player.add_survey_response(Request(message=self.message, transportInfo=self.transport),
+                                                context=context)
+
+            self.assertEqual(1, self.get_form_model_parser_mock.call_count)
+            self.assertFalse(self.get_form_model_player_mock.called)
+            self.assertEqual(1, get_project_by_code.call_count)
+            self.assertEqual(1, self.reporter_module.find_reporter_entity.call_count)
+            self.assertEqual(4, context.backend_calls)
+            self.assertGreater(context.lookups, context.backend_calls)
+
+    def test_should_save_batch_of_sms_with_one_lookup_per_form_code_and_one_reporter_query(self):
+        self.reporter_module.find_reporters_by_from_numbers.return_value = {'1234': [self.reporter_mock]}
+        self.reporter_module.single_reporter_entity = single_reporter_entity
+        other_sender = TransportInfo(transport="sms", source="+5555", destination="5678")
+        requests = [Request(message=self.message, transportInfo=self.transport),
+                    Request(message="cli001 .na tester1 .na tester2", transportInfo=self.transport),
+                    Request(message="FORM_CODE .ID 2", transportInfo=other_sender)]
+        with patch('mangrove.transport.player.new_players.SurveyResponseService') as SurveyResponseServiceMock:
+            with patch('mangrove.form_model.project.get_project_by_code') as get_project_by_code:
+                get_project_by_code.return_value = None
+                saved_responses = [Response(success=True), Response(success=True)]
+                SurveyResponseServiceMock.return_value.save_survey.side_effect = saved_responses
+
+                responses = self.sms_player.add_survey_responses(requests)
+
+        self.assertEqual(3, len(responses))
+        self.assertIs(saved_responses[0], responses[0])
+        self.assertIsInstance(responses[1].exception, MultipleSubmissionsForSameCodeException)
+        self.assertIs(saved_responses[1], responses[2])
+        self.assertEqual(1, self.reporter_module.find_reporters_by_from_numbers.call_count)
+        self.assertFalse(self.reporter_module.find_reporter_entity.called)
+        self.assertEqual(['form_code', 'cli001'],
+                         [call[0][1] for call in self.get_form_model_parser_mock.call_args_list])
+        first_call, last_call = SurveyResponseServiceMock.return_value.save_survey.call_args_list
+        self.assertEqual([{'name': '1234'}], first_call[0][2])
+        self.assertIsNone(last_call[0][2])
+
+    def test_should_write_batch_in_chunks_and_fail_requests_whose_documents_were_not_written(self):
+        self.reporter_module.find_reporters_by_from_numbers.return_value = {'1234': [self.reporter_mock]}
+        self.reporter_module.single_reporter_entity = single_reporter_entity
+        requests = [Request(message=self.message, transportInfo=self.transport),
+                    Request(message="FORM_CODE .ID 2", transportInfo=self.transport)]
+        documents = iter([DocumentBase(id='sr1'), DocumentBase(id='sr2')])
+
+        def save_survey(*args, **kwargs):
+            _active_units_of_work()[self.dbm].add(next(documents))
+            return Response(success=True)
+
+        self.dbm._save_documents.side_effect = lambda docs: [(doc.id != 'sr2', doc.id, ResourceConflict())
+                                                             for doc in docs]
+        with patch('mangrove.transport.player.new_players.SurveyResponseService') as SurveyResponseServiceMock:
+            with patch('mangrove.form_model.project.get_project_by_code') as get_project_by_code:
+                get_project_by_code.return_value = None
+                SurveyResponseServiceMock.return_value.save_survey.side_effect = save_survey
+
+                responses = self.sms_player.add_survey_responses(requests, chunk_size=1)
+
+        self.assertEqual([True, False], [response.success for response in responses])
+        self.assertIsInstance(responses[1].exception, FailedToSaveDataObject)
+        self.assertEqual(2, self.dbm._save_documents.call_count)
+
     def test_should_not_parse_if_two_question_codes(self):
         transport = TransportInfo(transport="sms", source="1234", destination="5678")
         with patch('mangrove.form_model.project.get_project_by_code') as get_project_by_code:
@@ -10,7 +10,9 @@ from mangrove.datastore.documents import EntityDocument
 from mangrove.datastore.database import DatabaseManager
 from mangrove.datastore.entity import DataRecord, Entity, get_by_short_code_include_voided
 from mangrove.datastore.tests.test_data import TestData
-from mangrove.errors.MangroveException import MangroveException, FormModelDoesNotExistsException
+from mangrove.datastore.tests.test_database_manager import FakeBulkDatabase, FakeMultipartResource
+from mangrove.errors.MangroveException import MangroveException, FormModelDoesNotExistsException, \
+    FailedToSaveDataObject
 from mangrove.form_model.form_model import FormModel, MOBILE_NUMBER_FIELD, NAME_FIELD
 from mangrove.transport.contract.request import Request
 from mangrove.transport.contract.transport_info import TransportInfo
@@ -194,6 +196,88 @@ class TestSurveyResponseService(TestCase):
                                 self.assertFalse(response.errors)
                                 self.assertTrue(response.feed_error_message)
 
+    def test_survey_response_has_error_status_when_submission_documents_conflict(self):
+        manager = DatabaseManager.__new__(DatabaseManager)
+        manager.database = FakeBulkDatabase(conflicting_ids=['entity_id'])
+        project = Mock(spec=Project)
+        values = {'ID': 'short_code', 'Q1': 'name', 'Q2': '80', 'Q3': 'a'}
+        transport_info = TransportInfo('web', 'src', 'dest')
+        survey_response_service = SurveyResponseService(manager)
+
+        with patch('mangrove.transport.services.survey_response_service.by_short_code') as get_reporter:
+            with patch(
+                    'mangrove.transport.services.survey_response_service.get_form_model_by_code') as get_form_model_by_code:
+                with patch(
+                        'mangrove.transport.services.survey_response_service.DataFormSubmission') as data_form_submission:
+                    with patch('mangrove.transport.services.survey_response_service.Project.from_form_model') as from_form_model:
+                        get_reporter.return_value = Mock(spec=Entity)
+                        instance_mock = data_form_submission.return_value
+                        type(instance_mock).is_valid = PropertyMock(return_value=True)
+                        type(instance_mock).data_record_id = PropertyMock(return_value='data_record_id')
+                        instance_mock.save.side_effect = lambda dbm: dbm._save_document(
+                            EntityDocument(id='entity_id'), process_post_update=False)
+                        from_form_model.return_value = project
+                        project.data_senders = []
+                        mock_form_model = MagicMock(spec=FormModel)
+                        mock_form_model.id = 'form_model_id'
+                        mock_form_model.validate_submission.return_value = values, ""
+                        get_form_model_by_code.return_value = mock_form_model
+
+                        with patch.object(SurveyResponse, 'save', autospec=True) as save:
+                            save.side_effect = lambda survey_response: manager._save_document(
+                                survey_response._doc, process_post_update=False)
+                            with self.assertRaises(FailedToSaveDataObject):
+                                survey_response_service.save_survey('CL1', values, [], transport_info, '')
+
+        self.assertEqual(['entity_id'], manager.database.updates[0])
+        survey_response, = save.call_args_list[0][0]
+        self.assertEqual([[survey_response.id]], manager.database.updates[1:])
+        self.assertEqual(1, save.call_count)
+        self.assertFalse(survey_response.status)
+        self.assertIn('entity_id', survey_response.errors)
+
+    def test_survey_response_is_written_with_its_attachments_in_one_request(self):
+        manager = DatabaseManager.__new__(DatabaseManager)
+        manager.database = FakeBulkDatabase()
+        manager.database.resource = FakeMultipartResource()
+        project = Mock(spec=Project)
+        values = {'ID': 'short_code', 'Q1': 'name', 'Q2': '80', 'Q3': 'a'}
+        transport_info = TransportInfo('web', 'src', 'dest')
+        survey_response_service = SurveyResponseService(manager)
+
+        with patch('mangrove.transport.services.survey_response_service.by_short_code') as get_reporter:
+            with patch(
+                    'mangrove.transport.services.survey_response_service.get_form_model_by_code') as get_form_model_by_code:
+                with patch(
+                        'mangrove.transport.services.survey_response_service.DataFormSubmission') as data_form_submission:
+                    with patch('mangrove.transport.services.survey_response_service.Project.from_form_model') as from_form_model:
+                        get_reporter.return_value = Mock(spec=Entity)
+                        instance_mock = data_form_submission.return_value
+                        type(instance_mock).is_valid = PropertyMock(return_value=True)
+                        type(instance_mock).data_record_id = PropertyMock(return_value='data_record_id')
+                        instance_mock.save.side_effect = lambda dbm: dbm._save_document(
+                            EntityDocument(id='entity_id'), process_post_update=False)
+                        from_form_model.return_value = project
+                        project.data_senders = []
+                        mock_form_model = MagicMock(spec=FormModel)
+                        mock_form_model.id = 'form_model_id'
+                        mock_form_model.validate_submission.return_value = values, ""
+                        mock_form_model.revision = 'form_model_revision'
+                        mock_form_model.bind.return_value.bound_values.return_value = values
+                        get_form_model_by_code.return_value = mock_form_model
+
+                        with patch.object(SurveyResponse, 'save', autospec=True) as save:
+                            save.side_effect = lambda survey_response: manager._save_document(
+                                survey_response._doc, process_post_update=False)
+                            response = survey_response_service.save_survey('CL1', values, [], transport_info, '',
+                                                                           attachments=[('photo.jpg', 'jpeg')])
+
+        self.assertEqual([['entity_id']], manager.database.updates)
+        [(path, body, headers)] = manager.database.resource.puts
+        self.assertEqual(response.survey_response_id, path)
+        self.assertIn('jpeg', body)
+        self.assertEqual('2-rev', response.version)
+
 
 class TestSurveyResponseServiceIT(MangroveTestCase):
     def setUp(self):
@@ -2,8 +2,8 @@
 from unittest.case import TestCase
 from mock import patch, Mock
 from mangrove.form_model.field import SelectField, GeoCodeField, DateField, IntegerField, TextField, FieldSet, \
-    PhotoField, AudioField, VideoField
-from mangrove.transport.player.parser import XFormParser
+    PhotoField, AudioField, VideoField, DateTimeField
+from mangrove.transport.player.parser import XFormParser, XFormFieldIndex, xform_field_index
 
 
 class TestXFormParser(TestCase):
@@ -12,20 +12,24 @@ class TestXFormParser(TestCase):
 
     def test_should_parse_input_and_return_submission_values(self):
         form_code = 'someFormCode'
-        submission_values = {
-            'data': {'form_code': form_code, 'q1': 'a b c', 'q2': 'lat long alt accuracy', 'q3': '1012-01-23',
-                     'q4': '1'}}
+        submission_values = u'''
+        <data>
+            <form_code>someFormCode</form_code>
+            <q1>a b c</q1>
+            <q2>lat long alt accuracy</q2>
+            <q3>1012-01-23</q3>
+            <q4>1</q4>
+        </data>
+        '''
         expected_values = {'q1': 'a b c', 'q2': 'lat,long', 'q3': '01.1012', 'q4': '1'}
-        with patch("mangrove.transport.player.parser.xmltodict") as mock_xml_dict:
-            mock_xml_dict.parse.return_value = submission_values
-            with patch("mangrove.transport.player.parser.get_form_model_by_code") as mock_get_form_model:
-                mock_form_model = Mock()
-                mock_form_model.fields = [SelectField('', 'q1', '', {'': ''}, single_select_flag=False),
-                                          GeoCodeField('', 'q2', '', {'': ''}),
-                                          DateField('', 'q3', '', 'mm.yyyy'),
-                                          IntegerField('', 'q4', '')]
-                mock_get_form_model.return_value = mock_form_model
-                self.assertEquals(self.parser.parse(submission_values), (form_code, expected_values))
+        with patch("mangrove.transport.player.parser.get_form_model_by_code") as mock_get_form_model:
+            mock_form_model = Mock()
+            mock_form_model.fields = [SelectField('', 'q1', '', {'': ''}, single_select_flag=False),
+                                      GeoCodeField('', 'q2', '', {'': ''}),
+                                      DateField('', 'q3', '', 'mm.yyyy'),
+                                      IntegerField('', 'q4', '')]
+            mock_get_form_model.return_value = mock_form_model
+            self.assertEquals(self.parser.parse(submission_values), (form_code, expected_values))
 
     def test_should_parse_submission_values_with_accented_characters(self):
         submission_data = u'''
@@ -109,6 +113,53 @@ class TestXFormParser(TestCase):
             self.assertEquals(self.parser.parse(submission_data), ('055', expected_values))
 
 
+    def test_should_convert_answers_while_reading_with_form_model_of_caller(self):
+        submission_data = u'''
+        <data id="cli001">
+            <family>
+                <name>tommy</name>
+                <dob>2012-01-23</dob>
+                <image type="file">image.png</image>
+            </family>
+            <family>
+                <name>anna</name>
+                <dob>2010-11-02</dob>
+            </family>
+            <visited>2015-01-13T21:45:00.000+06:30</visited>
+            <meta><instanceID>uuid:1</instanceID></meta>
+            <form_code>055</form_code>
+        </data>
+        '''
+        form_model = Mock()
+        form_model.fields = [FieldSet('', 'family', '', field_set=[TextField('', 'name', ''),
+                                                                   DateField('', 'dob', '', 'dd.mm.yyyy'),
+                                                                   PhotoField('', 'image', '')]),
+                             DateTimeField('', 'visited', '')]
+
+        with patch("mangrove.transport.player.parser.get_form_model_by_code") as mock_get_form_model:
+            form_code, values = self.parser.parse(submission_data, form_model)
+
+        self.assertFalse(mock_get_form_model.called)
+        self.assertEqual('055', form_code)
+        self.assertEqual({'@id': 'cli001',
+                          'family': [{'name': 'tommy', 'dob': '23.01.2012', 'image': 'image.png'},
+                                     {'name': 'anna', 'dob': '02.11.2010'}],
+                          'visited': '13.01.2015 21:45:00',
+                          'meta': {'instanceID': 'uuid:1'}}, values)
+
+    def test_should_build_field_index_once_per_form_model_revision(self):
+        form_model = Mock()
+        form_model.fields = [DateField('', 'dob', '', 'dd.mm.yyyy')]
+
+        with patch("mangrove.transport.player.parser.XFormFieldIndex", wraps=XFormFieldIndex) as field_index:
+            xform_field_index(form_model)
+            xform_field_index(form_model)
+            self.assertEqual(1, field_index.call_count)
+
+            form_model.revision = '2-b'
+            xform_field_index(form_model)
+            self.assertEqual(2, field_index.call_count)
+
     def test_should_strip_out_milliseconds_and_timezone(self):
 
         stripped_date_string = self.parser._parse_date_time('2015-01-13T21:45:00.000+06:30')
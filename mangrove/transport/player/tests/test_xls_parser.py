@@ -3,7 +3,7 @@ from unittest import TestCase
 import os
 import xlwt
 from mangrove.errors.MangroveException import XlsParserInvalidHeaderFormatException
-from mangrove.transport.player.parser import XlsParser, XlsDatasenderParser
+from mangrove.transport.player.parser import XlsParser, XlsDatasenderParser, XlsOrderedParser
 
 class TestXlsParser(TestCase):
     def _write_to_xls(self, data):
@@ -89,6 +89,14 @@ class TestXlsParser(TestCase):
             self.assertEqual("clf1", form_code)
             self.assertEqual({u"id": u'CL002', u'beds': u'', u'director': u'Dr. B', u'meds': u'202'}, values)
 
+    def test_should_yield_rows_as_they_are_read(self):
+        with open(self.file_name) as input_file:
+            submissions = self.parser.iter_parse(input_file.read())
+            form_code, values = next(submissions)
+            self.assertEqual(u"clf1", form_code)
+            self.assertEqual({u"id": u'CL001', u'beds': u'10', u'director': u'Dr. A', u'meds': u'201'}, values)
+            self.assertEqual(4, len(list(submissions)))
+
 
     def tearDown(self):
         os.remove(self.file_name)
@@ -121,4 +129,32 @@ class TestXlsDatasenderParser(TestCase):
             submissions = self.parser.parse(input_file.read())
             self.assertEqual(1, len(submissions))
             form_code, values = submissions[0]
-            self.assertEqual({u"email": u'test@mail.com', u'g': u'-18.13,27.65', u'l': u'Nairobi', u'm': u'261333711122', u'n': u'Thierry Rakoto', u't': 'reporter'}, values)
\ No newline at end of file
+            self.assertEqual({u"email": u'test@mail.com', u'g': u'-18.13,27.65', u'l': u'Nairobi', u'm': u'261333711122', u'n': u'Thierry Rakoto', u't': 'reporter'}, values)
+
+
+class TestXlsOrderedParser(TestCase):
+    def setUp(self):
+        self.file_name = "test.xls"
+        wb = xlwt.Workbook()
+        ws = wb.add_sheet('test')
+        data = [["Name", "Notes", "Age"], ["Ana", "skip", "30"], ["Bo", "skip", "41"]]
+        for row_number, row in enumerate(data):
+            for col_number, val in enumerate(row):
+                ws.write(row_number, col_number, val)
+        codes_sheet = wb.add_sheet("codes")
+        for col_number, code in enumerate(["cli001", "q1", "", "q3"]):
+            codes_sheet.write(0, col_number, code)
+        wb.save(self.file_name)
+        self.parser = XlsOrderedParser()
+
+    def tearDown(self):
+        os.remove(self.file_name)
+
+    def test_should_drop_columns_without_code(self):
+        with open(self.file_name) as input_file:
+            submissions = self.parser.parse(input_file.read())
+
+        self.assertEqual(2, len(submissions))
+        form_code, values = submissions[0]
+        self.assertEqual(u"cli001", form_code)
+        self.assertEqual([(u"q1", u"Ana"), (u"q3", u"30")], values.items())
@@ -14,6 +14,12 @@ def find_reporter(dbm, from_number):
 
 def find_reporter_entity(dbm, from_number):
     reporter_list = find_reporters_by_from_number(dbm, from_number.strip("+"))
+    return single_reporter_entity(from_number, reporter_list)
+
+
+def single_reporter_entity(from_number, reporter_list):
+    if len(reporter_list) == 0:
+        raise NumberNotRegisteredException(from_number.strip("+"))
     if len(reporter_list) > 1:
         raise MultipleReportersForANumberException(from_number)
     return reporter_list[0]
@@ -26,6 +32,19 @@ def find_reporters_by_from_number(dbm, from_number):
     return [Contact.new_from_doc(dbm=dbm, doc=Contact.__document_class__.wrap(row.get('doc'))) for row in rows]
 
 
+def find_reporters_by_from_numbers(dbm, from_numbers):
+    """
+    Finds the reporters of many numbers with one query. Returns a dict from number to the reporters registered
+    with it; numbers nobody is registered with are left out.
+    """
+    rows = dbm.view.datasender_by_mobile_number(keys=list(set(from_numbers)), include_docs=True)
+    reporters_by_number = {}
+    for row in rows:
+        reporter = Contact.new_from_doc(dbm=dbm, doc=Contact.__document_class__.wrap(row.get('doc')))
+        reporters_by_number.setdefault(row['key'], []).append(reporter)
+    return reporters_by_number
+
+
 def get_reporters_who_submitted_data_for_frequency_period(dbm, form_model_id, from_time=None, to_time=None):
     survey_responses = get_survey_responses_for_activity_period(dbm, form_model_id, from_time, to_time)
     source_owner_uids = set([survey_response.owner_uid for survey_response in survey_responses])
@@ -28,6 +28,18 @@ def get_survey_responses(dbm, form_model_id, from_time, to_time, page_number=0,
             rows]
 
 
+def get_survey_responses_page(dbm, form_model_id, from_time, to_time, page_size, cursor=None,
+                              view_name="surveyresponse"):
+    """
+    Returns a page of survey responses and the cursor to pass in for the next page (None after the last page).
+    """
+    startkey, endkey = _get_start_and_end_key(form_model_id, from_time, to_time)
+    rows, next_cursor = dbm.load_view_page(view_name, page_size, cursor, reduce=False, descending=True,
+                                           startkey=startkey, endkey=endkey)
+    return [SurveyResponse.new_from_doc(dbm=dbm, doc=SurveyResponse.__document_class__.wrap(row['value'])) for row in
+            rows], next_cursor
+
+
 def get_survey_response_by_id(dbm, survey_response_id):
     try:
         return dbm.get(survey_response_id, SurveyResponse)
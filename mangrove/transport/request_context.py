@@ -0,0 +1,80 @@
+from mangrove.errors.MangroveException import MangroveException
+
+PARSE = 'parse'
+FORM_MODEL = 'form_model'
+ACTIVE_FORM_MODEL = 'active_form_model'
+PROJECT = 'project'
+REPORTER = 'reporter'
+
+
+class RequestContext(object):
+    """
+    Remembers what handling one request looked up (parse result, form model, project, reporter), so the parser,
+    player and services share one lookup each instead of going back to the database. A lookup that raised a
+    MangroveException raises it again.
+
+    lookups counts every lookup made through the context, backend_calls the ones that actually had to load.
+    Create one per request, never share it between requests; a batch of requests shares its lookups through
+    child contexts instead.
+    """
+
+    def __init__(self, dbm, parent=None):
+        self.dbm = dbm
+        self.parent = parent
+        self.lookups = 0
+        self.backend_calls = 0
+        self._results = {}
+
+    def child(self):
+        """
+        Returns a context for one request of a batch. Its lookups are made once for the whole batch, but form
+        models are handed to every request as a copy of its own.
+        """
+        return RequestContext(self.dbm, parent=self)
+
+    def memoize(self, key, load):
+        loaded, value = self._result(key, load)
+        if not loaded:
+            raise value
+        return value
+
+    def preload(self, loads):
+        """
+        Remembers lookups that were fetched together with one backend call, e.g. with a multi key view query.
+        loads maps each key to a function returning, or raising, what a lookup of that key gives.
+        """
+        self.backend_calls += 1
+        for key, load in loads.iteritems():
+            self._results[key] = _call(load)
+
+    def _result(self, key, load):
+        self.lookups += 1
+        result = self._results.get(key)
+        if result is None:
+            result = self._results[key] = self._load(key, load)
+        return result
+
+    def _load(self, key, load):
+        if self.parent is None:
+            self.backend_calls += 1
+            return _call(load)
+        loaded, value = self.parent._result(key, load)
+        if loaded and hasattr(value, 'copy_for_request'):
+            value = value.copy_for_request(self.dbm)
+        return loaded, value
+
+
+def _call(load):
+    try:
+        return True, load()
+    except MangroveException as e:
+        return False, e
+
+
+def memoize(context, key, load):
+    """
+    Looks the key up in the request context, or just loads it when there is none.
+    """
+    if context is None:
+        return load()
+    return context.memoize(key, load)
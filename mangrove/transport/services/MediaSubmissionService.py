@@ -1,32 +1,47 @@
 import logging
 from mangrove.form_model.field import MediaField
 from mangrove.form_model.form_model import get_form_model_by_code
-from mangrove.form_model.media import Media
+from mangrove.form_model.media import Media, reserve_media_numbers
+from mangrove.transport.request_context import memoize, FORM_MODEL
 
 ONE_MB = 1000000
 
 logger = logging.getLogger('media-submission')
 
 class MediaSubmissionService():
-    def __init__(self, dbm, media, form_code, is_update=False):
+    def __init__(self, dbm, media, form_code, is_update=False, context=None):
         self.dbm = dbm
         self.media = media
         self.is_update = is_update
-        self.form_model = get_form_model_by_code(self.dbm, form_code)
+        self.form_model = memoize(context, (FORM_MODEL, form_code), lambda: get_form_model_by_code(self.dbm, form_code))
 
     def create_media_documents(self, values):
         if self.form_model.is_media_type_fields_present and self.media:
             fields = self.form_model.fields
-            counter = self._get_count()
+            counter = self._get_count(self._count_media_files(fields, [values]))
             return self._get_media_fields_and_update_values(fields, [values], counter)
         else:
             return None
 
-    def _get_count(self):
+    def _get_count(self, reserve=1):
+        """
+        Yields unique media file numbers, reserved reserve at a time from the sequence of the questionnaire.
+        """
+        reserve = max(reserve, 1)
         while True:
-            rows = self.dbm.view.media_attachment(group=True, reduce=True, key=self.form_model.id)
-            count = rows[0][u"value"] + 1 if rows else 1
-            yield count
+            start = reserve_media_numbers(self.dbm, self.form_model.id, reserve)
+            for count in range(start, start + reserve):
+                yield count
+
+    def _count_media_files(self, fields, values):
+        count = 0
+        for field in fields:
+            if field.is_field_set:
+                for value in values:
+                    count += self._count_media_files(field.fields, value.get(field.code, []))
+            elif isinstance(field, MediaField):
+                count += len([value for value in values if value.get(field.code) in self.media])
+        return count
 
     def create_media_details_document(self, file_size, name, is_preview=False):
         size_in_mb = file_size / ONE_MB
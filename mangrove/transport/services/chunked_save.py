@@ -0,0 +1,48 @@
+import logging
+from contextlib import contextmanager
+
+from mangrove.datastore.database import unit_of_work
+from mangrove.errors.MangroveException import MangroveException, FailedToSaveDataObject
+
+logger = logging.getLogger('chunked-save')
+
+
+def save_chunk(dbm, feeds_dbm, items, save, failed):
+    """
+    Calls save(item), which returns a Response, for every item inside one unit of work of dbm, and of feeds_dbm
+    when given, and returns the Responses once the units have been written. An item whose save raised a
+    MangroveException, or whose documents the bulk update did not write, gets failed(item, exception) instead.
+
+    Feed documents that could not be written are logged; they do not fail the submission they were made for.
+    """
+    responses, document_ids = [], []
+    try:
+        # dbm is flushed first, so the feed documents its after_write callbacks save go into the feeds unit
+        with _optional_unit_of_work(feeds_dbm) as feeds_unit, unit_of_work(dbm) as unit:
+            for item in items:
+                mark = unit.mark()
+                try:
+                    responses.append(save(item))
+                except MangroveException as e:
+                    responses.append(failed(item, e))
+                document_ids.append(unit.added_since(mark))
+    except FailedToSaveDataObject:
+        # the conflicts of both units are in their conflicts
+        pass
+    if feeds_unit is not None and feeds_unit.conflicts:
+        logger.error("Could not save feed documents: %s" % feeds_unit.conflicts)
+    conflicts = dict(unit.conflicts)
+    for index, (item, ids) in enumerate(zip(items, document_ids)):
+        item_conflicts = [(document_id, conflicts[document_id]) for document_id in ids if document_id in conflicts]
+        if item_conflicts and responses[index].success:
+            responses[index] = failed(item, FailedToSaveDataObject(str(item_conflicts)))
+    return responses
+
+
+@contextmanager
+def _optional_unit_of_work(dbm):
+    if dbm is None:
+        yield None
+    else:
+        with unit_of_work(dbm) as unit:
+            yield unit
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from threading import Event, Lock, Thread
+from uuid import uuid1
+
+from couchdb.http import ResourceConflict
+from PIL import Image
+
+from mangrove.datastore.database import get_db_manager
+from mangrove.errors.MangroveException import SubmissionQueueFullException
+from mangrove.form_model.media import MediaDocument
+from mangrove.transport.repository.survey_responses import get_survey_response_document
+from mangrove.transport.submission_processor import SubmissionProcessor
+
+THUMBNAIL_SIZE = 128, 128
+PREVIEW_PREFIX = 'preview_'
+PREVIEW_WORKERS = 2
+PREVIEW_QUEUE_SIZE = 1000
+ATTACHMENT_ATTEMPTS = 3
+DIGEST_LOCKS = 64
+RECOVER_INTERVAL = 300
+ONE_MB = 1000000
+
+logger = logging.getLogger('media-preview')
+
+
+def write_thumbnail(image_file, target):
+    """
+    Writes the thumbnail of image_file to target, a file name or file whose name tells the image format. Returns
+    False when image_file is not an image.
+    """
+    image_file.seek(0)
+    try:
+        small_im = Image.open(image_file)
+    except IOError:
+        return False
+    small_im.thumbnail(THUMBNAIL_SIZE, Image.ANTIALIAS)
+    small_im.resize(THUMBNAIL_SIZE, Image.ANTIALIAS)
+    small_im.save(target, quality=50)
+    return True
+
+
+class MediaPreviewWorker(object):
+    """
+    Creates the preview attachment and preview Media document of submitted images in the background, so a
+    submission does not wait for image processing.
+
+    Jobs are spooled to spool_dir before they are queued and removed once done. recover() queues the jobs a
+    previous process left behind, or that failed or did not fit in the queue; the worker calls it when it starts
+    and every recover_interval seconds until shutdown. A job may therefore run again after it failed half way, so
+    each step can be repeated: the preview Media document of an attachment has an id of its own, which a repeated
+    job updates instead of adding another document. Images are spooled, and thumbnailed,
+    once per content digest however many submissions carry them; a spooled image is kept as long as a spooled job
+    refers to it, its thumbnail is kept. Jobs of one survey response run one after another, so their attachment
+    uploads do not conflict.
+    """
+
+    def __init__(self, spool_dir, workers=PREVIEW_WORKERS, max_queue_size=PREVIEW_QUEUE_SIZE, get_dbm=None,
+                 recover_interval=RECOVER_INTERVAL):
+        self.spool_dir = spool_dir
+        self.get_dbm = get_dbm or (lambda server, database: get_db_manager(server=server, database=database))
+        self.processor = SubmissionProcessor(workers, max_queue_size, name='media-preview')
+        self._digest_locks = [Lock() for i in range(DIGEST_LOCKS)]
+        # how many spooled jobs refer to each spooled image; changed together with the job files, under _lock
+        self._job_counts = Counter()
+        self._lock = Lock()
+        # tokens of the jobs waiting in, or running from, the queue, which recover does not queue again
+        self._queued = set()
+        for directory in ('jobs', 'images', 'previews'):
+            if not os.path.isdir(self._path(directory)):
+                os.makedirs(self._path(directory))
+        self._stopped = Event()
+        self._recoverer = Thread(target=self._recover_every, args=(recover_interval,), name='media-preview-recover')
+        self._recoverer.daemon = True
+        self._recoverer.start()
+
+    def add_preview(self, dbm, survey_response_id, form_model_id, name, attached_file):
+        """
+        Spools the job of making the preview of attached_file, the attachment called name of the survey response.
+        """
+        attached_file.seek(0)
+        content = attached_file.read()
+        digest = hashlib.sha1(content).hexdigest()
+        image_path = self._path('images', digest)
+        staged_image = self._stage(image_path, content) if not os.path.exists(image_path) else None
+        job_id = hashlib.sha1('/'.join([dbm.url, dbm.database_name, survey_response_id, name])).hexdigest()
+        job = dict(server=dbm.url, database=dbm.database_name, survey_response_id=survey_response_id,
+                   form_model_id=form_model_id, name=name, digest=digest, token=uuid1().hex)
+        with self._lock:
+            if not os.path.exists(image_path):
+                os.rename(staged_image or self._stage(image_path, content), image_path)
+            elif staged_image is not None:
+                os.remove(staged_image)
+            superseded_job = self._read_job(job_id)
+            self._write(self._path('jobs', job_id), json.dumps(job))
+            self._job_counts[digest] += 1
+            if superseded_job is not None:
+                self._release(superseded_job['digest'])
+        self._queue(job_id, job)
+
+    def recover(self):
+        """
+        Queues every spooled job, e.g. after a restart, after the queue was full or after jobs failed, and removes
+        the spooled images no job refers to any more.
+        """
+        with self._lock:
+            jobs = dict((job_id, self._read_job(job_id)) for job_id in os.listdir(self._path('jobs'))
+                        if not job_id.startswith('.'))
+            jobs = dict((job_id, job) for job_id, job in jobs.iteritems() if job is not None)
+            self._job_counts = Counter(job['digest'] for job in jobs.values())
+            for digest in os.listdir(self._path('images')):
+                if not digest.startswith('.') and digest not in self._job_counts:
+                    os.remove(self._path('images', digest))
+        for job_id, job in jobs.iteritems():
+            self._queue(job_id, job)
+
+    def shutdown(self, wait=True):
+        self._stopped.set()
+        if wait:
+            self._recoverer.join()
+        self.processor.shutdown(wait)
+
+    def _recover_every(self, interval):
+        while True:
+            try:
+                self.recover()
+            except Exception as e:
+                logger.exception("Could not recover spooled preview jobs: %r" % e)
+            if self._stopped.wait(interval):
+                return
+
+    def _queue(self, job_id, job):
+        with self._lock:
+            if job['token'] in self._queued:
+                return
+            self._queued.add(job['token'])
+        try:
+            self.processor.submit_with(job['survey_response_id'], self._run, (job_id, job), block=False)
+        except SubmissionQueueFullException:
+            with self._lock:
+                self._queued.discard(job['token'])
+            logger.warning("Preview queue is full, %s stays spooled until recover()" % job_id)
+
+    def _run(self, job_id, job):
+        """
+        Makes the preview of a job that is still current. A job that raises stays spooled, with its image, until
+        recover() queues it again.
+        """
+        try:
+            if not self._is_current(job_id, job):
+                return
+            self._process(job)
+            with self._lock:
+                if self._is_current(job_id, job):
+                    os.remove(self._path('jobs', job_id))
+                    self._release(job['digest'])
+        finally:
+            with self._lock:
+                self._queued.discard(job['token'])
+
+    def _process(self, job):
+        preview_path = self._preview(job['digest'], job['name'])
+        if preview_path is not None:
+            dbm = self.get_dbm(job['server'], job['database'])
+            preview_name = PREVIEW_PREFIX + job['name']
+            self._put_attachment(dbm, job['survey_response_id'], preview_path, preview_name)
+            self._save_preview_media(dbm, job, preview_name, float(os.stat(preview_path).st_size) / ONE_MB)
+
+    def _save_preview_media(self, dbm, job, preview_name, size):
+        media_id = PREVIEW_PREFIX + hashlib.sha1('/'.join([job['survey_response_id'], job['name']])).hexdigest()
+        document = dbm._load_document(media_id, MediaDocument)
+        if document is None:
+            document = MediaDocument(media_id, preview_name, size, job['form_model_id'], is_preview=True)
+        else:
+            document.size = size
+        dbm._save_document(document)
+
+    def _is_current(self, job_id, job):
+        """
+        False once the job was done, or spooled again for a new upload of the attachment which a later job does.
+        """
+        spooled_job = self._read_job(job_id)
+        return spooled_job is not None and spooled_job.get('token') == job.get('token')
+
+    def _read_job(self, job_id):
+        try:
+            with open(self._path('jobs', job_id)) as job_file:
+                return json.load(job_file)
+        except IOError:
+            return None
+
+    def _release(self, digest):
+        self._job_counts[digest] -= 1
+        if self._job_counts[digest] > 0:
+            return
+        del self._job_counts[digest]
+        image_path = self._path('images', digest)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
+    def _preview(self, digest, name):
+        preview_path = self._path('previews', digest + os.path.splitext(name)[1].lower())
+        with self._digest_locks[int(digest[:8], 16) % DIGEST_LOCKS]:
+            if not os.path.exists(preview_path):
+                temporary_path = self._path('previews', '.%s%s' % (uuid1().hex, os.path.splitext(name)[1].lower()))
+                with open(self._path('images', digest), 'rb') as image_file:
+                    if not write_thumbnail(image_file, temporary_path):
+                        return None
+                os.rename(temporary_path, preview_path)
+        return preview_path
+
+    def _put_attachment(self, dbm, survey_response_id, path, attachment_name):
+        for attempt in range(ATTACHMENT_ATTEMPTS):
+            document = get_survey_response_document(dbm, survey_response_id)
+            try:
+                with open(path, 'rb') as preview:
+                    dbm.put_attachment(document, preview, attachment_name=attachment_name)
+                return
+            except ResourceConflict:
+                if attempt == ATTACHMENT_ATTEMPTS - 1:
+                    raise
+
+    def _write(self, path, content):
+        os.rename(self._stage(path, content), path)
+
+    def _stage(self, path, content):
+        """
+        Writes content next to path under a temporary name, which is returned, for an atomic rename into place.
+        """
+        directory, name = os.path.split(path)
+        temporary_path = os.path.join(directory, '.%s-%s' % (name, uuid1().hex))
+        with open(temporary_path, 'wb') as spool_file:
+            spool_file.write(content)
+        return temporary_path
+
+    def _path(self, *parts):
+        return os.path.join(self.spool_dir, *parts)
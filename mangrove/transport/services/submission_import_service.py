@@ -0,0 +1,64 @@
+from itertools import islice
+
+from mangrove.transport.contract.response import Response
+from mangrove.transport.request_context import RequestContext
+from mangrove.transport.services.chunked_save import save_chunk
+from mangrove.transport.services.survey_response_service import SurveyResponseService
+
+IMPORT_CHUNK_SIZE = 500
+
+
+class SubmissionImportService(object):
+    """
+    Imports the (form_code, values) rows of an uploaded file, e.g. CsvParser.parse_file, as survey responses of
+    one reporter.
+
+    Rows are pulled from the iterator chunk_size at a time. Form models and projects are looked up once for the
+    whole import and every chunk is written with one bulk update, so memory stays bounded by the chunk however
+    long the file is. After each chunk, progress is called with the number of rows imported and failed so far,
+    which add up to the rows processed.
+    """
+
+    def __init__(self, dbm, transport_info, reporter_id, reporter_names=None, feeds_dbm=None,
+                 chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+        assert chunk_size > 0
+        self.dbm = dbm
+        self.transport_info = transport_info
+        self.reporter_id = reporter_id
+        self.reporter_names = reporter_names or []
+        self.feeds_dbm = feeds_dbm
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def import_rows(self, rows):
+        """
+        Yields one Response per row, in order, once the chunk holding the row has been saved. A row that could
+        not be saved, including one whose documents the bulk update did not write, gets a Response with its
+        errors, and its exception when one was raised.
+        """
+        batch = RequestContext(self.dbm)
+        rows = iter(rows)
+        imported = failed = 0
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            responses = self._import_chunk(batch, chunk)
+            chunk_failed = len([response for response in responses if not response.success])
+            imported += len(responses) - chunk_failed
+            failed += chunk_failed
+            if self.progress is not None:
+                self.progress(imported, failed)
+            for response in responses:
+                yield response
+
+    def _import_chunk(self, batch, chunk):
+        return save_chunk(self.dbm, self.feeds_dbm, chunk, lambda row: self._save_row(batch, row), self._failed_row)
+
+    def _save_row(self, batch, row):
+        form_code, values = row
+        service = SurveyResponseService(self.dbm, feeds_dbm=self.feeds_dbm, context=batch.child())
+        return service.save_survey(form_code, values, self.reporter_names, self.transport_info, self.reporter_id)
+
+    def _failed_row(self, row, e):
+        return Response(self.reporter_names, errors=e.message, form_code=row[0], exception=e)
@@ -1,72 +1,116 @@
 from copy import copy
 import traceback
+from mangrove.datastore.database import unit_of_work
 from mangrove.datastore.entity import by_short_code
 from mangrove.feeds.enriched_survey_response import EnrichedSurveyResponseBuilder
 from mangrove.form_model.forms import EditSurveyResponseForm
 from mangrove.form_model.form_submission import DataFormSubmission
-from mangrove.errors.MangroveException import MangroveException, FormModelDoesNotExistsException
+from mangrove.errors.MangroveException import MangroveException, FormModelDoesNotExistsException, \
+    FailedToSaveDataObject
 from mangrove.form_model.form_model import get_form_model_by_code, FormModel
 from mangrove.form_model.project import Project, get_active_form_model, check_if_form_code_is_poll
 from mangrove.transport.contract.response import Response
 from mangrove.transport.repository.reporters import REPORTER_ENTITY_TYPE
 from mangrove.transport.repository.survey_responses import SurveyResponse
+from mangrove.transport.request_context import memoize, FORM_MODEL, ACTIVE_FORM_MODEL
 
 
 class SurveyResponseService(object):
-    def __init__(self, dbm, logger=None, feeds_dbm=None, admin_id=None, response=None):
+    def __init__(self, dbm, logger=None, feeds_dbm=None, admin_id=None, response=None, context=None):
         self.dbm = dbm
         self.logger = logger
         self.feeds_dbm = feeds_dbm
         self.admin_id = admin_id
         self.response = response
+        self.context = context
 
     def save_survey(self, form_code, values, reporter_names, transport_info, reporter_id,
-                    additional_feed_dictionary=None, translation_processor=None):
+                    additional_feed_dictionary=None, translation_processor=None, attachments=None):
+        """
+        Saves the submission and its survey response, which is written together with attachments, a list of
+        (name, file or string) pairs, when given.
+        """
         try:
-            form_model = get_form_model_by_code(self.dbm, form_code)
+            form_model = memoize(self.context, (FORM_MODEL, form_code),
+                                 lambda: get_form_model_by_code(self.dbm, form_code))
         except FormModelDoesNotExistsException:
-            form_model = get_active_form_model(self.dbm, form_code)
+            form_model = memoize(self.context, (ACTIVE_FORM_MODEL, form_code),
+                                 lambda: get_active_form_model(self.dbm, form_code))
 
         #TODO : validate_submission should use form_model's bound values
         cleaned_data, errors = form_model.validate_submission(values=values)
-        form_model.bind(form_model.remove_invalid_meta_answers(values))
+        bound_form = form_model.bind(form_model.remove_invalid_meta_answers(values))
 
         if reporter_id is not None:
             survey_response = self.create_survey_response_from_known_datasender(transport_info, form_model,
-                                                                            form_model.bound_values(),
+                                                                            bound_form.bound_values(),
                                                                             reporter_id, self.response)
         else:
             survey_response = self.create_survey_response_from_unknown_datasender(transport_info, form_model.id,
-                                                                            form_model.bound_values(), self.response)
+                                                                            bound_form.bound_values(), self.response)
 
         survey_response.set_form(form_model)
 
         form_submission = DataFormSubmission(form_model, cleaned_data, errors)
-        feed_create_errors = None
-        try:
-            if form_submission.is_valid:
-                form_submission.save(self.dbm)
-
-        except MangroveException as exception:
-            errors = exception.message
-            raise
-        finally:
-            if translation_processor is not None:
-                translated_errors = translation_processor(form_model, self.response).process()
-                survey_response.set_status(translated_errors)
-            else:
-                survey_response.set_status(errors)
-            survey_response.create(form_submission.data_record_id)
+        with unit_of_work(self.dbm) as unit:
+            mark = unit.mark()
             try:
-                if self.feeds_dbm:
-                    builder = EnrichedSurveyResponseBuilder(self.dbm, survey_response, form_model,
-                                                            additional_feed_dictionary, ds_mobile_number=transport_info.source)
-                    event_document = builder.feed_document()
-                    self.feeds_dbm._save_document(event_document)
-            except Exception as e:
-                feed_create_errors = 'error while creating feed doc for %s \n' % survey_response.id
-                feed_create_errors += e.message + '\n'
-                feed_create_errors += traceback.format_exc()
+                if form_submission.is_valid:
+                    form_submission.save(self.dbm)
+            except MangroveException as exception:
+                self._set_status(survey_response, form_model, exception.message, translation_processor)
+                survey_response.create(form_submission.data_record_id)
+                self._create_feed(survey_response, form_model, additional_feed_dictionary, transport_info)
+                raise
+
+            response = self._response_for(form_submission, survey_response, reporter_names)
+            submission_document_ids = unit.added_since(mark)
+
+            def create_survey_response(conflicting_ids):
+                # the status is only known once the submission's documents have been written
+                conflicts = submission_document_ids & conflicting_ids
+                if conflicts:
+                    conflict_errors = FailedToSaveDataObject(str(sorted(conflicts))).message
+                    survey_response.set_status(conflict_errors)
+                    response.success = False
+                    response.errors = conflict_errors
+                else:
+                    self._set_status(survey_response, form_model, errors, translation_processor)
+                survey_response.create(form_submission.data_record_id)
+                if attachments:
+                    unit.attach(survey_response._doc, attachments)
+                response.feed_error_message = self._create_feed(survey_response, form_model,
+                                                                additional_feed_dictionary, transport_info)
+                response.created = survey_response.created
+                unit.after_write(set_version)
+
+            def set_version(conflicting_ids):
+                response.version = survey_response.version
+
+            unit.after_write(create_survey_response)
+        return response
+
+    def _set_status(self, survey_response, form_model, errors, translation_processor):
+        if translation_processor is not None:
+            survey_response.set_status(translation_processor(form_model, self.response).process())
+        else:
+            survey_response.set_status(errors)
+
+    def _create_feed(self, survey_response, form_model, additional_feed_dictionary, transport_info):
+        try:
+            if self.feeds_dbm:
+                builder = EnrichedSurveyResponseBuilder(self.dbm, survey_response, form_model,
+                                                        additional_feed_dictionary, ds_mobile_number=transport_info.source)
+                event_document = builder.feed_document()
+                self.feeds_dbm._save_document(event_document)
+        except Exception as e:
+            feed_create_errors = 'error while creating feed doc for %s \n' % survey_response.id
+            feed_create_errors += e.message + '\n'
+            feed_create_errors += traceback.format_exc()
+            return feed_create_errors
+        return None
+
+    def _response_for(self, form_submission, survey_response, reporter_names):
         if self.response is None:
             errors = form_submission.errors
             success = form_submission.saved
@@ -77,7 +121,7 @@ class SurveyResponseService(object):
         return Response(reporter_names,  survey_response.uuid, success,
                         errors, form_submission.data_record_id, form_submission.short_code,
                         form_submission.cleaned_data, form_submission.is_registration, form_submission.entity_type,
-                        form_submission.form_model.form_code, feed_create_errors, created=survey_response.created,
+                        form_submission.form_model.form_code, None, created=survey_response.created,
                         version=survey_response.version)
 
     def edit_survey(self, form_code, values, reporter_names,  survey_response,
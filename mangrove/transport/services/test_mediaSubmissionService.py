@@ -3,12 +3,17 @@ from mock import Mock, patch, PropertyMock
 from mangrove.datastore.database import DatabaseManager
 from mangrove.form_model.field import PhotoField, TextField, FieldSet
 from mangrove.form_model.form_model import FormModel
+from mangrove.form_model.media import MediaSequenceDocument
 from mangrove.transport.services.MediaSubmissionService import MediaSubmissionService
 
 
 class TestMediaSubmissionService(TestCase):
     def setUp(self):
-        dbm = Mock(spec=DatabaseManager)
+        self.dbm = dbm = Mock(spec=DatabaseManager)
+        dbm.view = Mock()
+        self.sequence = MediaSequenceDocument('media_sequence_fm1', 'fm1', 5)
+        dbm._load_document.return_value = self.sequence
+        dbm._save_documents.return_value = [(True, self.sequence.id, '2-rev')]
         self.image = Mock()
         self.image.size = 1000000
         media = {"image.png": self.image}
@@ -58,6 +63,28 @@ class TestMediaSubmissionService(TestCase):
             expected_files = {"1-image.png": self.image, "2-image.png": self.image, "3-image.png": self.image}
             self.assertDictEqual(expected_files, media_files)
 
+    def test_should_reserve_numbers_of_all_media_files_with_one_update(self):
+        values = {"group": [{"image": "image.png"}, {"image": "image.png"}, {"image": ""}]}
+        field_set = FieldSet('group', 'group', 'group', field_set=[PhotoField('image', 'image', 'image')])
+        self.form_model.fields = [field_set]
+        with patch(
+                "mangrove.transport.services.MediaSubmissionService.MediaSubmissionService.create_media_details_document"):
+            media_files = self.media_submission_service.create_media_documents(values)
+        self.assertEqual(["5-image.png", "6-image.png"], sorted(media_files))
+        self.assertEqual(1, self.dbm._save_documents.call_count)
+        self.assertEqual(7, self.sequence.next_value)
+        self.assertFalse(self.dbm.view.media_attachment.called)
+
+    def test_should_seed_media_sequence_from_media_count_and_retry_on_conflict(self):
+        self.dbm._load_document.side_effect = [None, self.sequence]
+        self.dbm.view.media_attachment.return_value = [{u"value": 2}]
+        self.dbm._save_documents.side_effect = [[(False, 'media_sequence_fm1', Exception('conflict'))],
+                                                [(True, 'media_sequence_fm1', '3-rev')]]
+        counter = self.media_submission_service._get_count(2)
+        self.assertEqual([5, 6], [next(counter), next(counter)])
+        first_sequence = self.dbm._save_documents.call_args_list[0][0][0][0]
+        self.assertEqual(5, first_sequence.next_value)
+
 
 def count_generator():
     count = 0
@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+from threading import Event
+from unittest import TestCase
+
+from mock import Mock, patch
+from PIL import Image
+
+from mangrove.datastore.database import DatabaseManager
+from mangrove.transport.services import media_preview_worker
+from mangrove.transport.services.media_preview_worker import MediaPreviewWorker
+
+
+def _image(color):
+    image_file = StringIO()
+    Image.new('RGB', (400, 300), color).save(image_file, 'PNG')
+    image_file.name = 'image.png'
+    return image_file
+
+
+class TestMediaPreviewWorker(TestCase):
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.dbm = Mock(spec=DatabaseManager)
+        self.dbm.url = 'http://localhost:5984/'
+        self.dbm.database_name = 'hni_test'
+        self.get_dbm = Mock(return_value=self.dbm)
+        self.attachments = []
+        self.dbm.put_attachment.side_effect = lambda document, preview, attachment_name: self.attachments.append(
+            (attachment_name, Image.open(preview).size))
+        self.documents = {}
+        self.dbm._load_document.side_effect = lambda document_id, document_class: self.documents.get(document_id)
+        self.dbm._save_document.side_effect = lambda document: self.documents.__setitem__(document.id, document)
+        self.get_document = patch('mangrove.transport.services.media_preview_worker.get_survey_response_document')
+        self.get_document.start()
+
+    def tearDown(self):
+        self.get_document.stop()
+        shutil.rmtree(self.spool_dir)
+
+    def _worker(self, **kwargs):
+        return MediaPreviewWorker(self.spool_dir, get_dbm=self.get_dbm, **kwargs)
+
+    def _spooled(self, directory):
+        return [name for name in os.listdir(os.path.join(self.spool_dir, directory)) if not name.startswith('.')]
+
+    def test_should_attach_preview_and_create_preview_media_document(self):
+        worker = self._worker()
+        worker.add_preview(self.dbm, 'sr1', 'fm1', '1-image.png', _image('red'))
+        worker.shutdown()
+
+        self.assertEqual([('preview_1-image.png', (128, 96))], self.attachments)
+        self.get_dbm.assert_called_with(self.dbm.url, self.dbm.database_name)
+        media, = self.documents.values()
+        self.assertEqual(('preview_1-image.png', 'fm1', True), (media.name, media.questionnaire_id, media.is_preview))
+        self.assertEqual([], os.listdir(os.path.join(self.spool_dir, 'jobs')))
+        self.assertEqual([], os.listdir(os.path.join(self.spool_dir, 'images')))
+
+    def test_should_make_thumbnail_once_per_image_digest(self):
+        worker = self._worker()
+        with patch.object(media_preview_worker, 'write_thumbnail',
+                          wraps=media_preview_worker.write_thumbnail) as write_thumbnail:
+            worker.add_preview(self.dbm, 'sr1', 'fm1', '1-image.png', _image('red'))
+            worker.add_preview(self.dbm, 'sr2', 'fm1', '2-image.png', _image('red'))
+            worker.shutdown()
+
+        self.assertEqual(1, write_thumbnail.call_count)
+        self.assertEqual(['preview_1-image.png', 'preview_2-image.png'], sorted(name for name, size in self.attachments))
+
+    def test_should_pick_up_spooled_jobs_after_restart(self):
+        worker = self._worker()
+        worker.processor.shutdown()
+        with patch.object(worker.processor, 'submit_with'):
+            worker.add_preview(self.dbm, 'sr1', 'fm1', '1-image.png', _image('red'))
+        self.assertEqual(1, len(os.listdir(os.path.join(self.spool_dir, 'jobs'))))
+
+        restarted = self._worker()
+        restarted.shutdown()
+
+        self.assertEqual([('preview_1-image.png', (128, 96))], self.attachments)
+        self.assertEqual([], os.listdir(os.path.join(self.spool_dir, 'jobs')))
+
+    def test_should_not_duplicate_preview_media_when_a_job_runs_again(self):
+        worker = self._worker()
+        worker.processor.shutdown()
+        with patch.object(worker.processor, 'submit_with') as submit_with:
+            worker.add_preview(self.dbm, 'sr1', 'fm1', '1-image.png', _image('red'))
+        job_id, job = submit_with.call_args[0][2]
+
+        worker._process(job)
+        worker._process(job)
+
+        self.assertEqual(2, len(self.attachments))
+        media, = self.documents.values()
+        self.assertEqual('preview_1-image.png', media.name)
+
+    def test_should_only_make_preview_of_latest_upload_of_attachment(self):
+        worker = self._worker()
+        worker.processor.shutdown()
+        with patch.object(worker.processor, 'submit_with') as submit_with:
+            worker.add_preview(self.dbm, 'sr1', 'fm1', '1-image.png', _image('red'))
+            worker.add_preview(self.dbm, 'sr1', 'fm1', '1-image.png', _image('blue'))
+        first_job, second_job = [call[0][2] for call in submit_with.call_args_list]
+
+        worker._run(*first_job)
+        self.assertEqual([], self.attachments)
+        worker._run(*second_job)
+        self.assertEqual(1, len(self.attachments))
+
+    def test_should_keep_image_of_job_left_spooled_by_full_queue(self):
+        running, release = Event(), Event()
+        record_attachment = self.dbm.put_attachment.side_effect
+
+        def put_attachment(document, preview, attachment_name):
+            running.set()
+            release.wait(5)
+            record_attachment(document, preview, attachment_name)
+
+        self.dbm.put_attachment.side_effect = put_attachment
+        worker = self._worker(workers=1, max_queue_size=1)
+        worker.add_preview(self.dbm, 'sr1', 'fm1', '1-image.png', _image('red'))
+        running.wait(5)
+        worker.add_preview(self.dbm, 'sr2', 'fm1', '2-image.png', _image('blue'))
+        worker.add_preview(self.dbm, 'sr3', 'fm1', '3-image.png', _image('green'))
+        release.set()
+        worker.shutdown()
+
+        self.assertEqual(2, len(self.attachments))
+        self.assertEqual(1, len(self._spooled('jobs')))
+        self.assertEqual(1, len(self._spooled('images')))
+
+        restarted = self._worker()
+        restarted.recover()
+        restarted.shutdown()
+        self.assertEqual(['preview_1-image.png', 'preview_2-image.png', 'preview_3-image.png'],
+                         sorted(name for name, size in self.attachments))
+        self.assertEqual([], self._spooled('jobs'))
+        self.assertEqual([], self._spooled('images'))
+
+    def test_should_keep_failed_job_and_its_image_until_recover(self):
+        record_attachment = self.dbm.put_attachment.side_effect
+        self.dbm.put_attachment.side_effect = IOError('CouchDB is down')
+        worker = self._worker()
+        worker.add_preview(self.dbm, 'sr1', 'fm1', '1-image.png', _image('red'))
+        worker.processor.submit_with('sr1', lambda: None).result(5)
+
+        self.assertEqual(1, len(self._spooled('jobs')))
+        self.assertEqual(1, len(self._spooled('images')))
+
+        self.dbm.put_attachment.side_effect = record_attachment
+        worker.recover()
+        worker.shutdown()
+        self.assertEqual([('preview_1-image.png', (128, 96))], self.attachments)
+        self.assertEqual([], self._spooled('jobs'))
+        self.assertEqual([], self._spooled('images'))
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from mock import Mock, patch
+from mangrove.datastore.database import DatabaseManager, unit_of_work, _active_units_of_work
+from mangrove.datastore.documents import DocumentBase
+from couchdb.http import ResourceConflict
+from mangrove.errors.MangroveException import FormModelDoesNotExistsException, FailedToSaveDataObject
+from mangrove.transport.contract.response import Response
+from mangrove.transport.contract.transport_info import TransportInfo
+from mangrove.transport.services.submission_import_service import SubmissionImportService
+
+
+class TestSubmissionImportService(TestCase):
+    def setUp(self):
+        self.dbm = Mock(spec=DatabaseManager)
+        self.transport_info = TransportInfo('csv', 'user@example.com', 'destination')
+        self.progress = Mock()
+        self.service = SubmissionImportService(self.dbm, self.transport_info, 'rep1', chunk_size=2,
+                                               progress=self.progress)
+
+    def _save_survey(self, form_code, values, reporter_names, transport_info, reporter_id):
+        if form_code == 'missing':
+            raise FormModelDoesNotExistsException(form_code)
+        return Response(reporter_names, success=values['q1'] != 'invalid', form_code=form_code)
+
+    def test_should_save_rows_chunk_by_chunk_and_report_progress(self):
+        rows = iter([('cli001', {'q1': '1'}), ('cli001', {'q1': 'invalid'}), ('missing', {'q1': '3'}),
+                     ('cli001', {'q1': '4'}), ('cli001', {'q1': '5'})])
+        with patch('mangrove.transport.services.submission_import_service.SurveyResponseService') as service_class:
+            with patch('mangrove.transport.services.chunked_save.unit_of_work', wraps=unit_of_work) as units_of_work:
+                service_class.return_value.save_survey.side_effect = self._save_survey
+                responses = self.service.import_rows(rows)
+
+                first = next(responses)
+                self.assertEqual(1, units_of_work.call_count)
+                self.assertEqual(2, service_class.return_value.save_survey.call_count)
+                responses = [first] + list(responses)
+
+        self.assertEqual([True, False, False, True, True], [response.success for response in responses])
+        self.assertEqual('missing', responses[2].form_code)
+        self.assertIsInstance(responses[2].exception, FormModelDoesNotExistsException)
+        self.assertEqual(3, units_of_work.call_count)
+        self.assertEqual([((1, 1),), ((2, 2),), ((3, 2),)], self.progress.call_args_list)
+
+    def test_should_share_form_model_lookups_across_chunks(self):
+        with patch('mangrove.transport.services.submission_import_service.SurveyResponseService') as service_class:
+            with patch('mangrove.transport.services.chunked_save.unit_of_work', wraps=unit_of_work):
+                list(self.service.import_rows([('cli001', {'q1': '1'})] * 3))
+
+        contexts = [call[1]['context'] for call in service_class.call_args_list]
+        self.assertEqual(3, len(set(contexts)))
+        self.assertEqual(1, len(set(context.parent for context in contexts)))
+
+    def test_should_fail_rows_whose_documents_were_not_written(self):
+        def save_survey(form_code, values, reporter_names, transport_info, reporter_id):
+            _active_units_of_work()[self.dbm].add(DocumentBase(id=values['q1']))
+            return Response(reporter_names, success=True, form_code=form_code)
+
+        self.dbm._save_documents.side_effect = lambda documents: [
+            (document.id != 'conflict', document.id, ResourceConflict()) for document in documents]
+        with patch('mangrove.transport.services.submission_import_service.SurveyResponseService') as service_class:
+            service_class.return_value.save_survey.side_effect = save_survey
+            responses = list(self.service.import_rows([('cli001', {'q1': 'saved'}), ('cli001', {'q1': 'conflict'}),
+                                                       ('cli001', {'q1': 'next chunk'})]))
+
+        self.assertEqual([True, False, True], [response.success for response in responses])
+        self.assertIsInstance(responses[1].exception, FailedToSaveDataObject)
+        self.assertEqual('cli001', responses[1].form_code)
+        self.assertEqual([((1, 1),), ((2, 1),)], self.progress.call_args_list)
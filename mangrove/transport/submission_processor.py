@@ -0,0 +1,212 @@
+import logging
+import time
+from bisect import bisect_left
+from collections import deque
+from threading import Condition, Event, Lock, Thread
+
+from mangrove.datastore.instrumentation import LATENCY_BUCKETS_MS
+from mangrove.errors.MangroveException import MangroveException, SubmissionQueueFullException, \
+    SubmissionNotProcessedException
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUE_SIZE = 200
+QUEUED = 'queued'
+PROCESSING = 'processing'
+
+logger = logging.getLogger('submission-processor')
+
+
+class PendingSubmission(object):
+    """
+    A submission handed to a SubmissionProcessor. result() waits for it to be processed and returns what the
+    player returned, or raises what it raised.
+    """
+
+    def __init__(self, ordering_key, handle, args, kwargs):
+        self.ordering_key = ordering_key
+        self.queued_at = time.time()
+        self._handle = handle
+        self._args = args
+        self._kwargs = kwargs
+        self._done = Event()
+        self._value = None
+        self._exception = None
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise SubmissionNotProcessedException(self.ordering_key)
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+    def _run(self):
+        try:
+            self._value = self._handle(*self._args, **self._kwargs)
+        except Exception as e:
+            self._exception = e
+        finally:
+            self._done.set()
+        return self._exception is None
+
+
+class SubmissionProcessorMetrics(object):
+    """
+    Counts of submitted, processed, failed and rejected submissions, latency histograms of the queued and
+    processing stages and the time every worker spent busy.
+
+    snapshot() returns a copy that monitoring can scrape, with the utilisation of every worker since start.
+    """
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = Lock()
+        self.reset()
+
+    def submitted(self):
+        with self._lock:
+            self._counts['submitted'] += 1
+
+    def rejected(self):
+        with self._lock:
+            self._counts['rejected'] += 1
+
+    def record(self, worker, queued_ms, processing_ms, succeeded):
+        with self._lock:
+            self._counts['processed' if succeeded else 'failed'] += 1
+            self._record_stage(QUEUED, queued_ms)
+            self._record_stage(PROCESSING, processing_ms)
+            self._busy_ms[worker] = self._busy_ms.get(worker, 0.0) + processing_ms
+
+    def snapshot(self):
+        with self._lock:
+            elapsed_ms = max((time.time() - self._started_at) * 1000, 1.0)
+            snapshot = dict(self._counts)
+            snapshot['stages'] = {}
+            for stage, stats in self._stages.iteritems():
+                stage_snapshot = dict(stats)
+                stage_snapshot['histogram'] = self._labelled_histogram(stats['histogram'])
+                snapshot['stages'][stage] = stage_snapshot
+            snapshot['worker_utilisation'] = dict((worker, min(busy_ms / elapsed_ms, 1.0))
+                                                  for worker, busy_ms in self._busy_ms.iteritems())
+            return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._started_at = time.time()
+            self._counts = {'submitted': 0, 'processed': 0, 'failed': 0, 'rejected': 0}
+            self._stages = {}
+            self._busy_ms = {}
+
+    def _record_stage(self, stage, latency_ms):
+        stats = self._stages.get(stage)
+        if stats is None:
+            stats = self._stages[stage] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                           'histogram': [0] * (len(self.buckets_ms) + 1)}
+        stats['count'] += 1
+        stats['total_ms'] += latency_ms
+        stats['max_ms'] = max(stats['max_ms'], latency_ms)
+        stats['histogram'][bisect_left(self.buckets_ms, latency_ms)] += 1
+
+    def _labelled_histogram(self, counts):
+        labels = ['le_%s' % bucket for bucket in self.buckets_ms] + ['inf']
+        return dict(zip(labels, counts))
+
+
+class SubmissionProcessor(object):
+    """
+    Processes submissions on a pool of worker threads instead of inside the web request.
+
+    Submissions with the same ordering key, the reporter's number or id, always go to the same worker, so one
+    reporter's submissions are processed in the order they were submitted while different reporters are
+    processed concurrently:
+
+        processor.submit(request.transport.source, sms_player.accept, request, logger=logger)
+        processor.submit(reporter_id, xform_player.add_survey_response, request, reporter_id)
+
+    At most max_queue_size submissions wait at a time. submit() then blocks until one is picked up, or raises
+    SubmissionQueueFullException when block is False or timeout runs out, so callers can turn clients away.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue_size=DEFAULT_MAX_QUEUE_SIZE, metrics=None,
+                 name='submissions'):
+        assert workers > 0 and max_queue_size > 0
+        self.max_queue_size = max_queue_size
+        self.metrics = metrics or SubmissionProcessorMetrics()
+        self._queues = [deque() for i in range(workers)]
+        self._queued = 0
+        self._lock = Condition(Lock())
+        self._shutdown = False
+        self._workers = [Thread(target=self._work, args=(index,), name='%s-%d' % (name, index))
+                         for index in range(workers)]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+
+    def submit(self, ordering_key, handle, *args, **kwargs):
+        return self.submit_with(ordering_key, handle, args, kwargs)
+
+    def submit_with(self, ordering_key, handle, args=(), kwargs=None, block=True, timeout=None):
+        pending = PendingSubmission(ordering_key, handle, args, kwargs or {})
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            assert not self._shutdown, "Submission processor has been shut down"
+            while self._queued >= self.max_queue_size:
+                remaining = None if deadline is None else deadline - time.time()
+                if not block or (remaining is not None and remaining <= 0):
+                    self.metrics.rejected()
+                    raise SubmissionQueueFullException(self.max_queue_size)
+                self._lock.wait(remaining)
+            self._queues[hash(ordering_key) % len(self._queues)].append(pending)
+            self._queued += 1
+            self.metrics.submitted()
+            self._lock.notify_all()
+        return pending
+
+    def queue_depth(self):
+        with self._lock:
+            return self._queued
+
+    def snapshot(self):
+        snapshot = self.metrics.snapshot()
+        with self._lock:
+            snapshot['queue_depth'] = self._queued
+            snapshot['worker_queue_depth'] = [len(queue) for queue in self._queues]
+        return snapshot
+
+    def shutdown(self, wait=True):
+        """
+        Stops taking submissions. Workers finish what is already queued before they stop.
+        """
+        with self._lock:
+            self._shutdown = True
+            self._lock.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _next(self, index):
+        queue = self._queues[index]
+        with self._lock:
+            while not queue and not self._shutdown:
+                self._lock.wait()
+            if not queue:
+                return None
+            self._queued -= 1
+            self._lock.notify_all()
+            return queue.popleft()
+
+    def _work(self, index):
+        while True:
+            pending = self._next(index)
+            if pending is None:
+                return
+            started_at = time.time()
+            succeeded = pending._run()
+            finished_at = time.time()
+            if not succeeded and not isinstance(pending._exception, MangroveException):
+                logger.error("Submission from %s failed: %r" % (pending.ordering_key, pending._exception))
+            self.metrics.record(index, (started_at - pending.queued_at) * 1000, (finished_at - started_at) * 1000,
+                                succeeded)
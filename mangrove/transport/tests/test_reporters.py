@@ -1,6 +1,9 @@
 from unittest.case import TestCase
-from mangrove.transport.repository.reporters import find_reporter_entity, find_reporters_by_from_number
+from mangrove.errors.MangroveException import NumberNotRegisteredException, MultipleReportersForANumberException
+from mangrove.transport.repository.reporters import find_reporter_entity, find_reporters_by_from_number, \
+    find_reporters_by_from_numbers, single_reporter_entity
 from mock import patch, Mock
+from mangrove.datastore.database import DatabaseManager
 
 class TestFindReporters(TestCase):
 
@@ -13,4 +16,23 @@ class TestFindReporters(TestCase):
 
             reporter = find_reporter_entity(Mock(), "+23242432")
             self.assertEqual(reporter, "23242432")
-        
\ No newline at end of file
+        
+    def test_should_find_reporters_of_many_numbers_with_one_query(self):
+        dbm = Mock(spec=DatabaseManager)
+        dbm.view = Mock()
+        dbm.view.datasender_by_mobile_number.return_value = [
+            {'key': '123', 'doc': {'_id': 'rep1', 'document_type': 'Contact'}},
+            {'key': '456', 'doc': {'_id': 'rep2', 'document_type': 'Contact'}},
+            {'key': '456', 'doc': {'_id': 'rep3', 'document_type': 'Contact'}}]
+
+        reporters_by_number = find_reporters_by_from_numbers(dbm, ['123', '456', '456', '789'])
+
+        self.assertEqual(['rep1'], [reporter.id for reporter in reporters_by_number['123']])
+        self.assertEqual(['rep2', 'rep3'], [reporter.id for reporter in reporters_by_number['456']])
+        self.assertNotIn('789', reporters_by_number)
+        self.assertEqual(1, dbm.view.datasender_by_mobile_number.call_count)
+
+    def test_should_pick_single_reporter_of_number(self):
+        self.assertEqual('reporter', single_reporter_entity('+123', ['reporter']))
+        self.assertRaises(NumberNotRegisteredException, single_reporter_entity, '+123', [])
+        self.assertRaises(MultipleReportersForANumberException, single_reporter_entity, '+123', ['one', 'two'])
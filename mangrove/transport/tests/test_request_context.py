@@ -0,0 +1,58 @@
+import unittest
+from mock import Mock
+from mangrove.datastore.database import DatabaseManager
+from mangrove.errors.MangroveException import FormModelDoesNotExistsException, NumberNotRegisteredException
+from mangrove.transport.request_context import RequestContext, memoize, FORM_MODEL, REPORTER
+
+
+class TestRequestContext(unittest.TestCase):
+    def setUp(self):
+        self.context = RequestContext(Mock(spec=DatabaseManager))
+
+    def test_should_load_each_key_once(self):
+        load = Mock(return_value='form model')
+
+        self.assertEqual('form model', self.context.memoize((FORM_MODEL, 'cli001'), load))
+        self.assertEqual('form model', self.context.memoize((FORM_MODEL, 'cli001'), load))
+
+        self.assertEqual(1, load.call_count)
+        self.assertEqual(2, self.context.lookups)
+        self.assertEqual(1, self.context.backend_calls)
+
+    def test_should_raise_remembered_exception_again(self):
+        load = Mock(side_effect=FormModelDoesNotExistsException('cli001'))
+
+        for i in range(2):
+            self.assertRaises(FormModelDoesNotExistsException, self.context.memoize, (FORM_MODEL, 'cli001'), load)
+        self.assertEqual(1, load.call_count)
+
+    def test_should_always_load_without_context(self):
+        load = Mock(return_value='form model')
+
+        memoize(None, (FORM_MODEL, 'cli001'), load)
+        memoize(None, (FORM_MODEL, 'cli001'), load)
+
+        self.assertEqual(2, load.call_count)
+
+    def test_child_should_share_lookups_of_batch_but_copy_form_models(self):
+        form_model = Mock()
+        form_model.copy_for_request.side_effect = lambda dbm: Mock()
+        load = Mock(return_value=form_model)
+        first, second = self.context.child(), self.context.child()
+
+        first_form_model = first.memoize((FORM_MODEL, 'cli001'), load)
+        second_form_model = second.memoize((FORM_MODEL, 'cli001'), load)
+
+        self.assertEqual(1, load.call_count)
+        self.assertEqual(1, self.context.backend_calls)
+        self.assertEqual(0, first.backend_calls)
+        self.assertEqual(2, form_model.copy_for_request.call_count)
+        self.assertIsNot(first_form_model, second_form_model)
+
+    def test_should_count_preloaded_lookups_as_one_backend_call(self):
+        self.context.preload({(REPORTER, '123'): lambda: 'reporter',
+                              (REPORTER, '456'): Mock(side_effect=NumberNotRegisteredException('456'))})
+
+        self.assertEqual('reporter', self.context.memoize((REPORTER, '123'), Mock()))
+        self.assertRaises(NumberNotRegisteredException, self.context.memoize, (REPORTER, '456'), Mock())
+        self.assertEqual(1, self.context.backend_calls)
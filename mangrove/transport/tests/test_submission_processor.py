@@ -0,0 +1,92 @@
+from threading import Event, Lock
+from unittest import TestCase
+
+from mangrove.errors.MangroveException import SubmissionQueueFullException, SubmissionNotProcessedException, \
+    NumberNotRegisteredException
+from mangrove.transport.submission_processor import SubmissionProcessor, QUEUED, PROCESSING
+
+
+class TestSubmissionProcessor(TestCase):
+    def setUp(self):
+        self.processed = []
+        self.lock = Lock()
+
+    def tearDown(self):
+        self.processor.shutdown()
+
+    def _record(self, sender, message):
+        with self.lock:
+            self.processed.append((sender, message))
+        return message
+
+    def test_should_process_submissions_of_one_sender_in_order(self):
+        self.processor = SubmissionProcessor(workers=3, max_queue_size=100)
+        pending = [self.processor.submit(sender, self._record, sender, index)
+                   for index in range(20) for sender in ('+123', '+456', '+789')]
+
+        self.assertEqual(sorted(range(20) * 3), sorted([each.result(timeout=5) for each in pending]))
+        for sender in ('+123', '+456', '+789'):
+            self.assertEqual(range(20), [message for each, message in self.processed if each == sender])
+
+    def test_should_reject_submissions_when_queue_is_full(self):
+        self.processor = SubmissionProcessor(workers=1, max_queue_size=1)
+        release = Event()
+        started = Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        self.processor.submit('+123', block)
+        started.wait(5)
+        self.processor.submit('+123', self._record, '+123', 'queued')
+
+        self.assertRaises(SubmissionQueueFullException, self.processor.submit_with, '+123', self._record,
+                          ('+123', 'rejected'), block=False)
+        self.assertRaises(SubmissionQueueFullException, self.processor.submit_with, '+123', self._record,
+                          ('+123', 'rejected'), timeout=0.01)
+        self.assertEqual(1, self.processor.queue_depth())
+        release.set()
+        self.processor.shutdown()
+
+        self.assertEqual([('+123', 'queued')], self.processed)
+        self.assertEqual(2, self.processor.snapshot()['rejected'])
+
+    def test_should_raise_what_the_player_raised(self):
+        self.processor = SubmissionProcessor(workers=1)
+
+        def unregistered():
+            raise NumberNotRegisteredException('123')
+
+        pending = self.processor.submit('+123', unregistered)
+
+        self.assertRaises(NumberNotRegisteredException, pending.result, 5)
+        self.processor.shutdown()
+        self.assertEqual(1, self.processor.snapshot()['failed'])
+
+    def test_should_raise_when_submission_is_not_processed_in_time(self):
+        self.processor = SubmissionProcessor(workers=1)
+        release = Event()
+        pending = self.processor.submit('+123', release.wait, 5)
+
+        self.assertRaises(SubmissionNotProcessedException, pending.result, 0.01)
+        release.set()
+        self.assertTrue(pending.result(5))
+
+    def test_should_report_queue_depth_stage_latency_and_worker_utilisation(self):
+        self.processor = SubmissionProcessor(workers=2)
+        for index in range(4):
+            self.processor.submit(index, self._record, index, index)
+        self.processor.shutdown()
+
+        snapshot = self.processor.snapshot()
+
+        self.assertEqual(4, snapshot['submitted'])
+        self.assertEqual(4, snapshot['processed'])
+        self.assertEqual(0, snapshot['queue_depth'])
+        self.assertEqual([0, 0], snapshot['worker_queue_depth'])
+        self.assertEqual(4, snapshot['stages'][QUEUED]['count'])
+        self.assertEqual(4, sum(snapshot['stages'][PROCESSING]['histogram'].values()))
+        self.assertEqual([0, 1], sorted(snapshot['worker_utilisation']))
+        for utilisation in snapshot['worker_utilisation'].values():
+            self.assertTrue(0 <= utilisation <= 1)
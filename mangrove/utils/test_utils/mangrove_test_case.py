@@ -5,6 +5,7 @@ from mangrove.bootstrap import initializer
 from mangrove.datastore.cache_manager import get_cache_manager
 from mangrove.datastore.database import get_db_manager, _delete_db_and_remove_db_manager
 from mangrove.form_model.form_model import get_form_model_by_code
+from mangrove.form_model.form_model_cache import form_model_cache
 from mangrove.utils.test_utils.database_utils import uniq
 
 
@@ -19,5 +20,6 @@ class MangroveTestCase(unittest.TestCase):
         self.manager = get_db_manager('http://localhost:5984/', self.db_name)
         _delete_db_and_remove_db_manager(self.manager)
         get_cache_manager().flush_all()
+        form_model_cache.clear()
 
 